@@ -8,9 +8,12 @@ from flask_migrate import Migrate
 
 from core.configuration.configuration import get_app_version
 from core.managers.module_manager import ModuleManager
+from core.managers.cache_manager import CacheManager
 from core.managers.config_manager import ConfigManager
 from core.managers.error_handler_manager import ErrorHandlerManager
 from core.managers.logging_manager import LoggingManager
+from core.managers.record_buffer_manager import RecordBufferManager
+from core.managers.task_manager import TaskManager
 
 # Load environment variables
 load_dotenv()
@@ -31,6 +34,18 @@ def create_app(config_name='development'):
     db.init_app(app)
     migrate.init_app(app, db)
 
+    # Register the cache manager
+    cache_manager = CacheManager(app)
+    cache_manager.register_cache_manager()
+
+    # Register the background task manager
+    task_manager = TaskManager(app)
+    task_manager.register_task_manager()
+
+    # Register the write-behind buffer of the view and download records
+    record_buffer_manager = RecordBufferManager(app)
+    record_buffer_manager.register_record_buffer_manager()
+
     # Register modules
     module_manager = ModuleManager(app)
     module_manager.register_modules()
@@ -5,9 +5,10 @@ from app.modules.auth.models import User
 
 
 @pytest.fixture(scope='session')
-def test_app():
+def test_app(tmp_path_factory):
     """ Create and configure a new app instance for each test session. """
     test_app = create_app('testing')
+    test_app.config['CACHE_DIR'] = str(tmp_path_factory.mktemp('cache'))
 
     with test_app.app_context():
         # Imprimir los blueprints registrados
@@ -24,6 +25,9 @@ def test_client(test_app):
 
             db.drop_all()
             db.create_all()
+            # Ids restart with every database, so whatever was cached for another module must go
+            test_app.jinja_env.fragment_cache.clear()
+            test_app.extensions['cache_manager'].clear_local_caches()
             """
             The test suite always includes the following user in order to avoid repetition
             of its creation
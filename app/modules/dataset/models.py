@@ -47,8 +47,10 @@ class Author(db.Model):
 
 class DSMetrics(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    number_of_models = db.Column(db.String(120))
-    number_of_features = db.Column(db.String(120))
+    number_of_models = db.Column(db.Integer, index=True)
+    number_of_features = db.Column(db.Integer, index=True)
+    # Sum of the configurations of the analyzed feature models (see FMMetrics)
+    number_of_configurations = db.Column(db.Double, index=True)
 
     def __repr__(self):
         return f'DSMetrics<models={self.number_of_models}, features={self.number_of_features}>'
@@ -61,22 +63,61 @@ class DSMetaData(db.Model):
     description = db.Column(db.Text, nullable=False)
     publication_type = db.Column(SQLAlchemyEnum(PublicationType), nullable=False)
     publication_doi = db.Column(db.String(120))
-    dataset_doi = db.Column(db.String(120))
+    dataset_doi = db.Column(db.String(120), unique=True, index=True)
     tags = db.Column(db.String(120))
     ds_metrics_id = db.Column(db.Integer, db.ForeignKey('ds_metrics.id'))
     ds_metrics = db.relationship('DSMetrics', uselist=False, backref='ds_meta_data', cascade="all, delete")
     authors = db.relationship('Author', backref='ds_meta_data', lazy=True, cascade="all, delete")
 
 
+data_set_tag = db.Table(
+    'data_set_tag',
+    db.Column('data_set_id', db.Integer, db.ForeignKey('data_set.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_data_set_tag_tag_id', 'tag_id'),
+)
+
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        return " ".join(name.split()).lower()[:120]
+
+    @staticmethod
+    def parse(tags) -> list:
+        # Accepts the comma separated DSMetaData.tags string or a list of tags
+        if isinstance(tags, str):
+            tags = tags.split(",")
+        names = (Tag.normalize(tag) for tag in tags or [])
+        return list(dict.fromkeys(name for name in names if name))
+
+    def __repr__(self):
+        return f'Tag<{self.name}>'
+
+
 class DataSet(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
     ds_meta_data_id = db.Column(db.Integer, db.ForeignKey('ds_meta_data.id'), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Aggregates of the files of every feature model, set when the dataset is created
+    files_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_size_bytes = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+    # Bumped whenever something shown in the cached fragments of the dataset changes
+    fragment_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     ds_meta_data = db.relationship('DSMetaData', backref=db.backref('data_set', uselist=False))
     feature_models = db.relationship('FeatureModel', backref='data_set', lazy=True, cascade="all, delete")
+    tags = db.relationship('Tag', secondary=data_set_tag, lazy=True, backref=db.backref('data_sets', lazy='dynamic'))
+
+    __table_args__ = (
+        db.Index('ix_data_set_created_at_id', 'created_at', 'id'),
+        db.Index('ix_data_set_total_size_bytes_id', 'total_size_bytes', 'id'),
+    )
 
     def name(self):
         return self.ds_meta_data.title
@@ -95,24 +136,29 @@ class DataSet(db.Model):
         return f'https://zenodo.org/record/{self.ds_meta_data.deposition_id}' if self.ds_meta_data.dataset_doi else None
 
     def get_files_count(self):
-        return sum(len(fm.files) for fm in self.feature_models)
+        return self.files_count
 
     def get_file_total_size(self):
-        return sum(file.size for fm in self.feature_models for file in fm.files)
+        return self.total_size_bytes
 
     def get_file_total_size_for_human(self):
         from app.modules.dataset.services import SizeService
-        return SizeService().get_human_readable_size(self.get_file_total_size())
+        return SizeService.get_human_readable_size(self.get_file_total_size())
 
     def get_uvlhub_doi(self):
         from app.modules.dataset.services import DataSetService
-        return DataSetService().get_uvlhub_doi(self)
+        return DataSetService.get_uvlhub_doi(self)
 
     def get_deposition_doi(self):
         from app.modules.dataset.services import DataSetService
-        return DataSetService().get_deposition_doi(self)
+        return DataSetService.get_deposition_doi(self)
+
+    def get_fragment_version(self):
+        from app.modules.dataset.services import DataSetService
+        return DataSetService.get_fragment_version(self)
 
     def to_dict(self):
+        from app.modules.dataset.services import SizeService
         return {
             'title': self.ds_meta_data.title,
             'id': self.id,
@@ -127,10 +173,10 @@ class DataSet(db.Model):
             'url': self.get_uvlhub_doi(),
             'download': f'{request.host_url.rstrip("/")}/dataset/download/{self.id}',
             'zenodo': self.get_zenodo_url(),
-            'files': [file.to_dict() for fm in self.feature_models for file in fm.files],
-            'files_count': self.get_files_count(),
-            'total_size_in_bytes': self.get_file_total_size(),
-            'total_size_in_human_format': self.get_file_total_size_for_human(),
+            'files': [file.to_dict() for file in self.files()],
+            'files_count': self.files_count,
+            'total_size_in_bytes': self.total_size_bytes,
+            'total_size_in_human_format': SizeService.get_human_readable_size(self.total_size_bytes),
         }
 
     def __repr__(self):
@@ -143,6 +189,14 @@ class DSDownloadRecord(db.Model):
     dataset_id = db.Column(db.Integer, db.ForeignKey('data_set.id'))
     download_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     download_cookie = db.Column(db.String(36), nullable=False)  # Assuming UUID4 strings
+    # user_id with 0 for anonymous users, NULLs would never collide in the unique constraint
+    user_key = db.Column(db.Integer, db.Computed('coalesce(user_id, 0)', persisted=True))
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            'user_key', 'dataset_id', 'download_cookie', name='uq_ds_download_record_user_dataset_cookie'
+        ),
+    )
 
     def __repr__(self):
         return (
@@ -159,6 +213,11 @@ class DSViewRecord(db.Model):
     dataset_id = db.Column(db.Integer, db.ForeignKey('data_set.id'))
     view_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     view_cookie = db.Column(db.String(36), nullable=False)  # Assuming UUID4 strings
+    user_key = db.Column(db.Integer, db.Computed('coalesce(user_id, 0)', persisted=True))
+
+    __table_args__ = (
+        db.UniqueConstraint('user_key', 'dataset_id', 'view_cookie', name='uq_ds_view_record_user_dataset_cookie'),
+    )
 
     def __repr__(self):
         return f'<View id={self.id} dataset_id={self.dataset_id} date={self.view_date} cookie={self.view_cookie}>'
@@ -166,5 +225,21 @@ class DSViewRecord(db.Model):
 
 class DOIMapping(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    dataset_doi_old = db.Column(db.String(120))
+    dataset_doi_old = db.Column(db.String(120), unique=True, index=True)
     dataset_doi_new = db.Column(db.String(120))
+
+
+class StatsCounter(db.Model):
+    # Pre-aggregated statistics, object_id is 0 for the global scope
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    scope = db.Column(db.String(16), nullable=False)
+    object_id = db.Column(db.Integer, nullable=False, default=0)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('name', 'scope', 'object_id', name='uq_stats_counter_name_scope_object'),
+    )
+
+    def __repr__(self):
+        return f'StatsCounter<{self.name}, {self.scope}={self.object_id}, value={self.value}>'
@@ -3,7 +3,9 @@ import logging
 from flask_login import current_user
 from typing import Optional
 
-from sqlalchemy import desc, func
+from sqlalchemy import and_, desc, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
 
 from app.modules.dataset.models import (
     Author,
@@ -12,8 +14,13 @@ from app.modules.dataset.models import (
     DSMetaData,
     DSViewRecord,
     DataSet,
-    DSMetrics
+    DSMetrics,
+    StatsCounter,
+    Tag
 )
+from app.modules.featuremodel.models import FeatureModel
+from app.modules.hubfile.models import Hubfile
+from core.managers.record_buffer_manager import buffer_record
 from core.repositories.BaseRepository import BaseRepository
 
 logger = logging.getLogger(__name__)
@@ -28,9 +35,14 @@ class DSDownloadRecordRepository(BaseRepository):
     def __init__(self):
         super().__init__(DSDownloadRecord)
 
-    def total_dataset_downloads(self) -> int:
-        max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
-        return max_id if max_id is not None else 0
+    def buffer_new_record(self, dataset_id: int, user_cookie: str) -> bool:
+        return buffer_record(
+            self.model, ("user_id", "dataset_id", "download_cookie"), partition_by="dataset_id",
+            user_id=current_user.id if current_user.is_authenticated else None,
+            dataset_id=dataset_id,
+            download_date=datetime.now(timezone.utc),
+            download_cookie=user_cookie,
+        )
 
 
 class DSMetaDataRepository(BaseRepository):
@@ -45,33 +57,56 @@ class DSViewRecordRepository(BaseRepository):
     def __init__(self):
         super().__init__(DSViewRecord)
 
-    def total_dataset_views(self) -> int:
-        max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
-        return max_id if max_id is not None else 0
-
-    def the_record_exists(self, dataset: DataSet, user_cookie: str):
-        return self.model.query.filter_by(
+    def buffer_new_record(self, dataset: DataSet, user_cookie: str) -> bool:
+        return buffer_record(
+            self.model, ("user_id", "dataset_id", "view_cookie"), partition_by="dataset_id",
             user_id=current_user.id if current_user.is_authenticated else None,
             dataset_id=dataset.id,
-            view_cookie=user_cookie
-        ).first()
-
-    def create_new_record(self, dataset: DataSet, user_cookie: str) -> DSViewRecord:
-        return self.create(
-                user_id=current_user.id if current_user.is_authenticated else None,
-                dataset_id=dataset.id,
-                view_date=datetime.now(timezone.utc),
-                view_cookie=user_cookie,
-            )
+            view_date=datetime.now(timezone.utc),
+            view_cookie=user_cookie,
+        )
 
 
 class DataSetRepository(BaseRepository):
     def __init__(self):
         super().__init__(DataSet)
 
+    @staticmethod
+    def serialization_options() -> tuple:
+        # Loader options for everything DataSet.to_dict touches, in a fixed number of queries
+        return (
+            joinedload(DataSet.ds_meta_data).selectinload(DSMetaData.authors),
+            selectinload(DataSet.feature_models).selectinload(FeatureModel.files),
+        )
+
+    def load_serialization_relations(self, datasets: list) -> list:
+        if datasets:
+            (
+                self.model.query
+                .options(*self.serialization_options())
+                .filter(self.model.id.in_([dataset.id for dataset in datasets]))
+                .all()
+            )
+        return datasets
+
+    def published_files(self) -> list:
+        # (dataset id, user id, dataset DOI, file id, file name, file checksum) rows, one per published file
+        return (
+            self.session.query(
+                DataSet.id, DataSet.user_id, DSMetaData.dataset_doi, Hubfile.id, Hubfile.name, Hubfile.checksum
+            )
+            .join(DataSet.ds_meta_data)
+            .outerjoin(DataSet.feature_models)
+            .outerjoin(FeatureModel.files)
+            .filter(DSMetaData.dataset_doi.isnot(None))
+            .order_by(DataSet.id, Hubfile.id)
+            .all()
+        )
+
     def get_synchronized(self, current_user_id: int) -> DataSet:
         return (
             self.model.query.join(DSMetaData)
+            .options(contains_eager(self.model.ds_meta_data))
             .filter(DataSet.user_id == current_user_id, DSMetaData.dataset_doi.isnot(None))
             .order_by(self.model.created_at.desc())
             .all()
@@ -80,6 +115,7 @@ class DataSetRepository(BaseRepository):
     def get_unsynchronized(self, current_user_id: int) -> DataSet:
         return (
             self.model.query.join(DSMetaData)
+            .options(contains_eager(self.model.ds_meta_data))
             .filter(DataSet.user_id == current_user_id, DSMetaData.dataset_doi.is_(None))
             .order_by(self.model.created_at.desc())
             .all()
@@ -99,6 +135,43 @@ class DataSetRepository(BaseRepository):
             .count()
         )
 
+    def get_id_by_doi(self, doi: str) -> Optional[int]:
+        return self.session.execute(
+            select(self.model.id).join(DSMetaData).where(DSMetaData.dataset_doi == doi)
+        ).scalar()
+
+    def get_with_metadata(self, dataset_id: int) -> Optional[DataSet]:
+        return self.session.scalars(
+            select(self.model).where(self.model.id == dataset_id).options(joinedload(self.model.ds_meta_data))
+        ).first()
+
+    def bump_fragment_versions(self, user_id: int):
+        # Every dataset of the user shows their profile, so all of their fragments are stale
+        self.session.execute(
+            update(self.model)
+            .where(self.model.user_id == user_id)
+            .values(fragment_version=self.model.fragment_version + 1)
+        )
+        self.session.commit()
+
+    def count_synchronized_subquery(self):
+        return (
+            select(func.count(self.model.id))
+            .join(DSMetaData)
+            .where(DSMetaData.dataset_doi.isnot(None))
+            .scalar_subquery()
+        )
+
+    def latest_synchronized_with_metadata(self, limit: int = 5) -> list:
+        return self.session.scalars(
+            select(self.model)
+            .join(self.model.ds_meta_data)
+            .where(DSMetaData.dataset_doi.isnot(None))
+            .options(contains_eager(self.model.ds_meta_data).selectinload(DSMetaData.authors))
+            .order_by(desc(self.model.id))
+            .limit(limit)
+        ).all()
+
     def count_unsynchronized_datasets(self):
         return (
             self.model.query.join(DSMetaData)
@@ -127,3 +200,71 @@ class DOIMappingRepository(BaseRepository):
 class DSMetricsRepository(BaseRepository):
     def __init__(self):
         super().__init__(DSMetrics)
+
+
+class TagRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(Tag)
+
+    def get_or_create_many(self, names: list) -> list:
+        tags = {tag.name: tag for tag in self.model.query.filter(self.model.name.in_(names))} if names else {}
+        for name in names:
+            if name in tags:
+                continue
+            try:
+                # Another request may create the same tag concurrently
+                with self.session.begin_nested():
+                    tags[name] = self.create(commit=False, name=name)
+            except IntegrityError:
+                tags[name] = self.model.query.filter_by(name=name).one()
+        return [tags[name] for name in names]
+
+
+class StatsCounterRepository(BaseRepository):
+    def __init__(self, session=None):
+        super().__init__(StatsCounter)
+        # Session events hand over the session that is being committed
+        if session is not None:
+            self.session = session
+
+    def _key(self, name: str, scope: str, object_id: int):
+        return and_(self.model.name == name, self.model.scope == scope, self.model.object_id == object_id)
+
+    def increment(self, name: str, scope: str = "global", object_id: int = 0, amount: int = 1):
+        # Atomic UPDATE value = value + amount, the row is created by the first increment
+        increment = update(self.model).where(self._key(name, scope, object_id)).values(value=self.model.value + amount)
+        if self.session.execute(increment).rowcount:
+            return
+
+        try:
+            with self.session.begin_nested():
+                self.session.execute(
+                    insert(self.model).values(name=name, scope=scope, object_id=object_id, value=amount)
+                )
+        except IntegrityError:
+            # Created concurrently by another transaction
+            self.session.execute(increment)
+
+    def get_values(self, keys: list) -> dict:
+        # {(name, scope, object_id): value} for the given keys, missing counters are 0
+        if not keys:
+            return {}
+
+        rows = self.session.execute(
+            select(self.model.name, self.model.scope, self.model.object_id, self.model.value)
+            .where(or_(*[self._key(*key) for key in keys]))
+        )
+        values = {(name, scope, object_id): value for name, scope, object_id, value in rows}
+        return {tuple(key): values.get(tuple(key), 0) for key in keys}
+
+    def get_global_values(self, names: tuple, **aggregates) -> dict:
+        # Global counters and any extra scalar subqueries, read in a single SELECT
+        columns = [
+            select(self.model.value).where(self._key(name, "global", 0)).scalar_subquery().label(name)
+            for name in names
+        ] + [aggregate.label(name) for name, aggregate in aggregates.items()]
+        row = self.session.execute(select(*columns)).one()
+        return {name: value or 0 for name, value in row._mapping.items()}
+
+    def get_value(self, name: str, scope: str = "global", object_id: int = 0) -> int:
+        return self.get_values([(name, scope, object_id)])[(name, scope, object_id)]
@@ -1,22 +1,15 @@
 import logging
 import os
-import json
 import shutil
-import tempfile
 import uuid
-from datetime import datetime, timezone
-from zipfile import ZipFile
-
-from app.modules.hubfile.services import HubfileService
-from flamapy.metamodels.fm_metamodel.transformations import UVLReader, GlencoeWriter, SPLOTWriter
-from flamapy.metamodels.pysat_metamodel.transformations import FmToPysat, DimacsWriter
 
 from flask import (
+    Response,
     redirect,
     render_template,
     request,
     jsonify,
-    send_from_directory,
+    send_file,
     make_response,
     abort,
     url_for,
@@ -24,19 +17,21 @@ from flask import (
 from flask_login import login_required, current_user
 
 from app.modules.dataset.forms import DataSetForm, DataSetFormUpdate
-from app.modules.dataset.models import (
-    DSDownloadRecord
-)
 from app.modules.dataset import dataset_bp
 from app.modules.dataset.services import (
     AuthorService,
     DSDownloadRecordService,
     DSMetaDataService,
     DSViewRecordService,
+    DataSetArchiveService,
     DataSetService,
-    DOIMappingService
+    DOIMappingService,
+    StatsCounterService,
+    ARCHIVE_FORMATS,
+    stream_zip
 )
 from app.modules.fakenodo.services import FakenodoService
+from app.modules.flamapy.services import FeatureModelAnalysisService, HubfileConversionService
 from app.modules.auth.models import User
 
 logger = logging.getLogger(__name__)
@@ -48,6 +43,14 @@ dsmetadata_service = DSMetaDataService()
 fakenodo_service = FakenodoService()
 doi_mapping_service = DOIMappingService()
 ds_view_record_service = DSViewRecordService()
+ds_download_record_service = DSDownloadRecordService()
+stats_counter_service = StatsCounterService()
+conversion_service = HubfileConversionService()
+analysis_service = FeatureModelAnalysisService()
+archive_service = DataSetArchiveService()
+
+# Seconds a client is asked to wait while the download_all archive is being built
+ARCHIVE_RETRY_AFTER = 5
 
 
 @dataset_bp.route("/dataset/upload", methods=["GET", "POST"])
@@ -63,16 +66,9 @@ def create_dataset():
 
         try:
             logger.info("Parsing the UVL files to JSON...")
-
-            mergedUVL = []
-            for feature_model in form.feature_models:
-                uvl_filename = feature_model.uvl_filename.data
-                uvl_file_path = 'uploads/temp/' + str(current_user.id) + '/' + str(uvl_filename)
-                splitted_filename = uvl_filename.split('.')
-                aux = '{"' + splitted_filename[0] + '": ' + dataset_service.parse_uvl_to_json(uvl_file_path) + '}'
-                aux = json.loads(aux)
-                mergedUVL.append(aux)
-
+            ingestions = dataset_service.ingest_uvl_files(
+                current_user.temp_folder(), [fm.uvl_filename.data for fm in form.feature_models]
+            )
             logger.info("All UVL files have been parsed to JSON")
         except Exception as exc:
             logger.exception(f"Exception while parsing UVL to JSON in local {exc}")
@@ -80,17 +76,20 @@ def create_dataset():
 
         try:
             logger.info("Creating dataset...")
-            dataset = dataset_service.create_from_form(form=form, current_user=current_user)
+            dataset = dataset_service.create_from_form(form=form, current_user=current_user, ingestions=ingestions)
             logger.info(f"Created dataset: {dataset}")
             dataset_service.move_feature_models(dataset)
         except Exception as exc:
             logger.exception(f"Exception while create dataset data in local {exc}")
             return jsonify({"Exception while create dataset data in local: ": str(exc)}), 400
 
-        deposition = fakenodo_service.create_new_deposition(dataset, mergedUVL)
+        deposition = fakenodo_service.create_new_deposition(dataset, ingestions)
         dataset_service.update_dsmetadata(
             dataset.ds_meta_data_id, deposition_id=deposition.id, dataset_doi=f'10.1234/dataset{dataset.id}'
         )
+        conversion_service.schedule_dataset(dataset.id)
+        analysis_service.schedule_dataset(dataset.id)
+        archive_service.schedule_builds()
 
         # Delete temp folder
         file_path = current_user.temp_folder()
@@ -169,34 +168,33 @@ def create_dataset_draft():
 @login_required
 def publish_dataset(dataset_id):
     dataset = dataset_service.get_or_404(dataset_id)
-    mergedUVL = []
     if current_user.id != dataset.user.id or dataset.ds_meta_data.dataset_doi:
         return jsonify({"message": "You are not allowed to publish this dataset"}), 400
 
     try:
         logger.info("Parsing the UVL files to JSON...")
-        for feature_model in dataset.feature_models:
-            uvl_filename = feature_model.fm_meta_data.uvl_filename
-            uvl_file_path = 'uploads/user_' + str(current_user.id)
-            uvl_file_path += '/dataset_' + str(dataset.id) + '/' + str(uvl_filename)
-            splitted_filename = uvl_filename.split('.')
-            aux = '{"' + splitted_filename[0] + '": ' + dataset_service.parse_uvl_to_json(uvl_file_path) + '}'
-            aux = json.loads(aux)
-            mergedUVL.append(aux)
-
+        ingestions = dataset_service.ingest_uvl_files(
+            os.path.join('uploads', f'user_{current_user.id}', f'dataset_{dataset.id}'),
+            [feature_model.fm_meta_data.uvl_filename for feature_model in dataset.feature_models]
+        )
         logger.info("All UVL files have been parsed to JSON")
     except Exception as exc:
         logger.exception(f"Exception while parsing UVL to JSON in local {exc}")
         return jsonify({"Exception while parsing UVL to JSON in local : ": str(exc)}), 400
 
-    deposition = fakenodo_service.create_new_deposition(dataset, mergedUVL)
+    deposition = fakenodo_service.create_new_deposition(dataset, ingestions)
     dataset_service.update_dsmetadata(
         dataset.ds_meta_data_id, deposition_id=deposition.id, dataset_doi=f'10.1234/dataset{dataset.id}'
     )
+    conversion_service.schedule_dataset(dataset.id)
+    analysis_service.schedule_dataset(dataset.id)
+    archive_service.schedule_builds()
 
+    datasets = dataset_service.get_synchronized(current_user.id)
     return render_template(
         "dataset/list_datasets.html",
-        datasets=dataset_service.get_synchronized(current_user.id),
+        datasets=datasets,
+        fragment_versions=dataset_service.get_fragment_versions(datasets),
         local_datasets=dataset_service.get_unsynchronized(current_user.id)
     )
 
@@ -204,9 +202,11 @@ def publish_dataset(dataset_id):
 @dataset_bp.route("/dataset/list", methods=["GET", "POST"])
 @login_required
 def list_dataset():
+    datasets = dataset_service.get_synchronized(current_user.id)
     return render_template(
         "dataset/list_datasets.html",
-        datasets=dataset_service.get_synchronized(current_user.id),
+        datasets=datasets,
+        fragment_versions=dataset_service.get_fragment_versions(datasets),
         local_datasets=dataset_service.get_unsynchronized(current_user.id)
     )
 
@@ -274,23 +274,21 @@ def download_dataset(dataset_id):
     dataset = dataset_service.get_or_404(dataset_id)
 
     file_path = f"uploads/user_{dataset.user_id}/dataset_{dataset.id}/"
-
-    temp_dir = tempfile.mkdtemp()
-    zip_path = os.path.join(temp_dir, f"dataset_{dataset_id}.zip")
-
-    with ZipFile(zip_path, "w") as zipf:
-        for subdir, dirs, files in os.walk(file_path):
-            for file in files:
-                full_path = os.path.join(subdir, file)
-
-                relative_path = os.path.relpath(full_path, file_path)
-
-                zipf.write(
-                    full_path,
-                    arcname=os.path.join(
-                        os.path.basename(zip_path[:-4]), relative_path
-                    ),
-                )
+    entries = [
+        (
+            os.path.join(f"dataset_{dataset_id}", os.path.relpath(os.path.join(subdir, file), file_path)),
+            os.path.join(subdir, file),
+        )
+        for subdir, dirs, files in os.walk(file_path)
+        for file in files
+    ]
+
+    # The archive is streamed while it is built, so nothing is buffered in memory or on disk
+    resp = Response(
+        stream_zip(entries),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=dataset_{dataset_id}.zip"},
+    )
 
     user_cookie = request.cookies.get("download_cookie")
     if not user_cookie:
@@ -298,38 +296,9 @@ def download_dataset(dataset_id):
             uuid.uuid4()
         )  # Generate a new unique identifier if it does not exist
         # Save the cookie to the user's browser
-        resp = make_response(
-            send_from_directory(
-                temp_dir,
-                f"dataset_{dataset_id}.zip",
-                as_attachment=True,
-                mimetype="application/zip",
-            )
-        )
         resp.set_cookie("download_cookie", user_cookie)
-    else:
-        resp = send_from_directory(
-            temp_dir,
-            f"dataset_{dataset_id}.zip",
-            as_attachment=True,
-            mimetype="application/zip",
-        )
 
-    # Check if the download record already exists for this cookie
-    existing_record = DSDownloadRecord.query.filter_by(
-        user_id=current_user.id if current_user.is_authenticated else None,
-        dataset_id=dataset_id,
-        download_cookie=user_cookie
-    ).first()
-
-    if not existing_record:
-        # Record the download in your database
-        DSDownloadRecordService().create(
-            user_id=current_user.id if current_user.is_authenticated else None,
-            dataset_id=dataset_id,
-            download_date=datetime.now(timezone.utc),
-            download_cookie=user_cookie,
-        )
+    ds_download_record_service.record_download(dataset_id, user_cookie)
 
     return resp
 
@@ -346,39 +315,20 @@ def download_dataset_format(dataset_id, format):
     dataset = dataset_service.get_or_404(dataset_id)
 
     file_path = f"uploads/user_{dataset.user_id}/dataset_{dataset.id}/"
-    temp_dir = tempfile.mkdtemp()
-    zip_path = os.path.join(temp_dir, f"dataset_{dataset_id}.zip")
-
-    with ZipFile(zip_path, "w") as zipf:
-        for subdir, dirs, files in os.walk(file_path):
-            for file in dataset.files():
-                full_path = os.path.join(subdir, file.name)
-
-                with open(full_path, "r") as file_content:
-                    content = file_content.read()
-
-                if format == "DIMACS":
-                    transformed_file_path, original_filename = transform_to_dimacs(file.id)
-                    with open(transformed_file_path, "r") as transformed_file:
-                        content = transformed_file.read()
-                    new_filename = f"{original_filename}_cnf.txt"
-
-                elif format == "GLENCOE":
-                    transformed_file_path, original_filename = transform_to_glencoe(file.id)
-                    with open(transformed_file_path, "r") as transformed_file:
-                        content = transformed_file.read()
-                    new_filename = f"{original_filename}_glencoe.txt"
-
-                elif format == "SPLOT":
-                    transformed_file_path, original_filename = transform_to_splot(file.id)
-                    with open(transformed_file_path, "r") as transformed_file:
-                        content = transformed_file.read()
-                    new_filename = f"{original_filename}_splot.txt"
-                elif format == "UVL":
-                    new_filename = f"{file.name}"
-
-                with zipf.open(new_filename, "w") as zipfile:
-                    zipfile.write(content.encode())
+    files = []
+    for file in dataset.files():
+        full_path = os.path.join(file_path, file.name)
+        if not os.path.exists(full_path):
+            logger.warning(f"File not found: {full_path}")
+            continue
+        files.append((file.id, file.name, full_path, file.checksum))
+
+    # Conversions stored at publish time are served as they are, any other one is converted on the fly
+    resp = Response(
+        stream_zip(conversion_service.conversion_entries(files, format)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=dataset_{dataset_id}.zip"},
+    )
 
     user_cookie = request.cookies.get("download_cookie")
     if not user_cookie:
@@ -386,38 +336,9 @@ def download_dataset_format(dataset_id, format):
             uuid.uuid4()
         )  # Generate a new unique identifier if it does not exist
         # Save the cookie to the user's browser
-        resp = make_response(
-            send_from_directory(
-                temp_dir,
-                f"dataset_{dataset_id}.zip",
-                as_attachment=True,
-                mimetype="application/zip",
-            )
-        )
         resp.set_cookie("download_cookie", user_cookie)
-    else:
-        resp = send_from_directory(
-            temp_dir,
-            f"dataset_{dataset_id}.zip",
-            as_attachment=True,
-            mimetype="application/zip",
-        )
 
-    # Check if the download record already exists for this cookie
-    existing_record = DSDownloadRecord.query.filter_by(
-        user_id=current_user.id if current_user.is_authenticated else None,
-        dataset_id=dataset_id,
-        download_cookie=user_cookie
-    ).first()
-
-    if not existing_record:
-        # Record the download in your database
-        DSDownloadRecordService().create(
-            user_id=current_user.id if current_user.is_authenticated else None,
-            dataset_id=dataset_id,
-            download_date=datetime.now(timezone.utc),
-            download_cookie=user_cookie,
-        )
+    ds_download_record_service.record_download(dataset_id, user_cookie)
 
     return resp
 
@@ -425,24 +346,28 @@ def download_dataset_format(dataset_id, format):
 @dataset_bp.route("/doi/<path:doi>/", methods=["GET"])
 def subdomain_index(doi):
 
-    # Check if the DOI is an old DOI
-    new_doi = doi_mapping_service.get_new_doi(doi)
-    if new_doi:
-        # Redirect to the same path with the new DOI
-        return redirect(url_for('dataset.subdomain_index', doi=new_doi), code=302)
+    # Resolve the DOI, cached in memory (unknown DOIs too)
+    resolution = doi_mapping_service.resolve(doi)
 
-    # Try to search the dataset by the provided DOI (which should already be the new one)
-    ds_meta_data = dsmetadata_service.filter_by_doi(doi)
+    # Get dataset and its metadata in a single primary key load
+    dataset = dataset_service.get_with_metadata(resolution["dataset_id"]) if "dataset_id" in resolution else None
 
-    if not ds_meta_data:
-        abort(404)
+    if "dataset_id" in resolution and (not dataset or dataset.ds_meta_data.dataset_doi != doi):
+        # The cached resolution is stale, e.g. the DOI has since been mapped to a new one
+        resolution = doi_mapping_service.resolve(doi, refresh=True)
+        dataset = dataset_service.get_with_metadata(resolution["dataset_id"]) if "dataset_id" in resolution else None
 
-    # Get dataset
-    dataset = ds_meta_data.data_set
+    if "new_doi" in resolution:
+        # Redirect to the same path with the new DOI
+        return redirect(url_for('dataset.subdomain_index', doi=resolution["new_doi"]), code=302)
+
+    if not dataset or dataset.ds_meta_data.dataset_doi != doi:
+        abort(404)
 
     # Save the cookie to the user's browser
     user_cookie = ds_view_record_service.create_cookie(dataset=dataset)
-    resp = make_response(render_template("dataset/view_dataset.html", dataset=dataset))
+    counters = stats_counter_service.dataset_counters(dataset)
+    resp = make_response(render_template("dataset/view_dataset.html", dataset=dataset, counters=counters))
     resp.set_cookie("view_cookie", user_cookie)
 
     return resp
@@ -466,143 +391,40 @@ def get_unsynchronized_dataset(dataset_id):
 def download_all():
     # Validar formato
     format = request.args.get("format")
-    valid_formats = ["DIMACS", "GLENCOE", "SPLOT", "UVL"]
-
-    if format not in valid_formats:
+    if format not in ARCHIVE_FORMATS:
         return jsonify({
             "error": "Formato de descarga no soportado",
-            "valid_formats": valid_formats
+            "valid_formats": list(ARCHIVE_FORMATS)
         }), 400
 
     # Obtener datasets
-    datasets = dataset_service.get_all_published_datasets()
+    datasets = archive_service.published_datasets()
 
     if not datasets:
         return jsonify({
             "error": "No hay datasets disponibles para descargar"
         }), 404
 
-    # Crear directorio temporal
-    temp_dir = tempfile.mkdtemp()
-    zip_path = os.path.join(temp_dir, "all_datasets.zip")
-
-    try:
-        with ZipFile(zip_path, "w") as zipf:
-            files_added = False
-            for dataset in datasets:
-                if not dataset.files():
-                    continue
-                dataset_files_processed = False
-                for file in dataset.files():
-                    try:
-                        file_path = f"uploads/user_{dataset.user_id}/dataset_{dataset.id}/"
-                        full_path = os.path.join(file_path, file.name)
-                        if not os.path.exists(full_path):
-                            logger.warning(f"File not found: {full_path}")
-                            continue
-
-                        # Leer y transformar contenido
-                        try:
-                            if format == "DIMACS":
-                                transformed_file_path, original_filename = transform_to_dimacs(file.id)
-                                new_filename = f"{original_filename}_cnf.txt"
-                            elif format == "GLENCOE":
-                                transformed_file_path, original_filename = transform_to_glencoe(file.id)
-                                new_filename = f"{original_filename}_glencoe.txt"
-                            elif format == "SPLOT":
-                                transformed_file_path, original_filename = transform_to_splot(file.id)
-                                new_filename = f"{original_filename}_splot.txt"
-                            else:  # UVL
-                                transformed_file_path = full_path
-                                new_filename = file.name
-
-                            with open(transformed_file_path, "r") as transformed_file:
-                                content = transformed_file.read()
-
-                            # Añadir al ZIP
-                            zip_path = os.path.join(f"dataset_{dataset.id}", new_filename)
-                            with zipf.open(zip_path, "w") as zipfile:
-                                zipfile.write(content.encode())
-                                files_added = True
-                                dataset_files_processed = True
-
-                        except Exception as e:
-                            logger.error(f"Error processing file {file.name}: {str(e)}")
-                            continue
-
-                    except Exception as e:
-                        logger.error(f"Error with file in dataset {dataset.id}: {str(e)}")
-                        continue
-
-                if not dataset_files_processed:
-                    logger.warning(f"No files were processed for dataset {dataset.id}")
-
-            # Si no se añadió ningún archivo, crear un ZIP vacío pero válido
-            if not files_added:
-                # Añadir un archivo README al ZIP
-                with zipf.open("README.txt", "w") as readme:
-                    readme.write(b"No files were available for download in the selected format.")
-
-        # Enviar ZIP
-        return send_from_directory(
-            temp_dir,
-            "all_datasets.zip",
-            as_attachment=True,
-            mimetype="application/zip"
-        )
-
-    except Exception as e:
-        logger.error(f"Error creating ZIP file: {str(e)}")
-        return jsonify({
-            "error": "Error al crear el archivo ZIP"
-        }), 500
-
-    finally:
-        # Limpiar archivos temporales
-        try:
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-        except Exception as e:
-            logger.error(f"Error cleaning temporary files: {str(e)}")
-
-
-def transform_to_dimacs(file_id):
-    temp_file = tempfile.NamedTemporaryFile(suffix='.dimacs', delete=False)
-    try:
-        hubfile = HubfileService().get_by_id(file_id)
-        fm = UVLReader(hubfile.get_path()).transform()
-        sat = FmToPysat(fm).transform()
-        DimacsWriter(temp_file.name, sat).transform()
-
-        return temp_file.name, hubfile.name
-    finally:
-        pass
-
-
-def transform_to_splot(file_id):
-    temp_file = tempfile.NamedTemporaryFile(suffix='.splot', delete=False)
-    try:
-        hubfile = HubfileService().get_by_id(file_id)
-        fm = UVLReader(hubfile.get_path()).transform()
-
-        SPLOTWriter(temp_file.name, fm).transform()
-
-        return temp_file.name, hubfile.name
-    finally:
-        pass
-
-
-def transform_to_glencoe(file_id):
-    temp_file = tempfile.NamedTemporaryFile(suffix='.glencoe', delete=False)
-    try:
-        hubfile = HubfileService().get_by_id(file_id)
-        fm = UVLReader(hubfile.get_path()).transform()
-
-        GlencoeWriter(temp_file.name, fm).transform()
-
-        return temp_file.name, hubfile.name
-    finally:
-        pass
+    # The archive is prebuilt in the background, a missing or outdated one is (re)built incrementally
+    archive = archive_service.get_archive(format, datasets)
+    if archive is None or archive["stale"]:
+        archive_service.schedule_build(format)
+        archive = archive_service.get_archive(format, datasets) or archive
+
+    if archive is None:
+        response = jsonify({"message": "El archivo ZIP se está generando, inténtalo de nuevo en unos segundos"})
+        response.headers["Retry-After"] = str(ARCHIVE_RETRY_AFTER)
+        return response, 202
+
+    return send_file(
+        archive["path"],
+        mimetype="application/zip",
+        as_attachment=True,
+        download_name="all_datasets.zip",
+        etag=archive["etag"],
+        conditional=True,
+        max_age=0,
+    )
 
 
 @dataset_bp.route("/user/<int:user_id>/datasets")
@@ -612,5 +434,6 @@ def user_datasets(user_id):
     return render_template(
         "dataset/user_datasets.html",
         datasets=datasets,
+        fragment_versions=dataset_service.get_fragment_versions(datasets),
         user=user
     )
@@ -1,6 +1,8 @@
 import os
 import shutil
 from app.modules.auth.models import User
+from app.modules.dataset.services import TagService
+from app.modules.explore.services import SearchIndexService
 from app.modules.featuremodel.models import FMMetaData, FeatureModel
 from app.modules.hubfile.models import Hubfile
 from core.seeders.BaseSeeder import BaseSeeder
@@ -27,7 +29,7 @@ class DataSetSeeder(BaseSeeder):
             raise Exception("Users not found. Please seed users first.")
 
         # Create DSMetrics instance
-        ds_metrics = DSMetrics(number_of_models='5', number_of_features='50')
+        ds_metrics = DSMetrics(number_of_models=5, number_of_features=50)
         seeded_ds_metrics = self.seed([ds_metrics])[0]
 
         # Create DSMetaData instances
@@ -143,3 +145,12 @@ class DataSetSeeder(BaseSeeder):
                 feature_model_id=feature_model.id
             )
             self.seed([uvl_file])
+            dataset.files_count += 1
+            dataset.total_size_bytes += uvl_file.size
+
+        # Build the tag table and the search index for the seeded datasets (committing the file aggregates)
+        tag_service = TagService()
+        search_index_service = SearchIndexService()
+        for dataset in seeded_datasets:
+            tag_service.set_dataset_tags(dataset, dataset.ds_meta_data.tags)
+            search_index_service.index_dataset(dataset)
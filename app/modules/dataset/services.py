@@ -1,16 +1,25 @@
+import fcntl
+import io
 import logging
 import os
 import hashlib
 import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
 from typing import Optional
 import uuid
 import json
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
-from flask import request
 from app import db
 
 from app.modules.auth.services import AuthenticationService
-from app.modules.dataset.models import DSViewRecord, DataSet, DSMetaData
+from app.modules.dataset.models import DSDownloadRecord, DSViewRecord, DataSet, DSMetaData, Tag
 from app.modules.dataset.repositories import (
     AuthorRepository,
     DOIMappingRepository,
@@ -18,51 +27,178 @@ from app.modules.dataset.repositories import (
     DSMetaDataRepository,
     DSViewRecordRepository,
     DataSetRepository,
-    DSMetricsRepository
+    DSMetricsRepository,
+    StatsCounterRepository,
+    TagRepository
 )
+from app.modules.explore.services import SearchIndexService
+from app.modules.flamapy.services import FlamapyService, HubfileConversionService, UVLValidationService
+from app.modules.featuremodel.models import FeatureModel
 from app.modules.featuremodel.repositories import FMMetaDataRepository, FeatureModelRepository
+from app.modules.hubfile.models import HubfileDownloadRecord, HubfileViewRecord
 from app.modules.hubfile.repositories import (
     HubfileDownloadRecordRepository,
     HubfileRepository,
     HubfileViewRecordRepository
 )
+from core.managers.cache_manager import get_cache
+from core.managers.record_buffer_manager import listens_for_records
+from core.managers.task_manager import submit_task
 from core.services.BaseService import BaseService
 
 logger = logging.getLogger(__name__)
 
+# Counter of every kind of tracking record: (counter name, scope, column with the id of the viewed object)
+RECORD_COUNTERS = {
+    DSViewRecord: ("dataset_views", "dataset", "dataset_id"),
+    DSDownloadRecord: ("dataset_downloads", "dataset", "dataset_id"),
+    HubfileViewRecord: ("file_views", "file", "file_id"),
+    HubfileDownloadRecord: ("file_downloads", "file", "file_id"),
+}
+
+# Counters with a global row, read by the public index in a single query
+GLOBAL_COUNTERS = ("dataset_views", "dataset_downloads", "file_views", "file_downloads", "feature_models")
+
+ZIP_CHUNK_SIZE = 64 * 1024
+
+LATEST_DATASETS_LIMIT = 5
+
+# Resolution of every requested DOI ({} for unknown ones, cached for DOI_NEGATIVE_CACHE_TTL seconds)
+DOI_CACHE = "doi"
+
+INGESTION_CHUNK_SIZE = 64 * 1024
+
+ARCHIVES_DIRECTORY = "archives"
+ARCHIVE_FORMATS = ("DIMACS", "GLENCOE", "SPLOT", "UVL")
+
 
 def calculate_checksum_and_size(file_path):
-    file_size = os.path.getsize(file_path)
     with open(file_path, "rb") as file:
-        content = file.read()
-        hash_md5 = hashlib.md5(content).hexdigest()
-        return hash_md5, file_size
+        reader = HashingReader(file)
+        while reader.read(INGESTION_CHUNK_SIZE):
+            pass
+        return reader.hash_md5.hexdigest(), reader.size
 
 
 def features_counter(uvl_file):
+    return ingest_uvl(uvl_file).features
+
+
+@dataclass
+class UVLIngestion:
+    checksum: str
+    size: int
+    features: int
+    hierarchy: dict = field(default_factory=dict)
+
+    def to_json(self) -> str:
+        return json.dumps(self.hierarchy)
+
+
+class HashingReader(io.RawIOBase):
+    """
+    Raw reader that updates an MD5 hash and a byte count with everything read from the wrapped binary file.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.hash_md5 = hashlib.md5()
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        read = self.file.readinto(buffer)
+        self.hash_md5.update(memoryview(buffer)[:read])
+        self.size += read
+        return read
+
+
+def ingest_uvl(file_path, chunk_size=INGESTION_CHUNK_SIZE) -> UVLIngestion:
+    """
+    Reads a UVL file once, in chunks of chunk_size bytes, and computes its MD5 checksum, size in bytes, number of
+    features and indentation hierarchy (the tree returned by DataSetService.parse_uvl_to_json) together.
+    """
     features_count = 0
     inside_features = False
-    keywords = ["mandatory", "or", "optional", "alternative", "{", "}"]
+    features_done = False
+    keywords = ("mandatory", "or", "optional", "alternative", "{", "}")
 
-    with open(uvl_file, 'r') as file:
-        for line in file:
+    hierarchy = {}
+    # (indentation, dict) of the open ancestors of the next line, so every line is inserted in O(1)
+    level_stack = []
 
+    with open(file_path, "rb") as file:
+        reader = HashingReader(file)
+        for line in io.TextIOWrapper(io.BufferedReader(reader, buffer_size=chunk_size)):
             clean_line = line.strip()
 
-            # Buscamos las features
-            if clean_line == "features":
-                inside_features = True
+            # Contar las features del bloque "features", que termina en la primera línea sin indentar
+            if not features_done:
+                if clean_line == "features":
+                    inside_features = True
+                elif inside_features and not line.startswith(" "):
+                    features_done = True
+                elif inside_features and not clean_line.startswith(keywords):
+                    features_count += 1
+
+            if not clean_line:  # Ignorar líneas vacías
                 continue
 
-            # Paramos al salir de features
-            if inside_features and not line.startswith(" "):
-                break
+            # Ajustar el stack de niveles según el nivel de indentación actual
+            indent_level = len(line) - len(line.lstrip())
+            while level_stack and level_stack[-1][0] >= indent_level:
+                level_stack.pop()
 
-            if inside_features:
-                if not clean_line.startswith(tuple(keywords)):
-                    features_count += 1
+            node = {}
+            (level_stack[-1][1] if level_stack else hierarchy)[clean_line] = node
+            level_stack.append((indent_level, node))
 
-    return features_count
+    return UVLIngestion(
+        checksum=reader.hash_md5.hexdigest(), size=reader.size, features=features_count, hierarchy=hierarchy
+    )
+
+
+class ZipStreamBuffer(io.RawIOBase):
+    # Unseekable sink, so ZipFile writes data descriptors instead of seeking back to fill in the headers
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_zip(entries, chunk_size=ZIP_CHUNK_SIZE):
+    """
+    Yields a ZIP archive of (arcname, source) entries as it is built, reading each file in chunks,
+    so memory use does not depend on the size of the files and nothing is written to disk. The source
+    is a file path or a binary file that is already open, which is closed once it has been read.
+    """
+    buffer = ZipStreamBuffer()
+    with ZipFile(buffer, "w", compression=ZIP_DEFLATED) as zipf:
+        for arcname, source in entries:
+            source = open(source, "rb") if isinstance(source, str) else source
+            with source, zipf.open(arcname, "w") as target:
+                while chunk := source.read(chunk_size):
+                    target.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    yield buffer.drain()
 
 
 class DataSetService(BaseService):
@@ -78,6 +214,10 @@ class DataSetService(BaseService):
         self.dsviewrecord_repostory = DSViewRecordRepository()
         self.hubfileviewrecord_repository = HubfileViewRecordRepository()
         self.dsmetrics_repository = DSMetricsRepository()
+        self.stats_counter_service = StatsCounterService()
+        self.search_index_service = SearchIndexService()
+        self.tag_service = TagService()
+        self.validation_service = UVLValidationService()
 
     def move_feature_models(self, dataset: DataSet):
         current_user = AuthenticationService().get_authenticated_user()
@@ -101,6 +241,9 @@ class DataSetService(BaseService):
     def get_unsynchronized_dataset(self, current_user_id: int, dataset_id: int) -> DataSet:
         return self.repository.get_unsynchronized_dataset(current_user_id, dataset_id)
 
+    def get_with_metadata(self, dataset_id: int) -> Optional[DataSet]:
+        return self.repository.get_with_metadata(dataset_id)
+
     def latest_synchronized(self):
         return self.repository.latest_synchronized()
 
@@ -108,7 +251,7 @@ class DataSetService(BaseService):
         return self.repository.count_synchronized_datasets()
 
     def count_feature_models(self):
-        return self.feature_model_service.count_feature_models()
+        return self.stats_counter_service.get_global("feature_models")
 
     def count_authors(self) -> int:
         return self.author_repository.count()
@@ -117,69 +260,35 @@ class DataSetService(BaseService):
         return self.dsmetadata_repository.count()
 
     def total_dataset_downloads(self) -> int:
-        return self.dsdownloadrecord_repository.total_dataset_downloads()
+        return self.stats_counter_service.get_global("dataset_downloads")
 
     def total_dataset_views(self) -> int:
-        return self.dsviewrecord_repostory.total_dataset_views()
+        return self.stats_counter_service.get_global("dataset_views")
 
     @staticmethod
     def parse_uvl_to_json(file_path):
-        def add_to_hierarchy(hierarchy, level_stack, key, value=None):
-            # Navegar por la jerarquía según el nivel de indentación
-            current = hierarchy
-            for level in level_stack:
-                current = current.setdefault(level, {})
-
-            # Si el key tiene un valor asociado, lo añadimos
-            if value is not None:
-                current[key] = value
-            else:
-                current[key] = {}
-
-        with open(file_path, 'r') as file:
-            hierarchy = {}
-            level_stack = []
-
-            for line in file:
-                stripped_line = line.strip()
-
-                if not stripped_line:  # Ignorar líneas vacías
-                    continue
-
-                # Determinar el nivel de indentación
-                indent_level = len(line) - len(line.lstrip())
+        return ingest_uvl(file_path).to_json()
 
-                # Ajustar el stack de niveles según el nivel de indentación actual
-                while len(level_stack) > 0 and level_stack[-1][1] >= indent_level:
-                    level_stack.pop()
-
-                key = stripped_line
-                add_to_hierarchy(hierarchy, [lvl[0] for lvl in level_stack], key)
-
-                # Añadir la clave actual al nivel stack con su indentación
-                level_stack.append((key, indent_level))
-
-        # Convertir a JSON
-        return json.dumps(hierarchy)
+    @staticmethod
+    def ingest_uvl_files(folder: str, filenames) -> dict:
+        # Each UVL file is read once, the result is shared by the dataset creation and the deposition
+        return {filename: ingest_uvl(os.path.join(folder, filename)) for filename in filenames}
 
-    def create_from_form(self, form, current_user) -> DataSet:
+    def create_from_form(self, form, current_user, ingestions: dict = None) -> DataSet:
         main_author = {
             "name": f"{current_user.profile.surname}, {current_user.profile.name}",
             "affiliation": current_user.profile.affiliation,
             "orcid": current_user.profile.orcid,
         }
         try:
-
-            features = 0
-            for feature_model in form.feature_models:
-                uvl_filename = feature_model.uvl_filename.data
-                uvl_file_path = 'uploads/temp/' + str(current_user.id) + '/' + uvl_filename
-
-                features += features_counter(uvl_file_path)
+            if ingestions is None:
+                ingestions = self.ingest_uvl_files(
+                    current_user.temp_folder(), [fm.uvl_filename.data for fm in form.feature_models]
+                )
 
             dsmetrics = self.dsmetrics_repository.create(
                 number_of_models=len(form.feature_models),
-                number_of_features=features
+                number_of_features=sum(ingestion.features for ingestion in ingestions.values())
             )
 
             logger.info(f"Creating dsmetadata...: {form.get_dsmetadata()}")
@@ -188,7 +297,13 @@ class DataSetService(BaseService):
                 author = self.author_repository.create(commit=False, ds_meta_data_id=dsmetadata.id, **author_data)
                 dsmetadata.authors.append(author)
 
-            dataset = self.create(commit=False, user_id=current_user.id, ds_meta_data_id=dsmetadata.id)
+            dataset = self.create(
+                commit=False,
+                user_id=current_user.id,
+                ds_meta_data_id=dsmetadata.id,
+                files_count=len(form.feature_models),
+                total_size_bytes=sum(ingestions[fm.uvl_filename.data].size for fm in form.feature_models),
+            )
 
             for feature_model in form.feature_models:
                 uvl_filename = feature_model.uvl_filename.data
@@ -202,13 +317,23 @@ class DataSetService(BaseService):
                 )
 
                 # associated files in feature model
-                file_path = os.path.join(current_user.temp_folder(), uvl_filename)
-                checksum, size = calculate_checksum_and_size(file_path)
-
+                ingestion = ingestions[uvl_filename]
                 file = self.hubfilerepository.create(
-                    commit=False, name=uvl_filename, checksum=checksum, size=size, feature_model_id=fm.id
+                    commit=False,
+                    name=uvl_filename,
+                    checksum=ingestion.checksum,
+                    size=ingestion.size,
+                    feature_model_id=fm.id
                 )
                 fm.files.append(file)
+
+                # Store the validation verdict now, so check_uvl only has to look it up
+                self.validation_service.record(
+                    ingestion.checksum, os.path.join(current_user.temp_folder(), uvl_filename), commit=False
+                )
+
+            self.tag_service.set_dataset_tags(dataset, dsmetadata.tags, commit=False)
+            self.search_index_service.index_dataset(dataset, commit=False)
             self.repository.session.commit()
         except Exception as exc:
             logger.info(f"Exception creating dataset from form...: {exc}")
@@ -217,33 +342,361 @@ class DataSetService(BaseService):
         return dataset
 
     def update_dsmetadata(self, id, **kwargs):
-        return self.dsmetadata_repository.update(id, **kwargs)
+        try:
+            dsmetadata = self.dsmetadata_repository.update(id, commit=False, **kwargs)
+            if dsmetadata and dsmetadata.data_set:
+                self.tag_service.set_dataset_tags(dsmetadata.data_set, dsmetadata.tags, commit=False)
+                # Publishing also goes through here when the DOI is set
+                dsmetadata.data_set.fragment_version = DataSet.fragment_version + 1
+                self.search_index_service.index_dataset(dsmetadata.data_set, commit=False)
+            self.repository.session.commit()
+        except Exception as exc:
+            logger.info(f"Exception updating dataset metadata...: {exc}")
+            self.repository.session.rollback()
+            raise exc
+        if dsmetadata and dsmetadata.data_set and dsmetadata.dataset_doi:
+            DOIMappingService.remember_dataset_doi(dsmetadata.dataset_doi, dsmetadata.data_set.id)
+        return dsmetadata
+
+    @staticmethod
+    def get_fragment_version(dataset: DataSet) -> Optional[str]:
+        # Only published datasets are cached, unpublished ones can still be edited in many ways. created_at keeps a
+        # reused id from matching the fragments of a deleted dataset
+        if not dataset.ds_meta_data.dataset_doi:
+            return None
+        return f"{dataset.created_at.timestamp()}:{dataset.fragment_version}"
+
+    def get_fragment_versions(self, datasets: list) -> dict:
+        # {dataset id: version} for a page of datasets loaded with their metadata
+        return {dataset.id: self.get_fragment_version(dataset) for dataset in datasets}
 
-    def get_uvlhub_doi(self, dataset: DataSet) -> str:
+    @staticmethod
+    def get_uvlhub_doi(dataset: DataSet) -> str:
         domain = os.getenv('DOMAIN', 'localhost')
         return f'http://{domain}/doi/{dataset.ds_meta_data.dataset_doi}'
 
-    def get_deposition_doi(self, dataset: DataSet) -> str:
+    @staticmethod
+    def get_deposition_doi(dataset: DataSet) -> str:
         domain = os.getenv('DOMAIN', 'localhost')
         return f'http://{domain}/fakenodo/{dataset.ds_meta_data.deposition_id}'
 
     def get_datasets_by_user(self, user_id):
-        return db.session.query(DataSet).filter_by(user_id=user_id).all()
+        return (
+            db.session.query(DataSet)
+            .options(*self.repository.serialization_options())
+            .filter_by(user_id=user_id)
+            .all()
+        )
+
+    def serialize_datasets(self, datasets: list) -> list:
+        self.repository.load_serialization_relations(datasets)
+        return [dataset.to_dict() for dataset in datasets]
 
     def get_all_published_datasets(self):
         return db.session.query(DataSet).join(DataSet.ds_meta_data).filter(
             DSMetaData.dataset_doi.isnot(None)).all()
 
 
+class DataSetArchiveService:
+    """
+    Prebuilt archives with every published dataset, one per download format, stored under CACHE_DIR and shared
+    by every worker. A build only appends the datasets published since the previous one, unless a dataset that
+    is already in the archive has changed, which triggers a full rebuild.
+    """
+
+    def __init__(self):
+        self.repository = DataSetRepository()
+        self.flamapy_service = FlamapyService()
+        self.conversion_service = HubfileConversionService()
+
+    @property
+    def directory(self) -> str:
+        directory = os.path.join(current_app.config["CACHE_DIR"], ARCHIVES_DIRECTORY)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def _path(self, format: str, extension: str) -> str:
+        return os.path.join(self.directory, f"all_datasets_{format}.{extension}")
+
+    def published_datasets(self) -> dict:
+        datasets = {}
+        for dataset_id, user_id, dataset_doi, file_id, name, checksum in self.repository.published_files():
+            dataset = datasets.setdefault(str(dataset_id), {"user_id": user_id, "doi": dataset_doi, "files": []})
+            if file_id is not None:
+                dataset["files"].append([file_id, name, checksum])
+        return datasets
+
+    @staticmethod
+    def signatures(datasets: dict) -> dict:
+        return {
+            dataset_id: hashlib.sha1(json.dumps([dataset["doi"], dataset["files"]]).encode()).hexdigest()
+            for dataset_id, dataset in datasets.items()
+        }
+
+    def etag(self, format: str, signatures: dict) -> str:
+        payload = [format, self.flamapy_service.flamapy_version, sorted(signatures.items())]
+        return hashlib.sha1(json.dumps(payload).encode()).hexdigest()
+
+    def load_manifest(self, format: str) -> Optional[dict]:
+        try:
+            with open(self._path(format, "json")) as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+
+    def get_archive(self, format: str, datasets: dict) -> Optional[dict]:
+        manifest = self.load_manifest(format)
+        archive_path = self._path(format, "zip")
+        if manifest is None or not os.path.exists(archive_path):
+            return None
+
+        return {
+            "path": archive_path,
+            "etag": manifest["etag"],
+            "stale": manifest["datasets"] != self.signatures(datasets),
+        }
+
+    def schedule_build(self, format: str):
+        return submit_task(self.build_archive, format, key=f"all_datasets_archive:{format}")
+
+    def schedule_builds(self):
+        # Called whenever a dataset is published so the next download is already served from the archive
+        for format in ARCHIVE_FORMATS:
+            self.schedule_build(format)
+
+    def _add_dataset(self, zipf: ZipFile, dataset_id: str, dataset: dict, format: str) -> int:
+        files = []
+        for file_id, name, checksum in dataset["files"]:
+            full_path = os.path.join("uploads", f"user_{dataset['user_id']}", f"dataset_{dataset_id}", name)
+            if not os.path.exists(full_path):
+                logger.warning(f"File not found: {full_path}")
+                continue
+            files.append((file_id, name, full_path, checksum))
+
+        files_added = 0
+        for arcname, path in self.conversion_service.conversion_entries(files, format):
+            zipf.write(path, arcname=os.path.join(f"dataset_{dataset_id}", arcname))
+            files_added += 1
+
+        if not files_added:
+            logger.warning(f"No files were processed for dataset {dataset_id}")
+        return files_added
+
+    def build_archive(self, format: str):
+        with open(self._path(format, "lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info(f"The {format} archive is already being built by another worker")
+                return
+
+            datasets = self.published_datasets()
+            signatures = self.signatures(datasets)
+            archive_path = self._path(format, "zip")
+            manifest = self.load_manifest(format)
+
+            incremental = (
+                manifest is not None
+                and manifest["files_count"] > 0
+                and os.path.exists(archive_path)
+                and all(
+                    signatures.get(dataset_id) == signature for dataset_id, signature in manifest["datasets"].items()
+                )
+            )
+            files_count = manifest["files_count"] if incremental else 0
+            new_datasets = [
+                dataset_id for dataset_id in datasets if not incremental or dataset_id not in manifest["datasets"]
+            ]
+
+            # Build on a copy and swap it in, so the archive being served is never modified
+            file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".")
+            os.close(file_descriptor)
+            try:
+                if incremental:
+                    shutil.copyfile(archive_path, temp_path)
+
+                with ZipFile(temp_path, "a" if incremental else "w", compression=ZIP_DEFLATED) as zipf:
+                    for dataset_id in new_datasets:
+                        files_count += self._add_dataset(zipf, dataset_id, datasets[dataset_id], format)
+
+                    # Si no se añadió ningún archivo, crear un ZIP vacío pero válido
+                    if not files_count:
+                        zipf.writestr("README.txt", "No files were available for download in the selected format.")
+
+                os.replace(temp_path, archive_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+            manifest = {"etag": self.etag(format, signatures), "datasets": signatures, "files_count": files_count}
+            file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".")
+            with os.fdopen(file_descriptor, "w") as manifest_file:
+                json.dump(manifest, manifest_file)
+            os.replace(temp_path, self._path(format, "json"))
+
+            logger.info(f"Built the {format} archive with {len(new_datasets)} new datasets (incremental={incremental})")
+
+
 class AuthorService(BaseService):
     def __init__(self):
         super().__init__(AuthorRepository())
 
 
+class TagService(BaseService):
+    def __init__(self):
+        super().__init__(TagRepository())
+
+    def set_dataset_tags(self, dataset: DataSet, tags: str, commit: bool = True):
+        dataset.tags = self.repository.get_or_create_many(Tag.parse(tags))
+        if commit:
+            self.repository.session.commit()
+        else:
+            self.repository.session.flush()
+
+
+class StatsCounterService(BaseService):
+    def __init__(self):
+        super().__init__(StatsCounterRepository())
+        self.hubfile_repository = HubfileRepository()
+
+    def count_records(self, model, rows: list, inserted: int):
+        # rows share the same viewed or downloaded object, inserted of them were new
+        if not inserted:
+            return
+        name, scope, column = RECORD_COUNTERS[model]
+        self.repository.increment(name, amount=inserted)
+        if rows[0][column] is not None:
+            self.repository.increment(name, scope, rows[0][column], inserted)
+
+    def get_global(self, name: str) -> int:
+        return self.repository.get_value(name)
+
+    def global_counters(self) -> dict:
+        values = self.repository.get_values([(name, "global", 0) for name in GLOBAL_COUNTERS])
+        return {name: value for (name, _, _), value in values.items()}
+
+    def dataset_counters(self, dataset: DataSet) -> dict:
+        # Views and downloads of the dataset and of each of its files, without loading the files themselves
+        file_names = dict(self.hubfile_repository.get_names_by_dataset(dataset.id))
+        file_ids = list(file_names)
+        values = self.repository.get_values(
+            [(name, "dataset", dataset.id) for name in ("dataset_views", "dataset_downloads")]
+            + [(name, "file", file_id) for file_id in file_ids for name in ("file_views", "file_downloads")]
+        )
+        return {
+            "views": values[("dataset_views", "dataset", dataset.id)],
+            "downloads": values[("dataset_downloads", "dataset", dataset.id)],
+            "files": {
+                file_id: {
+                    "name": file_names[file_id],
+                    "views": values[("file_views", "file", file_id)],
+                    "downloads": values[("file_downloads", "file", file_id)],
+                }
+                for file_id in file_ids
+            },
+        }
+
+
+class StatsSnapshotService(BaseService):
+    """
+    Landing page statistics and latest datasets as plain data. The snapshot is kept in memory by each process and
+    served as is for STATS_SNAPSHOT_TTL seconds; after that the stale snapshot is still served while a background
+    task computes the next one, so only the first request of a process waits on the database.
+    """
+
+    # (monotonic time it was computed at, snapshot), replaced as a whole so readers never need a lock
+    _snapshot = None
+
+    def __init__(self):
+        super().__init__(DataSetRepository())
+        self.stats_counter_repository = StatsCounterRepository()
+
+    def get_snapshot(self) -> dict:
+        current = StatsSnapshotService._snapshot
+        if current is None:
+            return self.refresh()
+
+        computed_at, snapshot = current
+        if time.monotonic() - computed_at >= current_app.config.get("STATS_SNAPSHOT_TTL", 30):
+            submit_task(refresh_stats_snapshot, key="stats_snapshot")
+            # Already the new one when the task ran inline
+            snapshot = StatsSnapshotService._snapshot[1]
+        return snapshot
+
+    def refresh(self) -> dict:
+        snapshot = self.compute()
+        StatsSnapshotService._snapshot = (time.monotonic(), snapshot)
+        return snapshot
+
+    def compute(self) -> dict:
+        counters = self.stats_counter_repository.get_global_values(
+            GLOBAL_COUNTERS, synchronized_datasets=self.repository.count_synchronized_subquery()
+        )
+        latest = self.repository.latest_synchronized_with_metadata(LATEST_DATASETS_LIMIT)
+
+        return {
+            "counters": counters,
+            "datasets": [
+                {
+                    "id": dataset.id,
+                    "title": dataset.ds_meta_data.title,
+                    "description": dataset.ds_meta_data.description,
+                    "publication_type": dataset.get_cleaned_publication_type(),
+                    "created_at": dataset.created_at,
+                    "authors": [author.to_dict() for author in dataset.ds_meta_data.authors],
+                    "tags": [tag.strip() for tag in (dataset.ds_meta_data.tags or "").split(",") if tag.strip()],
+                    "doi": DataSetService.get_uvlhub_doi(dataset),
+                    "total_size": dataset.get_file_total_size_for_human(),
+                }
+                for dataset in latest
+            ],
+        }
+
+
+def refresh_stats_snapshot():
+    StatsSnapshotService().refresh()
+
+
+@listens_for_records(*RECORD_COUNTERS)
+def count_tracking_records(model, rows: list, inserted: int):
+    # Runs in the same transaction that writes the buffered records
+    StatsCounterService().count_records(model, rows, inserted)
+
+
+@event.listens_for(Session, "after_flush")
+def track_feature_model_count(session, flush_context):
+    delta = (
+        sum(isinstance(instance, FeatureModel) for instance in session.new)
+        - sum(isinstance(instance, FeatureModel) for instance in session.deleted)
+    )
+    if delta:
+        session.info["feature_models_delta"] = session.info.get("feature_models_delta", 0) + delta
+
+
+@event.listens_for(Session, "before_commit")
+def count_feature_models(session):
+    # The feature_models counter is updated in the same transaction that creates or deletes them. Only
+    # pending feature models need flushing first, commits of anything else leave the flush to the commit
+    if any(isinstance(instance, FeatureModel) for instance in (*session.new, *session.deleted)):
+        session.flush()
+    delta = session.info.pop("feature_models_delta", 0)
+    if delta:
+        StatsCounterRepository(session).increment("feature_models", amount=delta)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_feature_model_count(session):
+    session.info.pop("feature_models_delta", None)
+
+
 class DSDownloadRecordService(BaseService):
     def __init__(self):
         super().__init__(DSDownloadRecordRepository())
 
+    def record_download(self, dataset_id: int, user_cookie: str) -> bool:
+        # Buffered and deduplicated per (user, dataset, cookie), written in batches
+        return self.repository.buffer_new_record(dataset_id, user_cookie)
+
 
 class DSMetaDataService(BaseService):
     def __init__(self):
@@ -260,22 +713,14 @@ class DSViewRecordService(BaseService):
     def __init__(self):
         super().__init__(DSViewRecordRepository())
 
-    def the_record_exists(self, dataset: DataSet, user_cookie: str):
-        return self.repository.the_record_exists(dataset, user_cookie)
-
-    def create_new_record(self, dataset: DataSet,  user_cookie: str) -> DSViewRecord:
-        return self.repository.create_new_record(dataset, user_cookie)
-
     def create_cookie(self, dataset: DataSet) -> str:
 
         user_cookie = request.cookies.get("view_cookie")
         if not user_cookie:
             user_cookie = str(uuid.uuid4())
 
-        existing_record = self.the_record_exists(dataset=dataset, user_cookie=user_cookie)
-
-        if not existing_record:
-            self.create_new_record(dataset=dataset, user_cookie=user_cookie)
+        # Buffered and deduplicated per (user, dataset, cookie), written in batches
+        self.repository.buffer_new_record(dataset=dataset, user_cookie=user_cookie)
 
         return user_cookie
 
@@ -283,6 +728,34 @@ class DSViewRecordService(BaseService):
 class DOIMappingService(BaseService):
     def __init__(self):
         super().__init__(DOIMappingRepository())
+        self.dataset_repository = DataSetRepository()
+
+    def resolve(self, doi: str, refresh: bool = False) -> dict:
+        # {"new_doi": ...} for an old DOI, {"dataset_id": ...} for a current one, {} for an unknown one.
+        # refresh drops the cached resolution and reads it again from the database
+        cache = get_cache(DOI_CACHE)
+        if refresh:
+            cache.delete(doi)
+        else:
+            resolution = cache.get(doi)
+            if resolution is not None:
+                return resolution
+
+        new_doi = self.get_new_doi(doi)
+        if new_doi:
+            resolution = {"new_doi": new_doi}
+        else:
+            dataset_id = self.dataset_repository.get_id_by_doi(doi)
+            resolution = {"dataset_id": dataset_id} if dataset_id else {}
+
+        # DOIs never change once assigned, unknown ones may be assigned by the next publication
+        cache.set(doi, resolution, ttl=None if resolution else current_app.config.get("DOI_NEGATIVE_CACHE_TTL", 30))
+        return resolution
+
+    @staticmethod
+    def remember_dataset_doi(doi: str, dataset_id: int):
+        # Replaces a cached miss for the DOI that has just been assigned
+        get_cache(DOI_CACHE).set(doi, {"dataset_id": dataset_id})
 
     def get_new_doi(self, old_doi: str) -> str:
         doi_mapping = self.repository.get_new_doi(old_doi)
@@ -297,7 +770,8 @@ class SizeService():
     def __init__(self):
         pass
 
-    def get_human_readable_size(self, size: int) -> str:
+    @staticmethod
+    def get_human_readable_size(size: int) -> str:
         if size < 1024:
             return f'{size} bytes'
         elif size < 1024 ** 2:
@@ -0,0 +1,96 @@
+"""
+Benchmark of DataSetService.parse_uvl_to_json against the previous implementation, which walked the hierarchy
+from the root for every line. Run it from the project root with:
+
+    python -m app.modules.dataset.tests.benchmark_parse_uvl [--sizes 10000 50000 100000] [--depth 200]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from app.modules.dataset.services import DataSetService
+
+
+def previous_parse_uvl_to_json(file_path):
+    # Implementación anterior, cuadrática en profundidad x líneas
+    def add_to_hierarchy(hierarchy, level_stack, key, value=None):
+        current = hierarchy
+        for level in level_stack:
+            current = current.setdefault(level, {})
+
+        if value is not None:
+            current[key] = value
+        else:
+            current[key] = {}
+
+    with open(file_path, 'r') as file:
+        hierarchy = {}
+        level_stack = []
+
+        for line in file:
+            stripped_line = line.strip()
+
+            if not stripped_line:
+                continue
+
+            indent_level = len(line) - len(line.lstrip())
+
+            while len(level_stack) > 0 and level_stack[-1][1] >= indent_level:
+                level_stack.pop()
+
+            key = stripped_line
+            add_to_hierarchy(hierarchy, [lvl[0] for lvl in level_stack], key)
+
+            level_stack.append((key, indent_level))
+
+    return json.dumps(hierarchy)
+
+
+def generate_uvl(file, features: int, depth: int):
+    # Chains of optional features up to depth levels, restarting from the root when the limit is reached
+    file.write("features\n    Root\n")
+    level = 0
+    for feature in range(features):
+        if level == depth:
+            level = 0
+        indent = "    " * (2 + 2 * level)
+        file.write(f"{indent}optional\n{indent}    Feature{feature}\n")
+        level += 1
+    file.write("constraints\n    Feature0 => Root\n")
+
+
+def measure(parse, file_path, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(file_path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 25000, 50000, 100000])
+    parser.add_argument("--depth", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'features':>10} {'depth':>6} {'previous (s)':>13} {'current (s)':>12} {'speedup':>8}")
+    for features in args.sizes:
+        with tempfile.NamedTemporaryFile("w", suffix=".uvl", delete=False) as file:
+            generate_uvl(file, features, args.depth)
+
+        try:
+            assert previous_parse_uvl_to_json(file.name) == DataSetService.parse_uvl_to_json(file.name)
+            previous = measure(previous_parse_uvl_to_json, file.name, args.repeat)
+            current = measure(DataSetService.parse_uvl_to_json, file.name, args.repeat)
+        finally:
+            os.remove(file.name)
+
+        print(f"{features:>10} {args.depth:>6} {previous:>13.3f} {current:>12.3f} {previous / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
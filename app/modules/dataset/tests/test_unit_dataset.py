@@ -1,23 +1,52 @@
 import pytest
 from app import db
 from app.modules.conftest import login, logout
-from app.modules.dataset.models import DataSet, DSMetrics, DSMetaData, PublicationType
+from app.modules.dataset.models import DataSet, DOIMapping, DSMetrics, DSMetaData, PublicationType
+from app.modules.dataset.repositories import DataSetRepository
+from app.modules.dataset.tests.benchmark_parse_uvl import generate_uvl, previous_parse_uvl_to_json
 from app.modules.featuremodel.models import FeatureModel
 from app.modules.hubfile.models import Hubfile
 from app.modules.featuremodel.models import FMMetaData
 from app.modules.auth.models import User
 from app.modules.profile.models import UserProfile
-from app.modules.dataset.services import DataSetService, features_counter
+from app.modules.dataset.services import (
+    DataSetArchiveService,
+    DataSetService,
+    DOI_CACHE,
+    DOIMappingService,
+    features_counter,
+    ingest_uvl,
+    stream_zip,
+)
+from app.modules.flamapy import services as flamapy_services
+from app.modules.flamapy.services import CONVERSIONS_CACHE
+from core.managers.cache_manager import get_artifact_cache, get_cache
+from core.managers.task_manager import TaskManager
+import hashlib
+import io
 import json
 import os
+import shutil
+import threading
+from concurrent.futures import Future
+from unittest.mock import patch
+from zipfile import ZipFile
 from flask import url_for
+from sqlalchemy import event
+
+UVL_EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uvl_examples")
 
 
 @pytest.fixture(scope="module")
-def test_client(test_client):
+def test_client(test_client, tmp_path_factory):
     """
     Extends the test_client fixture to add additional specific data for module testing.
     """
+    # Some paths are relative to WORKING_DIR and others to the current directory, point both to a temporary one
+    working_dir = tmp_path_factory.mktemp("working_dir")
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setenv("WORKING_DIR", str(working_dir))
+    monkeypatch.chdir(working_dir)
     with test_client.application.app_context():
 
         ds_metrics_test = DSMetrics(
@@ -38,7 +67,9 @@ def test_client(test_client):
 
         dataset_test = DataSet(
             user_id=1,
-            ds_meta_data_id=1
+            ds_meta_data_id=1,
+            files_count=3,
+            total_size_bytes=1024 + 2048 + 4096
         )
         db.session.add(dataset_test)
 
@@ -101,7 +132,9 @@ def test_client(test_client):
 
         dataset_test_unsync = DataSet(
             user_id=2,
-            ds_meta_data_id=2
+            ds_meta_data_id=2,
+            files_count=2,
+            total_size_bytes=512 + 1024
         )
         db.session.add(dataset_test_unsync)
 
@@ -141,6 +174,8 @@ def test_client(test_client):
 
     yield test_client
 
+    monkeypatch.undo()
+
 
 def test_download_dataset_succesful(test_client):
     response = test_client.get("/dataset/download/1/UVL")
@@ -153,6 +188,145 @@ def test_download_dataset_succesful(test_client):
     assert response.status_code == 200
 
 
+def test_download_dataset_streams_zip(test_client):
+    dataset_folder = "uploads/user_1/dataset_1"
+    os.makedirs(os.path.join(dataset_folder, "nested"), exist_ok=True)
+    with open(os.path.join(dataset_folder, "file1.uvl"), "w") as file:
+        file.write("features\n    Root")
+    with open(os.path.join(dataset_folder, "nested", "file2.uvl"), "w") as file:
+        file.write("features\n    Other")
+
+    try:
+        response = test_client.get("/dataset/download/1")
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == "application/zip"
+        assert "dataset_1.zip" in response.headers["Content-Disposition"]
+
+        with ZipFile(io.BytesIO(response.get_data())) as zipf:
+            assert sorted(zipf.namelist()) == ["dataset_1/file1.uvl", "dataset_1/nested/file2.uvl"]
+            assert zipf.read("dataset_1/nested/file2.uvl") == b"features\n    Other"
+    finally:
+        shutil.rmtree(dataset_folder)
+
+
+def test_download_dataset_format_streams_cached_conversions(test_client):
+    dataset_folder = "uploads/user_1/dataset_1"
+    os.makedirs(dataset_folder, exist_ok=True)
+    for name in ["file1.uvl", "file2.uvl", "file3.uvl"]:
+        shutil.copy(os.path.join(UVL_EXAMPLES, name), dataset_folder)
+    get_artifact_cache(CONVERSIONS_CACHE).clear()
+
+    try:
+        with patch.object(flamapy_services, "write_conversion", wraps=flamapy_services.write_conversion) as write:
+            for _ in range(2):
+                response = test_client.get("/dataset/download/1/DIMACS")
+                assert response.status_code == 200
+                assert response.is_streamed
+                with ZipFile(io.BytesIO(response.get_data())) as zipf:
+                    assert sorted(zipf.namelist()) == ["file1.uvl_cnf.txt", "file2.uvl_cnf.txt", "file3.uvl_cnf.txt"]
+                    assert b"p cnf" in zipf.read("file1.uvl_cnf.txt")
+
+        # The second download is served from the conversion cache
+        assert write.call_count == 3
+    finally:
+        shutil.rmtree(dataset_folder)
+        get_artifact_cache(CONVERSIONS_CACHE).clear()
+
+
+def test_stream_zip_yields_archive_in_chunks(tmp_path):
+    large_file = tmp_path / "large.uvl"
+    large_file.write_bytes(os.urandom(300 * 1024))
+
+    chunks = list(stream_zip([("large.uvl", str(large_file))], chunk_size=16 * 1024))
+
+    assert len(chunks) > 2
+    assert max(len(chunk) for chunk in chunks) < 100 * 1024
+    with ZipFile(io.BytesIO(b"".join(chunks))) as zipf:
+        assert zipf.read("large.uvl") == large_file.read_bytes()
+
+
+def test_download_all_serves_prebuilt_archive_with_etag(test_client):
+    dataset_folder = "uploads/user_1/dataset_1"
+    os.makedirs(dataset_folder, exist_ok=True)
+    shutil.copy(os.path.join(UVL_EXAMPLES, "file1.uvl"), dataset_folder)
+
+    try:
+        response = test_client.get("/dataset/download_all?format=UVL")
+        assert response.status_code == 200
+        assert response.headers["ETag"]
+        with ZipFile(io.BytesIO(response.data)) as zipf:
+            assert zipf.namelist() == ["dataset_1/file1.uvl"]
+
+        response = test_client.get(
+            "/dataset/download_all?format=UVL", headers={"If-None-Match": response.headers["ETag"]}
+        )
+        assert response.status_code == 304
+    finally:
+        shutil.rmtree(dataset_folder)
+
+
+def test_task_manager_forgets_tasks_finished_before_registration(test_client):
+    """
+    Una tarea que ya ha terminado cuando se registra su callback (p. ej. build_archive
+    saliendo porque otro proceso tiene el lock) no bloquea el gestor de tareas.
+    """
+    class InlineExecutor:
+        def submit(self, func, *args):
+            future = Future()
+            future.set_result(func(*args))
+            return future
+
+    app = test_client.application
+    app.config["TASKS_EAGER"] = False
+    manager = TaskManager(app)
+    manager.executor = InlineExecutor()
+    try:
+        worker = threading.Thread(target=manager.submit, args=(lambda: 1,), kwargs={"key": "archive"}, daemon=True)
+        worker.start()
+        worker.join(5)
+        assert not worker.is_alive()
+        assert manager.pending == {}
+        assert manager.submit(lambda: 2, key="archive").result() == 2
+    finally:
+        app.config["TASKS_EAGER"] = True
+
+
+def test_build_archive_only_adds_new_datasets(test_client):
+    for dataset_id in (1, 9):
+        dataset_folder = f"uploads/user_1/dataset_{dataset_id}"
+        os.makedirs(dataset_folder, exist_ok=True)
+        shutil.copy(os.path.join(UVL_EXAMPLES, "file1.uvl"), dataset_folder)
+
+    published = {"1": {"user_id": 1, "doi": "10.1234/dataset", "files": [[1, "file1.uvl", "abc123"]]}}
+    service = DataSetArchiveService()
+
+    try:
+        with test_client.application.app_context(), \
+                patch.object(service, "published_datasets", side_effect=lambda: json.loads(json.dumps(published))), \
+                patch.object(service, "_add_dataset", wraps=service._add_dataset) as add_dataset:
+            shutil.rmtree(service.directory)
+            service.build_archive("UVL")
+            first_etag = service.load_manifest("UVL")["etag"]
+
+            published["9"] = {"user_id": 1, "doi": "10.1234/dataset9", "files": [[4, "file1.uvl", "abc123"]]}
+            archive = service.get_archive("UVL", published)
+            assert archive["stale"]
+
+            service.build_archive("UVL")
+            archive = service.get_archive("UVL", published)
+
+        # La segunda construcción solo añade el dataset nuevo al archivo existente
+        assert [call.args[1] for call in add_dataset.call_args_list] == ["1", "9"]
+        assert not archive["stale"]
+        assert archive["etag"] != first_etag
+        with ZipFile(archive["path"]) as zipf:
+            assert sorted(zipf.namelist()) == ["dataset_1/file1.uvl", "dataset_9/file1.uvl"]
+    finally:
+        shutil.rmtree("uploads/user_1/dataset_1")
+        shutil.rmtree("uploads/user_1/dataset_9")
+
+
 def test_download_dataset_wrong_format(test_client):
     response = test_client.get("/dataset/download/1/WRONG")
     assert response.status_code == 400
@@ -216,6 +390,39 @@ def test_user_datasets_invalid_user_id(test_client):
     assert len(datasets) == 0
 
 
+def test_serialize_datasets_fixed_number_of_queries(test_client):
+    """
+    Verifica que la serialización en bloque no dispara consultas por dataset ni por fichero.
+    """
+    db.session.expire_all()
+    datasets = DataSet.query.all()
+
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args[2])
+
+    event.listen(db.engine, "before_cursor_execute", count_statement)
+    try:
+        with test_client.application.test_request_context():
+            serialized = DataSetService().serialize_datasets(datasets)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count_statement)
+
+    # dataset + metadata, authors, feature models, files
+    assert len(statements) == 4
+    assert serialized[0]["files_count"] == 3
+    assert serialized[0]["total_size_in_bytes"] == 1024 + 2048 + 4096
+    assert serialized[0]["total_size_in_human_format"] == "7.0 KB"
+
+
+def test_api_list_datasets(test_client):
+    response = test_client.get("/api/v1/datasets/")
+    assert response.status_code == 200
+    assert len(response.json["items"]) == 2
+    assert [file["file_name"] for file in response.json["items"][0]["files"]] == ["file1.uvl", "file2.uvl", "file3.uvl"]
+
+
 # Tests unitarios relaccionados con Fakenodo (Issue #5)
 def test_simple_hierarchy():
     """
@@ -813,3 +1020,174 @@ def test_publish_draft_dataset(test_client):
     response = test_client.get('/doi/10.1234/dataset2', follow_redirects=True)
     logout(test_client)
     assert response.status_code == 200
+
+
+def test_view_dataset_fragments_cached_until_metadata_update(test_client):
+    """
+    Los fragmentos de un dataset publicado se sirven desde caché hasta que
+    update_dsmetadata cambia su versión.
+    """
+    response = test_client.get('/doi/10.1234/dataset/')
+    assert response.status_code == 200
+    assert b"Test Dataset Title" in response.data
+
+    version = DataSetService.get_fragment_version(db.session.get(DataSet, 1))
+    assert version is not None
+
+    # Cambio que no pasa por update_dsmetadata: sigue sirviéndose la versión cacheada
+    db.session.get(DSMetaData, 1).title = "Stale Dataset Title"
+    db.session.commit()
+    response = test_client.get('/doi/10.1234/dataset/')
+    assert b"Test Dataset Title" in response.data
+
+    DataSetService().update_dsmetadata(1, title="Updated Dataset Title")
+    assert DataSetService.get_fragment_version(db.session.get(DataSet, 1)) != version
+    response = test_client.get('/doi/10.1234/dataset/')
+    assert b"Updated Dataset Title" in response.data
+
+    DataSetService().update_dsmetadata(1, title="Test Dataset Title")
+
+
+def test_update_dsmetadata_commits_once(test_client):
+    """
+    La metadata, los tags, la versión de los fragmentos y el índice de búsqueda se
+    guardan en una sola transacción, y se deshacen juntos si algo falla.
+    """
+    dataset = db.session.get(DataSet, 1)
+    version = dataset.fragment_version
+    tags = dataset.ds_meta_data.tags
+    with patch.object(db.session, "commit", wraps=db.session.commit) as commit:
+        DataSetService().update_dsmetadata(1, title="Updated Dataset Title", tags="alpine, dolomites")
+    assert commit.call_count == 1
+
+    with patch("app.modules.explore.services.SearchIndexService.index_dataset", side_effect=RuntimeError("index")):
+        with pytest.raises(RuntimeError):
+            DataSetService().update_dsmetadata(1, title="Broken Dataset Title")
+    dataset = db.session.get(DataSet, 1)
+    assert dataset.ds_meta_data.title == "Updated Dataset Title"
+    assert dataset.fragment_version == version + 1
+
+    DataSetService().update_dsmetadata(1, title="Test Dataset Title", tags=tags)
+
+
+def test_view_dataset_cache_hit_does_not_load_files(test_client):
+    """
+    Con los fragmentos en caché, la vista del dataset solo lee el dataset, los nombres
+    de sus ficheros y los contadores: ni autores, ni perfil, ni modelos.
+    """
+    response = test_client.get('/doi/10.1234/dataset/')
+    assert response.status_code == 200
+
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args[2])
+
+    db.session.expire_all()
+    event.listen(db.engine, "before_cursor_execute", count_statement)
+    try:
+        response = test_client.get('/doi/10.1234/dataset/')
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count_statement)
+
+    assert response.status_code == 200
+    assert b"Test Dataset Title" in response.data
+    assert b"Statistics per model" in response.data
+    loaded = " ".join(statement for statement in statements if statement.lstrip().upper().startswith("SELECT"))
+    assert "ds_meta_data_author" not in loaded
+    assert "user_profile" not in loaded
+    assert "file.size" not in loaded
+
+
+def test_bump_fragment_versions_changes_user_datasets(test_client):
+    """
+    Al editar el perfil se cambia la versión de los fragmentos de todos los datasets
+    del usuario, que muestran su nombre.
+    """
+    dataset = db.session.get(DataSet, 1)
+    version = DataSetService.get_fragment_version(dataset)
+
+    DataSetRepository().bump_fragment_versions(dataset.user_id)
+    db.session.refresh(dataset)
+    assert DataSetService.get_fragment_version(dataset) != version
+
+
+def test_stale_cached_doi_is_resolved_again(test_client):
+    """
+    Si un DOI cacheado como actual pasa a ser un DOI antiguo, se vuelve a resolver
+    sin caché y se redirige al nuevo en lugar de devolver 404.
+    """
+    get_cache(DOI_CACHE).set("10.1234/stale", {"dataset_id": 1})
+    db.session.add(DOIMapping(dataset_doi_old="10.1234/stale", dataset_doi_new="10.1234/dataset"))
+    db.session.commit()
+
+    response = test_client.get('/doi/10.1234/stale/')
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/doi/10.1234/dataset/")
+    assert DOIMappingService().resolve("10.1234/stale") == {"new_doi": "10.1234/dataset"}
+
+    DOIMapping.query.filter_by(dataset_doi_old="10.1234/stale").delete()
+    db.session.commit()
+    get_cache(DOI_CACHE).delete("10.1234/stale")
+
+
+def test_resolve_doi_is_cached_including_unknown_dois(test_client):
+    """
+    Tras la primera resolución, un DOI conocido o desconocido no vuelve a consultar
+    la base de datos y el dataset se carga con una única consulta.
+    """
+    doi_mapping_service = DOIMappingService()
+    assert doi_mapping_service.resolve("10.1234/dataset") == {"dataset_id": 1}
+    assert doi_mapping_service.resolve("10.1234/unknown") == {}
+
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args[2])
+
+    db.session.expire_all()
+    event.listen(db.engine, "before_cursor_execute", count_statement)
+    try:
+        assert doi_mapping_service.resolve("10.1234/dataset") == {"dataset_id": 1}
+        assert doi_mapping_service.resolve("10.1234/unknown") == {}
+        assert len(statements) == 0
+
+        dataset = DataSetService().get_with_metadata(1)
+        assert dataset.ds_meta_data.dataset_doi == "10.1234/dataset"
+        assert len(statements) == 1
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count_statement)
+
+    response = test_client.get('/doi/10.1234/unknown/')
+    assert response.status_code == 404
+
+
+def test_ingest_uvl_single_pass(tmp_path):
+    """
+    Verifica que la ingesta en un solo paso calcula checksum, tamaño, features y jerarquía aunque se lea
+    en bloques pequeños que parten caracteres multibyte
+    """
+    content = "features\n    Café\n        optional\n            Leche\n    Té\nconstraints\n    Café => Té\n"
+    file_path = tmp_path / "model.uvl"
+    file_path.write_text(content, encoding="utf-8")
+
+    ingestion = ingest_uvl(str(file_path), chunk_size=5)
+
+    assert ingestion.checksum == hashlib.md5(content.encode("utf-8")).hexdigest()
+    assert ingestion.size == len(content.encode("utf-8"))
+    assert ingestion.features == 3
+    assert ingestion.hierarchy == {
+        "features": {"Café": {"optional": {"Leche": {}}}, "Té": {}},
+        "constraints": {"Café => Té": {}},
+    }
+    assert json.loads(DataSetService.parse_uvl_to_json(str(file_path))) == ingestion.hierarchy
+
+
+def test_parse_uvl_to_json_matches_previous_implementation(tmp_path):
+    file_path = tmp_path / "generated.uvl"
+    with open(file_path, "w") as file:
+        generate_uvl(file, features=300, depth=40)
+        # Claves repetidas e indentación inconsistente
+        file.write("features\n  A\n      B\n    C\n  A\n\tD\n        E\n")
+
+    assert DataSetService.parse_uvl_to_json(str(file_path)) == previous_parse_uvl_to_json(str(file_path))
@@ -14,128 +14,203 @@ function send_query() {
 
     filters.forEach(filter => {
         filter.addEventListener('input', () => {
-            const csrfToken = document.getElementById('csrf_token').value;
-
-            const searchCriteria = {
-                csrf_token: csrfToken,
-                query: document.querySelector('#query').value,
-                publication_type: document.querySelector('#publication_type').value,
-                sorting: document.querySelector('[name="sorting"]:checked').value,
-                min_features: document.querySelector('#min_features').value || null,
-                max_features: document.querySelector('#max_features').value || null,
-                min_products: document.querySelector('#min_products').value || null,
-                max_products: document.querySelector('#max_products').value || null
-            };
-
-            console.log(document.querySelector('#publication_type').value);
-
-            fetch('/explore', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(searchCriteria),
-            })
-                .then(response => response.json())
-                .then(data => {
-
-                    console.log(data);
-                    document.getElementById('results').innerHTML = '';
-
-                    // results counter
-                    const resultCount = data.length;
-                    const resultText = resultCount === 1 ? 'dataset' : 'datasets';
-                    document.getElementById('results_number').textContent = `${resultCount} ${resultText} found`;
-
-                    if (resultCount === 0) {
-                        console.log("show not found icon");
-                        document.getElementById("results_not_found").style.display = "block";
-                    } else {
-                        document.getElementById("results_not_found").style.display = "none";
-                    }
-
-
-                    data.forEach(dataset => {
-                        let card = document.createElement('div');
-                        card.className = 'col-12';
-                        card.innerHTML = `
-                            <div class="card">
-                                <div class="card-body">
-                                    <div class="d-flex align-items-center justify-content-between">
-                                        <h3><a href="${dataset.url}">${dataset.title}</a></h3>
-                                        <div>
-                                            <span class="badge bg-primary" style="cursor: pointer;" onclick="set_publication_type_as_query('${dataset.publication_type}')">${dataset.publication_type}</span>
-                                        </div>
-                                    </div>
-                                    <p class="text-secondary">${formatDate(dataset.created_at)}</p>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Description
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            <p class="card-text">${dataset.description}</p>
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Authors
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            ${dataset.authors.map(author => `
-                                                <p class="p-0 m-0">${author.name}${author.affiliation ? ` (${author.affiliation})` : ''}${author.orcid ? ` (${author.orcid})` : ''}</p>
-                                            `).join('')}
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Tags
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            ${dataset.tags.map(tag => `<span class="badge bg-primary me-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">${tag}</span>`).join('')}
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row">
-
-                                        <div class="col-md-4 col-12">
-
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            <a href="${dataset.url}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
-                                                View dataset
-                                            </a>
-                                            <a href="/dataset/download/${dataset.id}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
-                                                Download (${dataset.total_size_in_human_format})
-                                            </a>
-                                        </div>
-
-
-                                    </div>
+            fetch_datasets(null);
+        });
+    });
+
+    document.getElementById('load_more').addEventListener('click', () => {
+        fetch_datasets(next_cursor);
+    });
+}
 
+let next_cursor = null;
+let loaded_results = 0;
+
+function fetch_datasets(cursor) {
+    const csrfToken = document.getElementById('csrf_token').value;
+
+    const searchCriteria = {
+        csrf_token: csrfToken,
+        query: document.querySelector('#query').value,
+        publication_type: document.querySelector('#publication_type').value,
+        sorting: document.querySelector('[name="sorting"]:checked').value,
+        min_features: document.querySelector('#min_features').value || null,
+        max_features: document.querySelector('#max_features').value || null,
+        min_products: document.querySelector('#min_products').value || null,
+        max_products: document.querySelector('#max_products').value || null,
+        min_configurations: document.querySelector('#min_configurations').value || null,
+        max_configurations: document.querySelector('#max_configurations').value || null,
+        cursor: cursor
+    };
+
+    console.log(document.querySelector('#publication_type').value);
+
+    // facet counts only change with the filters, not with the page
+    if (!cursor) {
+        fetch_facets(searchCriteria);
+    }
+
+    fetch('/explore', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(searchCriteria),
+    })
+        .then(response => response.json())
+        .then(data => {
+
+            console.log(data);
+
+            // a new search (no cursor) replaces the results, a cursor appends the next page
+            if (!cursor) {
+                document.getElementById('results').innerHTML = '';
+                loaded_results = 0;
+            }
+
+            next_cursor = data.next_cursor;
+            loaded_results += data.items.length;
+
+            // results counter
+            const resultText = loaded_results === 1 ? 'dataset' : 'datasets';
+            const moreText = data.has_more ? '+' : '';
+            document.getElementById('results_number').textContent = `${loaded_results}${moreText} ${resultText} found`;
+
+            if (loaded_results === 0) {
+                console.log("show not found icon");
+                document.getElementById("results_not_found").style.display = "block";
+            } else {
+                document.getElementById("results_not_found").style.display = "none";
+            }
+
+            document.getElementById('load_more_container').style.display = data.has_more ? 'block' : 'none';
+
+            data.items.forEach(dataset => {
+                let card = document.createElement('div');
+                card.className = 'col-12';
+                card.innerHTML = `
+                    <div class="card">
+                        <div class="card-body">
+                            <div class="d-flex align-items-center justify-content-between">
+                                <h3><a href="${dataset.url}">${dataset.title}</a></h3>
+                                <div>
+                                    <span class="badge bg-primary" style="cursor: pointer;" onclick="set_publication_type_as_query('${dataset.publication_type}')">${dataset.publication_type}</span>
                                 </div>
                             </div>
-                        `;
+                            <p class="text-secondary">${formatDate(dataset.created_at)}</p>
+
+                            <div class="row mb-2">
+
+                                <div class="col-md-4 col-12">
+                                    <span class=" text-secondary">
+                                        Description
+                                    </span>
+                                </div>
+                                <div class="col-md-8 col-12">
+                                    <p class="card-text">${dataset.description}</p>
+                                </div>
 
-                        document.getElementById('results').appendChild(card);
-                    });
+                            </div>
+
+                            <div class="row mb-2">
+
+                                <div class="col-md-4 col-12">
+                                    <span class=" text-secondary">
+                                        Authors
+                                    </span>
+                                </div>
+                                <div class="col-md-8 col-12">
+                                    ${dataset.authors.map(author => `
+                                        <p class="p-0 m-0">${author.name}${author.affiliation ? ` (${author.affiliation})` : ''}${author.orcid ? ` (${author.orcid})` : ''}</p>
+                                    `).join('')}
+                                </div>
+
+                            </div>
+
+                            <div class="row mb-2">
+
+                                <div class="col-md-4 col-12">
+                                    <span class=" text-secondary">
+                                        Tags
+                                    </span>
+                                </div>
+                                <div class="col-md-8 col-12">
+                                    ${dataset.tags.map(tag => `<span class="badge bg-primary me-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">${tag}</span>`).join('')}
+                                </div>
+
+                            </div>
+
+                            <div class="row">
+
+                                <div class="col-md-4 col-12">
+
+                                </div>
+                                <div class="col-md-8 col-12">
+                                    <a href="${dataset.url}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
+                                        View dataset
+                                    </a>
+                                    <a href="/dataset/download/${dataset.id}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
+                                        Download (${dataset.total_size_in_human_format})
+                                    </a>
+                                </div>
+
+
+                            </div>
+
+                        </div>
+                    </div>
+                `;
+
+                document.getElementById('results').appendChild(card);
+            });
+        });
+}
+
+function fetch_facets(searchCriteria) {
+    fetch('/explore/facets', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(searchCriteria),
+    })
+        .then(response => response.json())
+        .then(facets => {
+
+            const publicationTypeSelect = document.getElementById('publication_type');
+            const publicationTypes = facets.publication_types
+                .filter(publicationType => publicationType.count > 0)
+                .map(publicationType => {
+                    const option = Array.from(publicationTypeSelect.options).find(option => option.value === publicationType.value);
+                    return `<span class="badge bg-light text-dark me-1 mb-1" style="cursor: pointer;" onclick="set_publication_type_as_query('${option.text}')">${option.text} (${publicationType.count})</span>`;
                 });
+
+            const tags = facets.tags.map(tag =>
+                `<span class="badge bg-primary me-1 mb-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag.name}')">${tag.name} (${tag.count})</span>`
+            );
+
+            const histogram = (buckets, minInput, maxInput) => buckets
+                .filter(bucket => bucket.count > 0)
+                .map(bucket => `<span class="badge bg-light text-dark me-1 mb-1" style="cursor: pointer;" onclick="set_range_as_query('${minInput}', '${maxInput}', ${bucket.min}, ${bucket.max})">${bucket.label} (${bucket.count})</span>`);
+
+            const sections = [
+                ['Publication types', publicationTypes],
+                ['Tags', tags],
+                ['Features', histogram(facets.features, 'min_features', 'max_features')],
+                ['Products', histogram(facets.models, 'min_products', 'max_products')],
+            ];
+
+            document.getElementById('facets').innerHTML = sections
+                .filter(([, badges]) => badges.length > 0)
+                .map(([title, badges]) => `<p class="text-secondary mb-1">${title}</p><div class="mb-2">${badges.join('')}</div>`)
+                .join('');
         });
-    });
+}
+
+function set_range_as_query(minInput, maxInput, min, max) {
+    document.getElementById(minInput).value = min;
+    document.getElementById(maxInput).value = max === null ? '' : max;
+    document.getElementById(minInput).dispatchEvent(new Event('input', {bubbles: true}));
 }
 
 function formatDate(dateString) {
@@ -188,6 +263,8 @@ function clearFilters() {
     document.querySelector('#max_features').value = "";
     document.querySelector('#min_products').value = "";
     document.querySelector('#max_products').value = "";
+    document.querySelector('#min_configurations').value = "";
+    document.querySelector('#max_configurations').value = "";
     
     // Realizar la búsqueda con los filtros reseteados
     queryInput.dispatchEvent(new Event('input', {bubbles: true}));
@@ -8,4 +8,10 @@ class ExploreForm(FlaskForm):
     max_features = IntegerField('Maximum number of features', validators=[Optional(), NumberRange(min=0)])
     min_products = IntegerField('Minimum number of products', validators=[Optional(), NumberRange(min=0)])
     max_products = IntegerField('Maximum number of products', validators=[Optional(), NumberRange(min=0)])
+    min_configurations = IntegerField(
+        'Minimum number of configurations', validators=[Optional(), NumberRange(min=0)]
+    )
+    max_configurations = IntegerField(
+        'Maximum number of configurations', validators=[Optional(), NumberRange(min=0)]
+    )
     submit = SubmitField('Submit')
@@ -0,0 +1,16 @@
+from app import db
+
+
+class SearchTerm(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(64), nullable=False)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('data_set.id', ondelete='CASCADE'), nullable=False)
+    weight = db.Column(db.Integer, nullable=False, default=1)
+
+    __table_args__ = (
+        db.UniqueConstraint('term', 'dataset_id', name='uq_search_term_term_dataset'),
+        db.Index('ix_search_term_dataset_id', 'dataset_id'),
+    )
+
+    def __repr__(self):
+        return f'SearchTerm<{self.term}, dataset={self.dataset_id}, weight={self.weight}>'
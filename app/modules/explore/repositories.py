@@ -1,54 +1,48 @@
-import re
-from sqlalchemy import any_, or_
-import unidecode
-from app.modules.dataset.models import Author, DSMetrics, DSMetaData, DataSet, PublicationType
-from app.modules.featuremodel.models import FMMetaData, FeatureModel
+import sys
+
+from sqlalchemy import String, and_, case, cast, func, insert, literal, or_, select, union_all
+from app.modules.dataset.models import DSMetrics, DSMetaData, DataSet, PublicationType, Tag, data_set_tag
+from app.modules.explore.models import SearchTerm
 from core.repositories.BaseRepository import BaseRepository
-from app import db
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Configuration count used to sort the datasets that have not been analyzed yet, so they always come last
+UNANALYZED_CONFIGURATIONS = {"most_configurations": -1.0, "fewest_configurations": sys.float_info.max}
+
+SIZE_SORTINGS = ("largest", "smallest")
+
+# Sum of the weights of the search terms matched by the query, only meaningful when there is one
+RELEVANCE_SORTING = "relevance"
+
 
 class ExploreRepository(BaseRepository):
     def __init__(self):
         super().__init__(DataSet)
 
-    def filter(
-            self, query="", sorting="newest", publication_type="any",
-            tags=[], min_features=None, max_features=None,
-            min_products=None, max_products=None, **kwargs):
-        # Normalize and remove unwanted characters
-        normalized_query = unidecode.unidecode(query).lower()
-        cleaned_query = re.sub(r'[,.":\'()\[\]^;!¡¿?]', "", normalized_query)
-
-        filters = []
-        for word in cleaned_query.split():
-            filters.append(DSMetaData.title.ilike(f"%{word}%"))
-            filters.append(DSMetaData.description.ilike(f"%{word}%"))
-            filters.append(Author.name.ilike(f"%{word}%"))
-            filters.append(Author.affiliation.ilike(f"%{word}%"))
-            filters.append(Author.orcid.ilike(f"%{word}%"))
-            filters.append(FMMetaData.uvl_filename.ilike(f"%{word}%"))
-            filters.append(FMMetaData.title.ilike(f"%{word}%"))
-            filters.append(FMMetaData.description.ilike(f"%{word}%"))
-            filters.append(FMMetaData.publication_doi.ilike(f"%{word}%"))
-            filters.append(FMMetaData.tags.ilike(f"%{word}%"))
-            filters.append(DSMetaData.tags.ilike(f"%{word}%"))
+    @staticmethod
+    def build_predicates(
+            words=[], publication_type="any", tags=[], min_features=None, max_features=None,
+            min_products=None, max_products=None, min_configurations=None, max_configurations=None,
+            **kwargs) -> list:
+        # WHERE clauses over DataSet JOIN DSMetaData LEFT JOIN DSMetrics shared by listing and facets
+        predicates = [DSMetaData.dataset_doi.isnot(None)]
 
-        datasets = (
-            self.model.query
-            .join(DataSet.ds_meta_data)
-            .join(DSMetaData.ds_metrics)
-            .join(DSMetaData.authors)
-            .join(DataSet.feature_models)
-            .join(FeatureModel.fm_meta_data)
-            .filter(or_(*filters))
-            .filter(DSMetaData.dataset_doi.isnot(None))
-        )
+        if words:
+            matching_datasets = (
+                select(SearchTerm.dataset_id)
+                .where(or_(*[SearchTerm.term.like(f"{word}%") for word in words]))
+            )
+            predicates.append(DataSet.id.in_(matching_datasets))
 
         if tags:
-            datasets = datasets.filter(DSMetaData.tags.ilike(any_(f"%{tag}%" for tag in tags)))
+            tagged_datasets = (
+                select(data_set_tag.c.data_set_id)
+                .join(Tag, Tag.id == data_set_tag.c.tag_id)
+                .where(Tag.name.in_(Tag.parse(tags)))
+            )
+            predicates.append(DataSet.id.in_(tagged_datasets))
 
         if publication_type != "any":
             matching_type = next(
@@ -56,34 +50,165 @@ class ExploreRepository(BaseRepository):
                 None
             )
             if matching_type:
-                datasets = datasets.filter(DSMetaData.publication_type == matching_type.name)
+                predicates.append(DSMetaData.publication_type == matching_type.name)
 
         # Aplicar filtros de features
         if min_features is not None:
-            datasets = datasets.filter(
-                db.cast(db.func.nullif(DSMetrics.number_of_features, ''), db.String).cast(db.Integer) >= min_features
-            )
+            predicates.append(DSMetrics.number_of_features >= min_features)
 
         if max_features is not None:
-            datasets = datasets.filter(
-                db.cast(db.func.nullif(DSMetrics.number_of_features, ''), db.String).cast(db.Integer) <= max_features
-            )
+            predicates.append(DSMetrics.number_of_features <= max_features)
 
         # Aplicar filtros de productos
         if min_products is not None:
-            datasets = datasets.filter(
-                db.cast(db.func.nullif(DSMetrics.number_of_models, ''), db.String).cast(db.Integer) >= min_products
-            )
+            predicates.append(DSMetrics.number_of_models >= min_products)
 
         if max_products is not None:
-            datasets = datasets.filter(
-                db.cast(db.func.nullif(DSMetrics.number_of_models, ''), db.String).cast(db.Integer) <= max_products
-            )
+            predicates.append(DSMetrics.number_of_models <= max_products)
+
+        # Aplicar filtros de configuraciones
+        if min_configurations is not None:
+            predicates.append(DSMetrics.number_of_configurations >= min_configurations)
+
+        if max_configurations is not None:
+            predicates.append(DSMetrics.number_of_configurations <= max_configurations)
+
+        return predicates
+
+    @staticmethod
+    def relevance(words: list):
+        return (
+            select(func.sum(SearchTerm.weight))
+            .where(SearchTerm.dataset_id == DataSet.id, or_(*[SearchTerm.term.like(f"{word}%") for word in words]))
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    def _from_datasets(statement):
+        return statement.select_from(DataSet).join(DataSet.ds_meta_data).outerjoin(DSMetaData.ds_metrics)
 
-        # Order by created_at
-        if sorting == "oldest":
-            datasets = datasets.order_by(self.model.created_at.asc())
+    def filter(self, sorting="newest", after=None, limit=None, **criteria) -> list:
+        # (dataset, sort key) rows of the page, the sort key is what the next cursor seeks past
+        datasets = (
+            self.model.query
+            .join(DataSet.ds_meta_data)
+            .outerjoin(DSMetaData.ds_metrics)
+            .filter(*self.build_predicates(**criteria))
+        )
+
+        # Order by (sort key, id) and seek past the last row of the previous page
+        if sorting in UNANALYZED_CONFIGURATIONS:
+            sort_key = func.coalesce(DSMetrics.number_of_configurations, UNANALYZED_CONFIGURATIONS[sorting])
+        elif sorting == RELEVANCE_SORTING:
+            sort_key = self.relevance(criteria["words"])
+        elif sorting in SIZE_SORTINGS:
+            sort_key = self.model.total_size_bytes
+        else:
+            sort_key = self.model.created_at
+
+        if sorting in ("oldest", "fewest_configurations", "smallest"):
+            if after is not None:
+                sort_value, dataset_id = after
+                datasets = datasets.filter(or_(
+                    sort_key > sort_value,
+                    and_(sort_key == sort_value, self.model.id > dataset_id)
+                ))
+            datasets = datasets.order_by(sort_key.asc(), self.model.id.asc())
         else:
-            datasets = datasets.order_by(self.model.created_at.desc())
+            if after is not None:
+                sort_value, dataset_id = after
+                datasets = datasets.filter(or_(
+                    sort_key < sort_value,
+                    and_(sort_key == sort_value, self.model.id < dataset_id)
+                ))
+            datasets = datasets.order_by(sort_key.desc(), self.model.id.desc())
+
+        if limit is not None:
+            datasets = datasets.limit(limit)
+
+        return datasets.add_columns(sort_key).all()
+
+    def get_by_ids(self, ids: list) -> list:
+        # Datasets in the same order as the given ids, skipping the ones that no longer exist
+        datasets = {dataset.id: dataset for dataset in self.model.query.filter(self.model.id.in_(ids))} if ids else {}
+        return [datasets[id] for id in ids if id in datasets]
+
+    def _tag_counts(self, predicates, limit=None):
+        datasets_count = func.count(DataSet.id).label("datasets_count")
+        tag_counts = (
+            self._from_datasets(select(Tag.name, datasets_count))
+            .join(data_set_tag, data_set_tag.c.data_set_id == DataSet.id)
+            .join(Tag, Tag.id == data_set_tag.c.tag_id)
+            .where(*predicates)
+            .group_by(Tag.id, Tag.name)
+            .order_by(datasets_count.desc(), Tag.name.asc())
+        )
+        if limit is not None:
+            tag_counts = tag_counts.limit(limit)
+        return tag_counts
+
+    def count_facets(self, feature_buckets, model_buckets, tags_limit=None, **criteria) -> list:
+        """
+        Returns (facet, value, count) rows for the publication_type, tags, features and models
+        facets in a single UNION ALL query. Every facet ignores its own filter, so the counts
+        show how many datasets each alternative would match.
+        """
+        def bucket_case(column, buckets):
+            return case(
+                *[
+                    (and_(column >= low, column <= high) if high is not None else column >= low, label)
+                    for label, low, high in buckets
+                ],
+                else_=None,
+            )
+
+        def grouped_count(facet, value, predicates):
+            return (
+                self._from_datasets(select(
+                    literal(facet).label("facet"),
+                    value.label("value"),
+                    func.count(DataSet.id).label("count"),
+                ))
+                .where(*predicates)
+                .group_by(value)
+            )
 
-        return datasets.distinct().all()
+        def without(*names):
+            return self.build_predicates(**{**criteria, **{name: None for name in names}})
+
+        publication_types = grouped_count(
+            "publication_type",
+            cast(DSMetaData.publication_type, String),
+            self.build_predicates(**{**criteria, "publication_type": "any"}),
+        )
+        features = grouped_count(
+            "features",
+            bucket_case(DSMetrics.number_of_features, feature_buckets),
+            without("min_features", "max_features"),
+        )
+        models = grouped_count(
+            "models",
+            bucket_case(DSMetrics.number_of_models, model_buckets),
+            without("min_products", "max_products"),
+        )
+        tags = self._tag_counts(without("tags"), limit=tags_limit).subquery()
+        top_tags = select(literal("tags").label("facet"), tags.c.name, tags.c.datasets_count)
+
+        return self.session.execute(union_all(publication_types, top_tags, features, models)).all()
+
+
+class SearchTermRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(SearchTerm)
+
+    def replace_dataset_terms(self, dataset_id: int, weights: dict, commit: bool = True):
+        self.model.query.filter_by(dataset_id=dataset_id).delete(synchronize_session=False)
+        if weights:
+            self.session.execute(
+                insert(self.model),
+                [{"term": term, "dataset_id": dataset_id, "weight": weight} for term, weight in weights.items()]
+            )
+        if commit:
+            self.session.commit()
+        else:
+            self.session.flush()
@@ -1,5 +1,6 @@
 from flask import render_template, request, jsonify
 
+from app.modules.dataset.services import DataSetService
 from app.modules.explore import explore_bp
 from app.modules.explore.forms import ExploreForm
 from app.modules.explore.services import ExploreService
@@ -23,10 +24,27 @@ def index():
                 return jsonify({'error': 'Missing required fields'}), 400
 
             try:
-                datasets = ExploreService().filter(**criteria)
-                return jsonify([dataset.to_dict() for dataset in datasets])
+                page = ExploreService().filter(**criteria)
+                return jsonify({
+                    'items': DataSetService().serialize_datasets(page['datasets']),
+                    'page_size': page['page_size'],
+                    'next_cursor': page['next_cursor'],
+                    'has_more': page['has_more'],
+                })
             except ValueError as e:
                 return jsonify({'error': str(e)}), 400
 
         except Exception:
             return jsonify({'error': 'Invalid request'}), 400
+
+
+@explore_bp.route('/explore/facets', methods=['POST'])
+def facets():
+    criteria = request.get_json(silent=True)
+    if criteria is None:
+        return jsonify({'error': 'Invalid JSON data'}), 400
+
+    try:
+        return jsonify(ExploreService().facets(**criteria))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
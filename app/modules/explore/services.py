@@ -1,38 +1,292 @@
-from app.modules.explore.repositories import ExploreRepository
+import base64
+import binascii
+import json
+import re
+from collections import defaultdict
+from datetime import datetime
+
+import unidecode
+from flask import has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.modules.dataset.models import Author, DataSet, DSMetaData, DSMetrics, PublicationType, Tag
+from app.modules.explore.repositories import (
+    RELEVANCE_SORTING,
+    SIZE_SORTINGS,
+    UNANALYZED_CONFIGURATIONS,
+    ExploreRepository,
+    SearchTermRepository
+)
+from app.modules.featuremodel.models import FeatureModel, FMMetaData, FMMetrics
+from core.managers.cache_manager import get_cache
 from core.services.BaseService import BaseService
 
+# Relative weight of each field of the search document when ranking datasets
+SEARCH_FIELD_WEIGHTS = {
+    "title": 10,
+    "tags": 6,
+    "authors": 5,
+    "orcids": 5,
+    "dois": 4,
+    "uvl_filenames": 4,
+    "feature_model_titles": 4,
+    "feature_model_tags": 3,
+    "affiliations": 2,
+    "description": 2,
+    "feature_model_descriptions": 1,
+}
+
+MAX_TERM_LENGTH = 64
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+TOP_TAGS_LIMIT = 20
+
+EXPLORE_CACHE = "explore"
+
+# Any committed change to these models can alter explore results or facets
+EXPLORE_MODELS = (DataSet, DSMetaData, DSMetrics, Author, Tag, FeatureModel, FMMetaData, FMMetrics)
+
+SORTINGS = ("newest", "oldest", *UNANALYZED_CONFIGURATIONS, *SIZE_SORTINGS, RELEVANCE_SORTING)
+
+# Inclusive (low, high) histogram buckets for the explore facets, high=None means open ended
+FEATURE_BUCKETS = ((0, 9), (10, 49), (50, 99), (100, 499), (500, None))
+MODEL_BUCKETS = ((0, 1), (2, 5), (6, 10), (11, 50), (51, None))
+
+
+def tokenize(text):
+    normalized_text = unidecode.unidecode(text or "").lower()
+    return [token[:MAX_TERM_LENGTH] for token in re.findall(r"[a-z0-9]+", normalized_text)]
+
+
+def build_search_document(dataset: DataSet) -> dict:
+    ds_meta_data = dataset.ds_meta_data
+    authors = list(dict.fromkeys(ds_meta_data.authors))
+    fm_meta_datas = [fm.fm_meta_data for fm in dataset.feature_models if fm.fm_meta_data]
+
+    return {
+        "title": ds_meta_data.title,
+        "description": ds_meta_data.description,
+        "tags": ds_meta_data.tags,
+        "authors": " ".join(author.name for author in authors),
+        "affiliations": " ".join(author.affiliation or "" for author in authors),
+        "orcids": " ".join(author.orcid or "" for author in authors),
+        "dois": " ".join(
+            [ds_meta_data.dataset_doi or "", ds_meta_data.publication_doi or ""]
+            + [fm_meta_data.publication_doi or "" for fm_meta_data in fm_meta_datas]
+        ),
+        "uvl_filenames": " ".join(fm_meta_data.uvl_filename for fm_meta_data in fm_meta_datas),
+        "feature_model_titles": " ".join(fm_meta_data.title for fm_meta_data in fm_meta_datas),
+        "feature_model_descriptions": " ".join(fm_meta_data.description for fm_meta_data in fm_meta_datas),
+        "feature_model_tags": " ".join(fm_meta_data.tags or "" for fm_meta_data in fm_meta_datas),
+    }
+
+
+def bucket_label(low: int, high: int = None) -> str:
+    return f"{low}+" if high is None else f"{low}-{high}"
+
+
+def parse_bounds(*bounds, type=int) -> tuple:
+    # Range limits are compared with indexed integer columns (double for the configuration counts)
+    return tuple(type(bound) if bound is not None else None for bound in bounds)
+
+
+def explore_cache_key(mode: str, **criteria) -> str:
+    return json.dumps([mode, criteria], sort_keys=True, default=str)
+
+
+def mark_explore_changed(session):
+    session.info["explore_changed"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def detect_explore_changes(session, flush_context):
+    if any(isinstance(instance, EXPLORE_MODELS) for instance in (*session.new, *session.dirty, *session.deleted)):
+        mark_explore_changed(session)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_explore_cache(session):
+    if session.info.pop("explore_changed", False) and has_app_context():
+        get_cache(EXPLORE_CACHE).invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_explore_changes(session):
+    session.info.pop("explore_changed", None)
+
+
+def encode_cursor(sorting: str, dataset: DataSet, sort_key) -> str:
+    # sort_key is the value the repository ordered the dataset by
+    if isinstance(sort_key, datetime):
+        sort_key = sort_key.isoformat()
+    elif sorting == RELEVANCE_SORTING:
+        sort_key = int(sort_key)
+    payload = json.dumps([sorting, sort_key, dataset.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, sorting: str) -> tuple:
+    try:
+        cursor_sorting, value, dataset_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sorting in UNANALYZED_CONFIGURATIONS:
+            value = float(value)
+        elif sorting in SIZE_SORTINGS or sorting == RELEVANCE_SORTING:
+            value = int(value)
+        else:
+            value = datetime.fromisoformat(value)
+        after = (value, int(dataset_id))
+    except (binascii.Error, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+    if cursor_sorting != sorting:
+        raise ValueError("The cursor does not belong to the requested sorting")
+
+    return after
+
+
+class SearchIndexService(BaseService):
+    def __init__(self):
+        super().__init__(SearchTermRepository())
+
+    def index_dataset(self, dataset: DataSet, commit: bool = True):
+        weights = defaultdict(int)
+        for field, text in build_search_document(dataset).items():
+            for term in tokenize(text):
+                weights[term] += SEARCH_FIELD_WEIGHTS[field]
+
+        mark_explore_changed(self.repository.session)
+        self.repository.replace_dataset_terms(dataset.id, weights, commit=commit)
+
 
 class ExploreService(BaseService):
     def __init__(self):
         super().__init__(ExploreRepository())
 
     def filter(self, query="", sorting="newest", publication_type="any",
-               min_features=None, max_features=None, min_products=None, max_products=None, **kwargs):
-        # Validar sorting
-        if sorting not in ["newest", "oldest"]:
+               min_features=None, max_features=None, min_products=None, max_products=None,
+               min_configurations=None, max_configurations=None, cursor=None, page_size=None, **kwargs):
+        words = sorted(set(tokenize(query)))
+
+        # Validar sorting: sin consulta no hay relevancia por la que ordenar
+        if sorting not in SORTINGS or (sorting == RELEVANCE_SORTING and not words):
             sorting = "newest"
 
+        # Validar tamaño de página
+        page_size = DEFAULT_PAGE_SIZE if page_size is None else int(page_size)
+        if not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+
+        empty_page = {"datasets": [], "page_size": page_size, "next_cursor": None, "has_more": False}
+
+        min_features, max_features, min_products, max_products = parse_bounds(
+            min_features, max_features, min_products, max_products
+        )
+        min_configurations, max_configurations = parse_bounds(min_configurations, max_configurations, type=float)
+
         # Validar rangos de features
-        if min_features is not None and max_features is not None:
-            min_features = int(min_features)
-            max_features = int(max_features)
-            if min_features > max_features:
-                return []  # Retornar lista vacía si el rango no es válido
+        if min_features is not None and max_features is not None and min_features > max_features:
+            return empty_page  # Retornar página vacía si el rango no es válido
 
         # Validar rangos de productos
-        if min_products is not None and max_products is not None:
-            min_products = int(min_products)
-            max_products = int(max_products)
-            if min_products > max_products:
-                return []  # Retornar lista vacía si el rango no es válido
-
-        return self.repository.filter(
-            query=query,
-            sorting=sorting,
-            publication_type=publication_type,
-            min_features=min_features,
-            max_features=max_features,
-            min_products=min_products,
-            max_products=max_products,
-            **kwargs
+        if min_products is not None and max_products is not None and min_products > max_products:
+            return empty_page  # Retornar página vacía si el rango no es válido
+
+        # Validar rangos de configuraciones
+        if (min_configurations is not None and max_configurations is not None
+                and min_configurations > max_configurations):
+            return empty_page  # Retornar página vacía si el rango no es válido
+
+        criteria = {
+            "words": words,
+            "sorting": sorting,
+            "publication_type": publication_type,
+            "tags": sorted(Tag.parse(kwargs.get("tags"))),
+            "min_features": min_features,
+            "max_features": max_features,
+            "min_products": min_products,
+            "max_products": max_products,
+            "min_configurations": min_configurations,
+            "max_configurations": max_configurations,
+        }
+        after = decode_cursor(cursor, sorting) if cursor else None
+
+        # Only the ids and the next cursor are cached, the datasets themselves are always loaded from the session
+        fetched = {}
+
+        def fetch_page():
+            # Fetch one extra row to know whether there is a next page
+            rows = self.repository.filter(after=after, limit=page_size + 1, **criteria)
+            fetched["datasets"] = [dataset for dataset, _ in rows[:page_size]]
+            return {
+                "ids": [dataset.id for dataset in fetched["datasets"]],
+                "next_cursor": encode_cursor(sorting, *rows[page_size - 1]) if len(rows) > page_size else None,
+            }
+
+        page = get_cache(EXPLORE_CACHE).get_or_compute(
+            explore_cache_key("page", cursor=cursor, page_size=page_size, **criteria), fetch_page
+        )
+        datasets = fetched["datasets"] if "datasets" in fetched else self.repository.get_by_ids(page["ids"])
+
+        return {
+            "datasets": datasets,
+            "page_size": page_size,
+            "next_cursor": page["next_cursor"],
+            "has_more": page["next_cursor"] is not None,
+        }
+
+    def facets(self, query="", min_features=None, max_features=None, min_products=None, max_products=None,
+               min_configurations=None, max_configurations=None, tags_limit=TOP_TAGS_LIMIT, **kwargs):
+        min_features, max_features, min_products, max_products = parse_bounds(
+            min_features, max_features, min_products, max_products
+        )
+        min_configurations, max_configurations = parse_bounds(min_configurations, max_configurations, type=float)
+
+        criteria = {
+            "words": sorted(set(tokenize(query))),
+            "publication_type": kwargs.get("publication_type", "any"),
+            "tags": sorted(Tag.parse(kwargs.get("tags"))),
+            "min_features": min_features,
+            "max_features": max_features,
+            "min_products": min_products,
+            "max_products": max_products,
+            "min_configurations": min_configurations,
+            "max_configurations": max_configurations,
+        }
+
+        rows = get_cache(EXPLORE_CACHE).get_or_compute(
+            explore_cache_key("facets", tags_limit=tags_limit, **criteria),
+            lambda: [tuple(row) for row in self.repository.count_facets(
+                feature_buckets=[(bucket_label(*bucket), *bucket) for bucket in FEATURE_BUCKETS],
+                model_buckets=[(bucket_label(*bucket), *bucket) for bucket in MODEL_BUCKETS],
+                tags_limit=tags_limit,
+                **criteria
+            )]
         )
+
+        counts = defaultdict(dict)
+        for facet, value, count in rows:
+            if value is not None:
+                counts[facet][value] = count
+
+        def histogram(facet, buckets):
+            return [
+                {"label": bucket_label(low, high), "min": low, "max": high,
+                 "count": counts[facet].get(bucket_label(low, high), 0)}
+                for low, high in buckets
+            ]
+
+        return {
+            "publication_types": [
+                {"value": member.value, "count": counts["publication_type"].get(member.name, 0)}
+                for member in PublicationType
+            ],
+            "tags": sorted(
+                ({"name": name, "count": count} for name, count in counts["tags"].items()),
+                key=lambda tag: (-tag["count"], tag["name"])
+            ),
+            "features": histogram("features", FEATURE_BUCKETS),
+            "models": histogram("models", MODEL_BUCKETS),
+        }
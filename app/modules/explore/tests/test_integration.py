@@ -2,7 +2,10 @@ import pytest
 from app import db
 from app.modules.dataset.models import DataSet, DSMetrics, DSMetaData, PublicationType, Author
 from app.modules.featuremodel.models import FeatureModel, FMMetaData
-from datetime import datetime, timezone
+from app.modules.dataset.services import DataSetService, TagService
+from app.modules.explore.services import ExploreService, SearchIndexService
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
 
 
 @pytest.fixture(scope="module")
@@ -66,6 +69,9 @@ def test_client(test_client):
             print(f"Error al crear datos de prueba: {str(e)}")
             raise e
 
+        TagService().set_dataset_tags(dataset, ds_meta_data.tags)
+        SearchIndexService().index_dataset(dataset)
+
     yield test_client
 
 
@@ -81,7 +87,7 @@ def test_explore_integration_full_search(test_client):
             'max_features': 30
         })
     assert response.status_code == 200
-    data = response.json
+    data = response.json['items']
     assert len(data) > 0
     assert 'Test Integration Dataset' in data[0]['title']
 
@@ -96,6 +102,357 @@ def test_explore_integration_author_search(test_client):
             'sorting': 'newest'
         })
     assert response.status_code == 200
-    data = response.json
+    data = response.json['items']
     assert len(data) > 0
     assert any('Test Author' in str(dataset['authors']) for dataset in data)
+
+
+def test_explore_integration_search_index_ranking(test_client):
+    """Test integración del índice de búsqueda: ranking y búsqueda por prefijo"""
+    def search(query):
+        page = ExploreService().filter(query=query, sorting='relevance')
+        return [dataset.id for dataset in page['datasets']]
+
+    assert search('integr') == [1]
+    assert search('test_model.uvl') == [1]
+    assert search('0000-0000-0000-0000') == [1]
+    assert search('nonexistentword') == []
+    # Sin consulta no hay relevancia: se ordena por fecha
+    assert search('') == [dataset.id for dataset in DataSet.query.order_by(DataSet.created_at.desc())]
+
+
+def test_explore_integration_relevance_sorting(test_client):
+    """Test integración del ordenamiento por relevancia y su cursor"""
+    extra_datasets = []
+    # El título pesa más que la descripción; los dos últimos empatan y el id desempata
+    for title, description in [("Other", "about glaciers"), ("Glaciers", "other"), ("Glaciers again", "other")]:
+        ds_meta_data = DSMetaData(
+            title=title,
+            description=description,
+            publication_type=PublicationType.JOURNAL_ARTICLE,
+            dataset_doi=f"10.5678/dataset.relevance.{len(extra_datasets)}",
+        )
+        dataset = DataSet(user_id=1, ds_meta_data=ds_meta_data)
+        db.session.add(dataset)
+        extra_datasets.append(dataset)
+    db.session.commit()
+    for dataset in extra_datasets:
+        SearchIndexService().index_dataset(dataset)
+
+    try:
+        seen_ids = []
+        cursor = None
+        while True:
+            response = test_client.post('/explore', json={
+                'query': 'glaciers', 'publication_type': 'any', 'sorting': 'relevance', 'page_size': 1, 'cursor': cursor
+            })
+            assert response.status_code == 200
+            seen_ids += [dataset['id'] for dataset in response.json['items']]
+            cursor = response.json['next_cursor']
+            if not response.json['has_more']:
+                break
+
+        assert seen_ids == [extra_datasets[2].id, extra_datasets[1].id, extra_datasets[0].id]
+    finally:
+        for dataset in extra_datasets:
+            SearchIndexService().repository.replace_dataset_terms(dataset.id, {})
+            db.session.delete(dataset)
+            db.session.delete(dataset.ds_meta_data)
+        db.session.commit()
+
+
+def test_explore_integration_search_index_updated_on_edit(test_client):
+    """Test integración: editar los metadatos actualiza el índice de búsqueda"""
+    dataset = DataSet.query.get(1)
+    original_title = dataset.ds_meta_data.title
+
+    DataSetService().update_dsmetadata(dataset.ds_meta_data_id, title="Renamed Dolomites Dataset")
+    response = test_client.post('/explore', json={'query': 'dolomites', 'publication_type': 'any', 'sorting': 'newest'})
+    assert response.status_code == 200
+    assert [dataset['id'] for dataset in response.json['items']] == [1]
+
+    DataSetService().update_dsmetadata(dataset.ds_meta_data_id, title=original_title)
+    response = test_client.post('/explore', json={'query': 'dolomites', 'publication_type': 'any', 'sorting': 'newest'})
+    assert response.json['items'] == []
+
+
+def test_explore_integration_pagination(test_client):
+    """Test integración de la paginación por cursor en ambos ordenamientos"""
+    created_at = datetime(2024, 1, 1)
+    extra_datasets = []
+    for i in range(3):
+        ds_meta_data = DSMetaData(
+            title=f"Paginated Dataset {i}",
+            description="Dataset for pagination testing",
+            publication_type=PublicationType.JOURNAL_ARTICLE,
+            dataset_doi=f"10.5678/dataset.paginated.{i}",
+            ds_metrics=DSMetrics(number_of_models="1", number_of_features="1"),
+        )
+        # Two datasets share created_at so the id breaks the tie
+        dataset = DataSet(user_id=1, ds_meta_data=ds_meta_data, created_at=created_at + timedelta(days=min(i, 1)))
+        db.session.add(dataset)
+        extra_datasets.append(dataset)
+    db.session.commit()
+
+    try:
+        for sorting in ['newest', 'oldest']:
+            seen_ids = []
+            cursor = None
+            while True:
+                response = test_client.post('/explore', json={
+                    'query': '',
+                    'publication_type': 'any',
+                    'sorting': sorting,
+                    'page_size': 2,
+                    'cursor': cursor
+                })
+                assert response.status_code == 200
+                assert response.json['page_size'] == 2
+                assert len(response.json['items']) <= 2
+                seen_ids += [dataset['id'] for dataset in response.json['items']]
+                cursor = response.json['next_cursor']
+                assert response.json['has_more'] == (cursor is not None)
+                if not response.json['has_more']:
+                    break
+
+            expected = sorted(DataSet.query.all(), key=lambda dataset: (dataset.created_at, dataset.id))
+            if sorting == 'newest':
+                expected.reverse()
+            assert seen_ids == [dataset.id for dataset in expected]
+
+        response = test_client.post('/explore', json={
+            'query': '', 'publication_type': 'any', 'sorting': 'newest', 'cursor': 'not-a-cursor'
+        })
+        assert response.status_code == 400
+
+        response = test_client.post('/explore', json={
+            'query': '', 'publication_type': 'any', 'sorting': 'newest', 'page_size': 0
+        })
+        assert response.status_code == 400
+    finally:
+        for dataset in extra_datasets:
+            db.session.delete(dataset)
+            db.session.delete(dataset.ds_meta_data)
+        db.session.commit()
+
+
+def test_explore_integration_numeric_range_filters(test_client):
+    """Test integración de los filtros de rango sobre métricas enteras"""
+    def search(**limits):
+        return test_client.post('/explore', json={
+            'query': 'Test Integration', 'publication_type': 'any', 'sorting': 'newest', **limits
+        })
+
+    # Comparación numérica: como texto, '20' < '9' y '5' > '10'
+    response = search(min_features=9, max_features=100, min_products=1, max_products=10)
+    assert response.status_code == 200
+    assert any(dataset['title'] == 'Test Integration Dataset' for dataset in response.json['items'])
+
+    # Un solo límite también filtra
+    response = search(min_features=21)
+    assert response.status_code == 200
+    assert not any(dataset['title'] == 'Test Integration Dataset' for dataset in response.json['items'])
+
+    response = search(min_features='many')
+    assert response.status_code == 400
+
+
+def test_explore_integration_configurations(test_client):
+    """Test integración del filtro y la ordenación por número de configuraciones"""
+    extra_datasets = []
+    for i, configurations in enumerate([24, 10 ** 40, None]):
+        ds_meta_data = DSMetaData(
+            title=f"Analyzed Dataset {i}",
+            description="Dataset for configuration testing",
+            publication_type=PublicationType.JOURNAL_ARTICLE,
+            dataset_doi=f"10.5678/dataset.analyzed.{i}",
+            ds_metrics=DSMetrics(number_of_models=1, number_of_features=1, number_of_configurations=configurations),
+        )
+        dataset = DataSet(user_id=1, ds_meta_data=ds_meta_data)
+        db.session.add(dataset)
+        extra_datasets.append(dataset)
+    db.session.commit()
+    analyzed_ids = [dataset.id for dataset in extra_datasets]
+
+    def search(**criteria):
+        response = test_client.post('/explore', json={'query': '', 'publication_type': 'any', **criteria})
+        assert response.status_code == 200
+        return response.json
+
+    try:
+        response = search(sorting='newest', min_configurations=20, max_configurations=100)
+        assert [dataset['id'] for dataset in response['items']] == [analyzed_ids[0]]
+
+        # Los datasets sin analizar quedan al final en ambos sentidos
+        for sorting, expected in [
+            ('most_configurations', [analyzed_ids[1], analyzed_ids[0]]),
+            ('fewest_configurations', [analyzed_ids[0], analyzed_ids[1]]),
+        ]:
+            seen_ids = []
+            cursor = None
+            while True:
+                response = search(sorting=sorting, page_size=1, cursor=cursor)
+                seen_ids += [dataset['id'] for dataset in response['items']]
+                cursor = response['next_cursor']
+                if cursor is None:
+                    break
+            assert seen_ids[:2] == expected
+            assert sorted(seen_ids) == sorted(dataset.id for dataset in DataSet.query.all())
+            assert seen_ids.index(analyzed_ids[2]) > 1
+    finally:
+        for dataset in extra_datasets:
+            db.session.delete(dataset)
+            db.session.delete(dataset.ds_meta_data)
+        db.session.commit()
+
+
+def test_explore_integration_size_sorting(test_client):
+    """Test integración de la ordenación por tamaño total de los ficheros"""
+    extra_datasets = []
+    for i, (files_count, total_size_bytes) in enumerate([(2, 4096), (1, 512)]):
+        ds_meta_data = DSMetaData(
+            title=f"Sized Dataset {i}",
+            description="Dataset for size testing",
+            publication_type=PublicationType.JOURNAL_ARTICLE,
+            dataset_doi=f"10.5678/dataset.sized.{i}",
+        )
+        dataset = DataSet(
+            user_id=1, ds_meta_data=ds_meta_data, files_count=files_count, total_size_bytes=total_size_bytes
+        )
+        db.session.add(dataset)
+        extra_datasets.append(dataset)
+    db.session.commit()
+    sized_ids = [dataset.id for dataset in extra_datasets]
+
+    try:
+        for sorting, expected in [('largest', sized_ids), ('smallest', sized_ids[::-1])]:
+            seen_ids = []
+            cursor = None
+            while True:
+                response = test_client.post('/explore', json={
+                    'query': '', 'publication_type': 'any', 'sorting': sorting, 'page_size': 1, 'cursor': cursor
+                })
+                assert response.status_code == 200
+                seen_ids += [dataset['id'] for dataset in response.json['items']]
+                cursor = response.json['next_cursor']
+                if cursor is None:
+                    break
+            # El dataset sin ficheros del fixture pesa 0 bytes
+            assert [dataset_id for dataset_id in seen_ids if dataset_id in sized_ids] == expected
+            assert seen_ids.index(1) == (len(seen_ids) - 1 if sorting == 'largest' else 0)
+    finally:
+        for dataset in extra_datasets:
+            db.session.delete(dataset)
+            db.session.delete(dataset.ds_meta_data)
+        db.session.commit()
+
+
+def test_explore_integration_tag_filter(test_client):
+    """Test integración del filtro por tags normalizados"""
+    def search(tags):
+        return test_client.post('/explore', json={
+            'query': '', 'publication_type': 'any', 'sorting': 'newest', 'tags': tags
+        })
+
+    response = search([' Integration '])
+    assert response.status_code == 200
+    assert [dataset['id'] for dataset in response.json['items']] == [1]
+
+    # Los tags se comparan completos, no por subcadena
+    assert search(['integ']).json['items'] == []
+    assert search(['features']).json['items'] == []
+
+
+def test_explore_integration_tags_updated_on_edit(test_client):
+    """Test integración: editar los tags actualiza la tabla de tags y sus contadores"""
+    dataset = DataSet.query.get(1)
+    original_tags = dataset.ds_meta_data.tags
+
+    assert ExploreService().facets()['tags'] == [{'name': 'integration', 'count': 1}, {'name': 'test', 'count': 1}]
+
+    DataSetService().update_dsmetadata(dataset.ds_meta_data_id, tags="Test, alpine, test")
+    assert sorted(tag.name for tag in DataSet.query.get(1).tags) == ['alpine', 'test']
+    assert ExploreService().facets(tags_limit=1)['tags'] == [{'name': 'alpine', 'count': 1}]
+
+    DataSetService().update_dsmetadata(dataset.ds_meta_data_id, tags=original_tags)
+    assert sorted(tag.name for tag in DataSet.query.get(1).tags) == ['integration', 'test']
+
+
+def test_explore_integration_facets(test_client):
+    """Test integración de los contadores de facetas"""
+    response = test_client.post('/explore/facets', json={'query': 'Test Integration', 'publication_type': 'any'})
+    assert response.status_code == 200
+    facets = response.json
+
+    publication_types = {facet['value']: facet['count'] for facet in facets['publication_types']}
+    assert publication_types['article'] == 1
+    assert publication_types['thesis'] == 0
+    assert facets['tags'] == [{'name': 'integration', 'count': 1}, {'name': 'test', 'count': 1}]
+    assert {bucket['label']: bucket['count'] for bucket in facets['features']}['10-49'] == 1
+    assert {bucket['label']: bucket['count'] for bucket in facets['models']}['2-5'] == 1
+
+    # Cada faceta ignora su propio filtro pero respeta el resto
+    response = test_client.post('/explore/facets', json={
+        'query': 'Test Integration', 'publication_type': 'thesis', 'min_features': 100
+    })
+    facets = response.json
+    assert {facet['value']: facet['count'] for facet in facets['publication_types']}['thesis'] == 0
+    assert sum(bucket['count'] for bucket in facets['features']) == 0
+    assert facets['tags'] == []
+
+    response = test_client.post('/explore/facets', json={'query': 'Test Integration', 'publication_type': 'article',
+                                                         'min_features': 100})
+    assert {bucket['label']: bucket['count'] for bucket in response.json['features']}['10-49'] == 1
+
+    response = test_client.post('/explore/facets', json={'min_products': 'many'})
+    assert response.status_code == 400
+
+
+def test_explore_integration_result_cache(test_client):
+    """Test integración de la caché de resultados y su invalidación al publicar"""
+    criteria = {'query': 'cache', 'publication_type': 'any', 'sorting': 'newest'}
+    ds_meta_data = DSMetaData(
+        title="Cache Dataset",
+        description="Dataset for cache testing",
+        publication_type=PublicationType.JOURNAL_ARTICLE,
+        ds_metrics=DSMetrics(number_of_models=1, number_of_features=1),
+    )
+    dataset = DataSet(user_id=1, ds_meta_data=ds_meta_data)
+    db.session.add(dataset)
+    db.session.commit()
+    SearchIndexService().index_dataset(dataset)
+
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args[2])
+
+    try:
+        assert ExploreService().filter(**criteria)['datasets'] == []
+
+        # La misma búsqueda se sirve desde la caché sin volver a consultar la base de datos
+        event.listen(db.engine, "before_cursor_execute", count_statement)
+        try:
+            assert ExploreService().filter(**criteria)['datasets'] == []
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_statement)
+        assert statements == []
+
+        # Publicar el dataset invalida la caché
+        DataSetService().update_dsmetadata(ds_meta_data.id, dataset_doi="10.5678/dataset.cache")
+        assert [dataset.id for dataset in ExploreService().filter(**criteria)['datasets']] == [dataset.id]
+
+        # Un acierto en caché solo carga los datasets por id
+        statements.clear()
+        event.listen(db.engine, "before_cursor_execute", count_statement)
+        try:
+            assert [dataset.id for dataset in ExploreService().filter(**criteria)['datasets']] == [dataset.id]
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_statement)
+        assert len(statements) == 1
+    finally:
+        db.session.delete(dataset)
+        db.session.delete(ds_meta_data)
+        db.session.commit()
+
+    assert ExploreService().filter(**criteria)['datasets'] == []
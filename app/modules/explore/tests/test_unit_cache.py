@@ -0,0 +1,139 @@
+import os
+from unittest.mock import patch
+
+from jinja2 import Environment
+
+from core.cache.artifacts import ArtifactCache
+from core.cache.backends import FileSystemCache, MemoryCache
+from core.cache.fragments import FragmentCacheExtension
+from core.cache.objects import ObjectCache
+from core.cache.versioned_cache import VersionedCache
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_memory_cache_expires_entries():
+    cache = MemoryCache(default_ttl=10)
+    with patch("core.cache.backends.time.time", return_value=1000):
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=0)
+    with patch("core.cache.backends.time.time", return_value=1011):
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+
+
+def test_object_cache_is_bounded_by_size():
+    cache = ObjectCache(max_bytes=100)
+    cache.set("a", "A", size=40)
+    cache.set("b", "B", size=40)
+    assert cache.get("a") == "A"
+    cache.set("c", "C", size=40)
+    cache.set("huge", "H", size=101)
+
+    assert cache.get("a") == "A"
+    assert cache.get("b") is None
+    assert cache.get("c") == "C"
+    assert cache.get("huge") is None
+    assert cache.size == 80
+
+
+def test_filesystem_cache_is_shared_and_bounded(tmp_path):
+    writer = FileSystemCache(str(tmp_path), max_entries=3)
+    reader = FileSystemCache(str(tmp_path), max_entries=3)
+
+    for i in range(5):
+        writer.set(f"key{i}", {"value": i})
+
+    assert reader.get("key4") == {"value": 4}
+    assert len(list(tmp_path.iterdir())) == 3
+
+    reader.clear()
+    assert writer.get("key4") is None
+
+
+def test_filesystem_cache_prunes_every_few_writes(tmp_path):
+    cache = FileSystemCache(str(tmp_path), max_entries=100)
+
+    with patch.object(FileSystemCache, "_entry_paths", wraps=cache._entry_paths) as listing:
+        for i in range(150):
+            cache.set(f"key{i}", i)
+
+    # Un listado cada 10 escrituras, y nunca más de 10 entradas de más
+    assert listing.call_count == 15
+    assert len(list(tmp_path.iterdir())) == 100
+    assert cache.get("key149") == 149
+
+
+def test_artifact_cache_tracks_its_size_without_walking(tmp_path):
+    cache = ArtifactCache(str(tmp_path), max_bytes=100)
+
+    def store(key, size):
+        temp_path = cache.temp_path(key)
+        with open(temp_path, "wb") as file:
+            file.write(b"x" * size)
+        cache.store(key, temp_path)
+
+    store("a", 40)
+    os.utime(cache.path("a"), (1, 1))
+    with patch.object(ArtifactCache, "_artifacts", wraps=cache._artifacts) as walk:
+        store("b", 40)
+        store("b", 40)  # reemplazar un artefacto no suma su tamaño dos veces
+        assert walk.call_count == 0
+
+        # Al pasar de max_bytes se recorre una vez y se baja hasta PRUNE_TARGET
+        store("c", 40)
+        assert walk.call_count == 1
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None and cache.get("c") is not None
+    assert cache._read_size() == 80
+
+    # Otro proceso sobre el mismo directorio ve el mismo tamaño
+    assert ArtifactCache(str(tmp_path), max_bytes=100)._read_size() == 80
+
+
+def test_versioned_cache_invalidation_reaches_every_process(tmp_path):
+    worker1 = VersionedCache(FileSystemCache(str(tmp_path)), "explore")
+    worker2 = VersionedCache(FileSystemCache(str(tmp_path)), "explore")
+
+    assert worker1.get_or_compute("query", lambda: [1, 2]) == [1, 2]
+    assert worker2.get_or_compute("query", lambda: [3]) == [1, 2]
+
+    worker2.invalidate()
+    assert worker1.get("query") is None
+    assert worker1.get_or_compute("query", lambda: [3]) == [3]
+
+
+def test_versioned_cache_discards_values_computed_during_invalidation():
+    cache = VersionedCache(MemoryCache(), "explore")
+
+    def compute_while_invalidating():
+        cache.invalidate()
+        return "stale"
+
+    assert cache.get_or_compute("query", compute_while_invalidating) == "stale"
+    assert cache.get("query") is None
+
+
+def test_fragment_cache_reuses_rendered_html_per_key():
+    environment = Environment(extensions=[FragmentCacheExtension])
+    template = environment.from_string('{% cache "card", id, version %}{{ title }}{% endcache %}')
+
+    assert template.render(id=1, version="v1", title="First") == "First"
+    assert template.render(id=1, version="v1", title="Second") == "First"
+    assert template.render(id=1, version="v2", title="Second") == "Second"
+    assert template.render(id=2, version="v1", title="Other") == "Other"
+
+    # Sin versión no se cachea
+    assert template.render(id=3, version=None, title="A") == "A"
+    assert template.render(id=3, version=None, title="B") == "B"
@@ -21,7 +21,7 @@ def test_explore_post_empty(test_client):
             'max_products': None
         })
     assert response.status_code == 200
-    assert isinstance(response.json, list)
+    assert isinstance(response.json['items'], list)
 
 
 # Test con query de busqueada
@@ -35,7 +35,7 @@ def test_explore_post_with_query(test_client):
             'sorting': 'newest'
         })
     assert response.status_code == 200
-    assert isinstance(response.json, list)
+    assert isinstance(response.json['items'], list)
 
 
 # Test con tipo de publicacion
@@ -49,7 +49,7 @@ def test_explore_post_with_publication_type(test_client):
             'sorting': 'newest'
         })
     assert response.status_code == 200
-    assert isinstance(response.json, list)
+    assert isinstance(response.json['items'], list)
 
 
 # Test con diferentes ordenamientos
@@ -89,7 +89,7 @@ def test_explore_post_with_feature_limits(test_client):
             'max_features': 100
         })
     assert response.status_code == 200
-    assert isinstance(response.json, list)
+    assert isinstance(response.json['items'], list)
 
 
 # Test con limites de productos
@@ -105,7 +105,7 @@ def test_explore_post_with_product_limits(test_client):
             'max_products': 100
         })
     assert response.status_code == 200
-    assert isinstance(response.json, list)
+    assert isinstance(response.json['items'], list)
 
 
 # Test con tipo de publicación inválido
@@ -119,7 +119,7 @@ def test_explore_with_invalid_publication_type(test_client):
             'sorting': 'newest'
         })
     assert response.status_code == 200
-    assert isinstance(response.json, list)
+    assert isinstance(response.json['items'], list)
 
 
 # Test con un valor de ordenamiento inválido
@@ -133,7 +133,7 @@ def test_explore_post_invalid_sorting(test_client):
             'sorting': 'invalid_sort'  # Valor inválido
         })
     assert response.status_code == 200  # Debería usar el valor por defecto 'newest'
-    assert isinstance(response.json, list)
+    assert isinstance(response.json['items'], list)
 
 
 # Test con JSON mal formado
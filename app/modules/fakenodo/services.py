@@ -9,7 +9,8 @@ class FakenodoService(BaseService):
     def get_deposition(self, id):
         return self.deposition_repository.get_by_id(id)
 
-    def create_new_deposition(self, dataset, parsedUVL):
+    def create_new_deposition(self, dataset, ingestions: dict):
+        # ingestions maps each UVL filename to the UVLIngestion computed when the dataset was uploaded
         ds_meta_data = dataset.ds_meta_data
         metadataJSON = {
             "title": ds_meta_data.title,
@@ -19,7 +20,9 @@ class FakenodoService(BaseService):
                 if ds_meta_data.publication_type.value != "none"
                 else None
             ),
-            "models": parsedUVL,
+            "models": [
+                {filename.split(".")[0]: ingestion.hierarchy} for filename, ingestion in ingestions.items()
+            ],
             "description": ds_meta_data.description,
             "creators": [
                 {
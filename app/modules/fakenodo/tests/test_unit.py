@@ -55,7 +55,7 @@ def test_create_deposition_service_success(test_client):
 
     assert deposition.dep_metadata["title"] == "Test Dataset Title"
     assert deposition.dep_metadata["description"] == "This is a test dataset description."
-    assert deposition.dep_metadata["models"] == {}
+    assert deposition.dep_metadata["models"] == []
     assert deposition.dep_metadata["keywords"] == ["test", "uvlhub"]
     assert deposition.dep_metadata["access_right"] == "open"
     assert deposition.dep_metadata["license"] == "CC-BY-4.0"
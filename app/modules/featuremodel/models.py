@@ -37,6 +37,15 @@ class FMMetrics(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     solver = db.Column(db.Text)
     not_solver = db.Column(db.Text)
+    # Configuration counts easily exceed any integer column, a double keeps them comparable
+    number_of_configurations = db.Column(db.Double, index=True)
+    number_of_core_features = db.Column(db.Integer)
+    number_of_dead_features = db.Column(db.Integer)
+    number_of_atomic_sets = db.Column(db.Integer)
+    core_features = db.Column(db.JSON)
+    dead_features = db.Column(db.JSON)
+    atomic_sets = db.Column(db.JSON)
+    analyzed_at = db.Column(db.DateTime)
 
     def __repr__(self):
         return f'FMMetrics<solver={self.solver}, not_solver={self.not_solver}>'
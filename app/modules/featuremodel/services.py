@@ -1,3 +1,4 @@
+from app.modules.dataset.repositories import StatsCounterRepository
 from app.modules.featuremodel.repositories import FMMetaDataRepository, FeatureModelRepository
 from app.modules.hubfile.services import HubfileService
 from core.services.BaseService import BaseService
@@ -7,6 +8,7 @@ class FeatureModelService(BaseService):
     def __init__(self):
         super().__init__(FeatureModelRepository())
         self.hubfile_service = HubfileService()
+        self.stats_counter_repository = StatsCounterRepository()
 
     def total_feature_model_views(self) -> int:
         return self.hubfile_service.total_hubfile_views()
@@ -15,7 +17,7 @@ class FeatureModelService(BaseService):
         return self.hubfile_service.total_hubfile_downloads()
 
     def count_feature_models(self):
-        return self.repository.count_feature_models()
+        return self.stats_counter_repository.get_value("feature_models")
 
     class FMMetaDataService(BaseService):
         def __init__(self):
@@ -0,0 +1,43 @@
+import os
+from datetime import datetime, timezone
+
+from app import db
+
+
+class HubfileConversion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    hubfile_id = db.Column(db.Integer, db.ForeignKey('file.id', ondelete='CASCADE'), nullable=False)
+    format = db.Column(db.String(16), nullable=False)
+    name = db.Column(db.String(140), nullable=False)
+    checksum = db.Column(db.String(120), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    flamapy_version = db.Column(db.String(120), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    hubfile = db.relationship(
+        'Hubfile', backref=db.backref('conversions', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    )
+
+    __table_args__ = (
+        db.UniqueConstraint('hubfile_id', 'format', name='uq_hubfile_conversion_hubfile_format'),
+    )
+
+    def get_path(self) -> str:
+        return os.path.join(
+            os.getenv('WORKING_DIR', ''), 'uploads', 'conversions', f'file_{self.hubfile_id}', self.name
+        )
+
+    def __repr__(self):
+        return f'HubfileConversion<{self.hubfile_id}, {self.format}>'
+
+
+class UVLValidation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    checksum = db.Column(db.String(120), nullable=False, unique=True)
+    parser_version = db.Column(db.String(120), nullable=False)
+    valid = db.Column(db.Boolean, nullable=False)
+    errors = db.Column(db.JSON, nullable=False)
+    validated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'UVLValidation<{self.checksum}, valid={self.valid}>'
@@ -1,7 +1,82 @@
-from app.modules.flamapy.models import Flamapy
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+
+from app.modules.dataset.models import DataSet, DSMetaData
+from app.modules.featuremodel.models import FeatureModel, FMMetaData, FMMetrics
+from app.modules.flamapy.models import HubfileConversion, UVLValidation
+from app.modules.hubfile.models import Hubfile
 from core.repositories.BaseRepository import BaseRepository
 
 
-class FlamapyRepository(BaseRepository):
+class HubfileConversionRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(HubfileConversion)
+
+    def get_dataset_hubfiles(self, dataset_id: int) -> list:
+        return (
+            Hubfile.query.join(FeatureModel)
+            .filter(FeatureModel.data_set_id == dataset_id)
+            .order_by(Hubfile.id)
+            .all()
+        )
+
+    def get_by_hubfiles(self, hubfile_ids: list, format: str, flamapy_version: str) -> dict:
+        if not hubfile_ids:
+            return {}
+
+        conversions = self.model.query.filter(
+            self.model.hubfile_id.in_(hubfile_ids),
+            self.model.format == format,
+            self.model.flamapy_version == flamapy_version,
+        )
+        return {conversion.hubfile_id: conversion for conversion in conversions}
+
+
+class FeatureModelAnalysisRepository(BaseRepository):
     def __init__(self):
-        super().__init__(Flamapy)
+        super().__init__(FMMetrics)
+
+    def get_dataset(self, dataset_id: int):
+        return (
+            DataSet.query
+            .options(
+                selectinload(DataSet.ds_meta_data).selectinload(DSMetaData.ds_metrics),
+                selectinload(DataSet.feature_models).selectinload(FeatureModel.files),
+                selectinload(DataSet.feature_models)
+                .selectinload(FeatureModel.fm_meta_data)
+                .selectinload(FMMetaData.fm_metrics),
+            )
+            .filter(DataSet.id == dataset_id)
+            .first()
+        )
+
+
+class UVLValidationRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(UVLValidation)
+
+    def get_by_checksum(self, checksum: str):
+        return self.model.query.filter_by(checksum=checksum).first()
+
+    def get_with_hubfile(self, hubfile_id: int):
+        # (hubfile, validation) in a single query, validation is None when the file was never validated
+        return (
+            self.session.query(Hubfile, UVLValidation)
+            .outerjoin(UVLValidation, UVLValidation.checksum == Hubfile.checksum)
+            .filter(Hubfile.id == hubfile_id)
+            .first()
+        )
+
+    def save(self, checksum: str, **kwargs) -> UVLValidation:
+        validation = self.get_by_checksum(checksum)
+        if validation is None:
+            try:
+                # Another request may validate the same file concurrently
+                with self.session.begin_nested():
+                    return self.create(commit=False, checksum=checksum, **kwargs)
+            except IntegrityError:
+                validation = self.get_by_checksum(checksum)
+
+        for key, value in kwargs.items():
+            setattr(validation, key, value)
+        return validation
@@ -1,7 +1,592 @@
-from app.modules.flamapy.repositories import FlamapyRepository
+import itertools
+import logging
+import os
+import signal
+import sys
+import tempfile
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from importlib.metadata import PackageNotFoundError, version
+
+from antlr4 import CommonTokenStream, FileStream
+from antlr4.error.ErrorListener import ErrorListener
+from flask import current_app
+from flamapy.metamodels.bdd_metamodel.models import BDDModel
+from flamapy.metamodels.bdd_metamodel.operations import BDDConfigurationsNumber, BDDFeatureInclusionProbability
+from flamapy.metamodels.fm_metamodel.operations import FMAtomicSets
+from flamapy.metamodels.fm_metamodel.transformations import UVLReader, GlencoeWriter, SPLOTWriter
+from flamapy.metamodels.pysat_metamodel.transformations import FmToPysat, DimacsWriter
+
+from uvl.UVLCustomLexer import UVLCustomLexer
+from uvl.UVLPythonParser import UVLPythonParser
+
+from app.modules.flamapy.models import HubfileConversion, UVLValidation
+from app.modules.featuremodel.models import FMMetrics
+from app.modules.flamapy.repositories import (
+    FeatureModelAnalysisRepository,
+    HubfileConversionRepository,
+    UVLValidationRepository,
+)
+from app.modules.hubfile.models import Hubfile
+from core.cache.objects import ObjectCache
+from core.managers.cache_manager import get_artifact_cache
+from core.managers.task_manager import submit_task
 from core.services.BaseService import BaseService
 
+logger = logging.getLogger(__name__)
+
+CONVERSIONS_CACHE = "conversions"
+
+# Suffix appended to the UVL file name when a converted model is downloaded
+CONVERSION_SUFFIXES = {
+    "DIMACS": "_cnf.txt",
+    "GLENCOE": "_glencoe.txt",
+    "SPLOT": "_splot.txt",
+}
+
+
+# Bump when validate_uvl changes, so every stored verdict is recomputed
+UVL_VALIDATION_REVISION = 2
+
+
+def flamapy_version() -> str:
+    versions = []
+    for package in ("flamapy-fw", "flamapy-fm", "flamapy-sat"):
+        try:
+            versions.append(version(package))
+        except PackageNotFoundError:
+            versions.append("unknown")
+    return "/".join(versions)
+
+
+def uvl_parser_version() -> str:
+    try:
+        parser_version = version("uvlparser")
+    except PackageNotFoundError:
+        parser_version = "unknown"
+    return f"uvlparser-{parser_version}/{UVL_VALIDATION_REVISION}"
+
+
+class UVLErrorListener(ErrorListener):
+    def __init__(self):
+        self.errors = []
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+        if "\\t" in msg:
+            warning_message = (
+                f"The UVL has the following warning that prevents reading it: "
+                f"Line {line}:{column} - {msg}"
+            )
+            logger.warning(warning_message)
+            self.errors.append(warning_message)
+        else:
+            error_message = (
+                f"The UVL has the following error that prevents reading it: "
+                f"Line {line}:{column} - {msg}"
+            )
+            self.errors.append(error_message)
+
+
+def validate_uvl(uvl_path: str) -> list:
+    input_stream = FileStream(uvl_path)
+    lexer = UVLCustomLexer(input_stream)
+
+    error_listener = UVLErrorListener()
+
+    lexer.removeErrorListeners()
+    lexer.addErrorListener(error_listener)
+
+    stream = CommonTokenStream(lexer)
+    parser = UVLPythonParser(stream)
+
+    parser.removeErrorListeners()
+    parser.addErrorListener(error_listener)
+
+    # The token stream is lazy: nothing is read, and no error reported, until the model is parsed
+    parser.featureModel()
+
+    return error_listener.errors
+
+
+# Rough size in memory of a parsed model, per byte of its UVL file, used to bound the parsed model cache
+PARSED_MODEL_BASE_SIZE = 32 * 1024
+PARSED_MODEL_SIZE_FACTORS = {"fm": 16, "sat": 8}
+
+# Parsed FeatureModel and PySAT models of the current process (a conversion worker or the web worker itself)
+parsed_models = ObjectCache()
+
+
+def configure_parsed_models(max_bytes: int):
+    global parsed_models
+    parsed_models = ObjectCache(max_bytes=max_bytes)
+
+
+def _load_model(kind: str, uvl_path: str, checksum: str, create):
+    if checksum is None:
+        return create()
+
+    size = PARSED_MODEL_BASE_SIZE + PARSED_MODEL_SIZE_FACTORS[kind] * os.path.getsize(uvl_path)
+    return parsed_models.get_or_create(f"{kind}:{checksum}", create, size)
+
+
+def load_feature_model(uvl_path: str, checksum: str = None):
+    # Hubfiles are immutable, so a parsed model can be reused for every file with the same checksum
+    return _load_model("fm", uvl_path, checksum, lambda: UVLReader(uvl_path).transform())
+
+
+def load_sat_model(uvl_path: str, checksum: str = None):
+    return _load_model(
+        "sat", uvl_path, checksum, lambda: FmToPysat(load_feature_model(uvl_path, checksum)).transform()
+    )
+
+
+def write_conversion(uvl_path: str, format: str, output_path: str, checksum: str = None):
+    if format == "DIMACS":
+        DimacsWriter(output_path, load_sat_model(uvl_path, checksum)).transform()
+    elif format == "GLENCOE":
+        GlencoeWriter(output_path, load_feature_model(uvl_path, checksum)).transform()
+    elif format == "SPLOT":
+        SPLOTWriter(output_path, load_feature_model(uvl_path, checksum)).transform()
+    else:
+        raise ValueError(f"Unsupported conversion format: {format}")
+
+
+def analyze_feature_model(uvl_path: str, checksum: str = None) -> dict:
+    """
+    Number of configurations, core and dead features and atomic sets of a UVL model, using the dd BDD backend.
+    The BDD is compiled from the CNF of the PySAT model, since FmToBDD cannot read quoted feature names.
+    """
+    feature_model = load_feature_model(uvl_path, checksum)
+    sat_model = load_sat_model(uvl_path, checksum)
+
+    clauses = sat_model.get_all_clauses()
+    variables = sorted(set(sat_model.variables.values()) | {abs(literal) for clause in clauses for literal in clause})
+    formula = " & ".join(
+        "(" + " | ".join(f"x{literal}" if literal > 0 else f"!x{-literal}" for literal in clause) + ")"
+        for clause in clauses
+    ) or "TRUE"
+    bdd_model = BDDModel.from_logic_formula(formula, [f"x{variable}" for variable in variables])
+
+    configurations = BDDConfigurationsNumber().execute(bdd_model).get_result()
+    features = {f"x{variable}": name.strip('"') for variable, name in sat_model.features.items()}
+    if configurations:
+        probabilities = BDDFeatureInclusionProbability().execute(bdd_model).get_result()
+        core_features = [name for variable, name in features.items() if probabilities.get(variable, 0) >= 1.0]
+        dead_features = [name for variable, name in features.items() if probabilities.get(variable, 0) <= 0.0]
+    else:
+        # A void model has no core features and every feature is dead
+        core_features, dead_features = [], list(features.values())
+
+    atomic_sets = [
+        [feature.name.strip('"') for feature in atomic_set]
+        for atomic_set in FMAtomicSets().execute(feature_model).get_result()
+    ]
+
+    return {
+        "configurations": configurations,
+        "core_features": core_features,
+        "dead_features": dead_features,
+        "atomic_sets": atomic_sets,
+    }
+
+
+def configurations_column(configurations: int) -> float:
+    # Exact counts beyond the range of a double are stored as its maximum, which still sorts them last
+    return float(min(configurations, int(sys.float_info.max)))
+
+
+class ConversionTimeout(Exception):
+    pass
+
+
+def _raise_conversion_timeout(signum, frame):
+    raise ConversionTimeout()
+
+
+def run_with_timeout(timeout, func, *args):
+    # The alarm interrupts a job that takes longer than timeout seconds, only possible in a worker's main thread
+    if timeout is None:
+        return func(*args)
+
+    previous_handler = signal.signal(signal.SIGALRM, _raise_conversion_timeout)
+    signal.alarm(timeout)
+    try:
+        return func(*args)
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def run_conversion(uvl_path: str, format: str, output_path: str, checksum: str, timeout: int):
+    try:
+        run_with_timeout(timeout, write_conversion, uvl_path, format, output_path, checksum)
+    except ConversionTimeout:
+        raise ConversionTimeout(f"Converting {uvl_path} to {format} took more than {timeout} seconds")
+
+
+def run_analysis(uvl_path: str, checksum: str, timeout: int) -> dict:
+    try:
+        return run_with_timeout(timeout, analyze_feature_model, uvl_path, checksum)
+    except ConversionTimeout:
+        raise ConversionTimeout(f"Analyzing {uvl_path} took more than {timeout} seconds")
+
+
+class ConversionEngine:
+    """
+    Runs the CPU-bound flamapy conversions and analyses in a bounded pool of worker processes, so the
+    conversions of a multi-file download run in parallel instead of serially under the GIL. Every conversion
+    is interrupted after timeout seconds, every analysis after analysis_timeout seconds. With max_workers=0
+    (used by the test suite) jobs run in the calling thread. Each process keeps its own cache of parsed models,
+    bounded by model_cache_bytes.
+    """
+
+    def __init__(self, max_workers: int, timeout: int, model_cache_bytes: int = None, analysis_timeout: int = None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.analysis_timeout = analysis_timeout or timeout
+        self.model_cache_bytes = model_cache_bytes
+        self.executor = None
+        self._lock = threading.Lock()
+        if model_cache_bytes is not None and not max_workers:
+            configure_parsed_models(model_cache_bytes)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self.executor is None:
+                options = {}
+                if self.model_cache_bytes is not None:
+                    options = {"initializer": configure_parsed_models, "initargs": (self.model_cache_bytes,)}
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers, **options)
+            return self.executor
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        # A worker that died takes the whole pool with it, the next job starts a new one
+        with self._lock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, job, *args) -> Future:
+        # job is a module level function (so it can be pickled) whose last argument is the timeout
+        if not self.max_workers:
+            future = Future()
+            try:
+                future.set_result(job(*args[:-1], None))
+            except Exception as exc:
+                future.set_exception(exc)
+            return future
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(job, *args)
+        except BrokenProcessPool:
+            self._reset(executor)
+            executor = self._get_executor()
+            future = executor.submit(job, *args)
+
+        future.add_done_callback(lambda done: self._check_pool(executor, done))
+        return future
+
+    def submit(self, uvl_path: str, format: str, output_path: str, checksum: str = None) -> Future:
+        return self._submit(run_conversion, uvl_path, format, output_path, checksum, self.timeout)
+
+    def analyze(self, uvl_path: str, checksum: str = None) -> Future:
+        return self._submit(run_analysis, uvl_path, checksum, self.analysis_timeout)
+
+    def _check_pool(self, executor: ProcessPoolExecutor, future: Future):
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._reset(executor)
+
+
+_engine_lock = threading.Lock()
+
+
+def get_conversion_engine() -> ConversionEngine:
+    with _engine_lock:
+        if "conversion_engine" not in current_app.extensions:
+            current_app.extensions["conversion_engine"] = ConversionEngine(
+                max_workers=current_app.config.get("CONVERSION_MAX_WORKERS", 0),
+                timeout=current_app.config.get("CONVERSION_TIMEOUT", 60),
+                model_cache_bytes=current_app.config.get("FEATURE_MODEL_CACHE_MAX_BYTES"),
+                analysis_timeout=current_app.config.get("ANALYSIS_TIMEOUT"),
+            )
+        return current_app.extensions["conversion_engine"]
+
+
+class FlamapyService:
+    def __init__(self):
+        self.flamapy_version = flamapy_version()
+
+    def conversion_key(self, checksum: str, format: str) -> str:
+        return f"{checksum}:{format}:{self.flamapy_version}"
+
+    def convert(self, uvl_path: str, checksum: str, format: str) -> str:
+        # Converted models are cached by content, so every file with the same checksum shares them
+        if format not in CONVERSION_SUFFIXES:
+            raise ValueError(f"Unsupported conversion format: {format}")
+
+        engine = get_conversion_engine()
+        return get_artifact_cache(CONVERSIONS_CACHE).get_or_create(
+            self.conversion_key(checksum, format),
+            lambda output_path: engine.submit(uvl_path, format, output_path, checksum).result()
+        )
+
+    def convert_many(self, files, format: str):
+        """
+        Converts (filename, uvl_path, checksum) files to format, returning an iterator of (arcname, source) that
+        yields the cached conversions first and then every new one as soon as its worker finishes. The jobs are
+        submitted right away, the iterator can be consumed later (e.g. while streaming a response) without an
+        app context. Conversions that fail or time out are logged and skipped. UVL files are passed through as
+        paths; conversions are handed out as open files, so a concurrent cache eviction cannot remove them
+        before they are read.
+        """
+        if format != "UVL" and format not in CONVERSION_SUFFIXES:
+            raise ValueError(f"Unsupported conversion format: {format}")
+
+        ready = []
+        cached = []
+        jobs = {}
+        cache = get_artifact_cache(CONVERSIONS_CACHE)
+        engine = get_conversion_engine()
+
+        for filename, uvl_path, checksum in files:
+            if format == "UVL":
+                ready.append((filename, uvl_path))
+                continue
+
+            key = self.conversion_key(checksum, format)
+            arcname = self.converted_filename(filename, format)
+            if cache.get(key) is not None:
+                cached.append((arcname, key, uvl_path, checksum))
+                continue
+
+            temp_path = cache.temp_path(key)
+            jobs[engine.submit(uvl_path, format, temp_path, checksum)] = (arcname, key, temp_path)
+
+        def results():
+            try:
+                yield from ready
+                for arcname, key, uvl_path, checksum in cached:
+                    # Opened only when it is about to be read, converting it again if it was evicted meanwhile
+                    try:
+                        source = cache.open_or_create(
+                            key, lambda output_path: engine.submit(uvl_path, format, output_path, checksum).result()
+                        )
+                    except Exception as exc:
+                        logger.error(f"Error converting {arcname}: {exc}")
+                        continue
+                    yield arcname, source
+                for future in as_completed(jobs):
+                    arcname, key, temp_path = jobs[future]
+                    try:
+                        future.result()
+                    except Exception as exc:
+                        logger.error(f"Error converting {arcname}: {exc}")
+                        continue
+                    yield arcname, cache.store_open(key, temp_path)
+            finally:
+                # Drop the leftovers of failed jobs and of a consumer that stopped reading halfway
+                for future, (_, _, temp_path) in jobs.items():
+                    future.cancel()
+                    cache.discard(temp_path)
+
+        return results()
+
+    def convert_hubfile(self, hubfile: Hubfile, format: str) -> str:
+        return self.convert(hubfile.get_path(), hubfile.checksum, format)
+
+    @staticmethod
+    def converted_filename(filename: str, format: str) -> str:
+        return f"{filename}{CONVERSION_SUFFIXES[format]}"
+
+
+class HubfileConversionService(BaseService):
+    """
+    Publish-time stage that stores the DIMACS, Glencoe and SPLOT conversions of every Hubfile of a dataset
+    under uploads/conversions, recording their size and checksum, so format downloads only serve files.
+    Files without a stored conversion (e.g. published before this stage existed) are converted on demand.
+    """
+
+    def __init__(self):
+        super().__init__(HubfileConversionRepository())
+        self.flamapy_service = FlamapyService()
+
+    def schedule_dataset(self, dataset_id: int):
+        return submit_task(self.convert_dataset, dataset_id, key=f"hubfile_conversions:{dataset_id}")
+
+    def convert_dataset(self, dataset_id: int):
+        # dataset.services imports this module
+        from app.modules.dataset.services import calculate_checksum_and_size
+
+        engine = get_conversion_engine()
+        version = self.flamapy_service.flamapy_version
+
+        jobs = {}
+        for hubfile in self.repository.get_dataset_hubfiles(dataset_id):
+            stored = {conversion.format: conversion for conversion in hubfile.conversions}
+            for format in CONVERSION_SUFFIXES:
+                conversion = stored.get(format)
+                if conversion and conversion.flamapy_version == version and os.path.exists(conversion.get_path()):
+                    continue
+
+                # Outdated conversions are overwritten, new ones are only added to the session once written
+                conversion = conversion or HubfileConversion(hubfile_id=hubfile.id, format=format)
+                conversion.name = FlamapyService.converted_filename(hubfile.name, format)
+                os.makedirs(os.path.dirname(conversion.get_path()), exist_ok=True)
+                file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(conversion.get_path()), prefix=".")
+                os.close(file_descriptor)
+                jobs[engine.submit(hubfile.get_path(), format, temp_path, hubfile.checksum)] = (conversion, temp_path)
+
+        converted = 0
+        for future in as_completed(jobs):
+            conversion, temp_path = jobs[future]
+            try:
+                future.result()
+                os.replace(temp_path, conversion.get_path())
+            except Exception as exc:
+                logger.error(f"Error converting file {conversion.hubfile_id} to {conversion.format}: {exc}")
+                continue
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+            conversion.checksum, conversion.size = calculate_checksum_and_size(conversion.get_path())
+            conversion.flamapy_version = version
+            self.repository.session.add(conversion)
+            converted += 1
+
+        self.repository.session.commit()
+        logger.info(f"Stored {converted} of {len(jobs)} pending conversions for dataset {dataset_id}")
+
+    def get_stored_path(self, hubfile: Hubfile, format: str):
+        conversion = self.repository.get_by_hubfiles([hubfile.id], format, self.flamapy_service.flamapy_version)
+        conversion = conversion.get(hubfile.id)
+        if conversion is not None and os.path.exists(conversion.get_path()):
+            return conversion.get_path()
+        return None
+
+    def conversion_entries(self, files, format: str):
+        """
+        Returns the (arcname, source) entries of (hubfile_id, filename, uvl_path, checksum) files in format.
+        Stored conversions are served as they are, the remaining files go through FlamapyService.convert_many.
+        """
+        if format == "UVL":
+            return [(filename, uvl_path) for _, filename, uvl_path, _ in files]
+
+        stored = self.repository.get_by_hubfiles(
+            [hubfile_id for hubfile_id, _, _, _ in files], format, self.flamapy_service.flamapy_version
+        )
+
+        entries = []
+        missing = []
+        for hubfile_id, filename, uvl_path, checksum in files:
+            conversion = stored.get(hubfile_id)
+            if conversion is not None and os.path.exists(conversion.get_path()):
+                entries.append((conversion.name, conversion.get_path()))
+            else:
+                missing.append((filename, uvl_path, checksum))
+
+        if not missing:
+            return entries
+        return itertools.chain(entries, self.flamapy_service.convert_many(missing, format))
+
+
+class FeatureModelAnalysisService(BaseService):
+    """
+    Background stage that stores the BDD analysis of every feature model of a dataset in its FMMetrics, and the
+    total number of configurations in the DSMetrics of the dataset, so explore never runs a solver per request.
+    """
 
-class FlamapyService(BaseService):
     def __init__(self):
-        super().__init__(FlamapyRepository())
+        super().__init__(FeatureModelAnalysisRepository())
+
+    def schedule_dataset(self, dataset_id: int):
+        return submit_task(self.analyze_dataset, dataset_id, key=f"feature_model_analysis:{dataset_id}")
+
+    def analyze_dataset(self, dataset_id: int):
+        dataset = self.repository.get_dataset(dataset_id)
+        if dataset is None:
+            return
+
+        engine = get_conversion_engine()
+        jobs = {}
+        for feature_model in dataset.feature_models:
+            fm_meta_data = feature_model.fm_meta_data
+            hubfile = next(
+                (file for file in feature_model.files if fm_meta_data and file.name == fm_meta_data.uvl_filename),
+                feature_model.files[0] if feature_model.files else None
+            )
+            if fm_meta_data is None or hubfile is None:
+                continue
+            jobs[engine.analyze(hubfile.get_path(), hubfile.checksum)] = fm_meta_data
+
+        analyzed = 0
+        total_configurations = 0
+        for future in as_completed(jobs):
+            fm_meta_data = jobs[future]
+            try:
+                analysis = future.result()
+            except Exception as exc:
+                logger.error(f"Error analyzing feature model {fm_meta_data.uvl_filename}: {exc}")
+                continue
+
+            fm_metrics = fm_meta_data.fm_metrics or FMMetrics()
+            fm_metrics.number_of_configurations = configurations_column(analysis["configurations"])
+            fm_metrics.number_of_core_features = len(analysis["core_features"])
+            fm_metrics.number_of_dead_features = len(analysis["dead_features"])
+            fm_metrics.number_of_atomic_sets = len(analysis["atomic_sets"])
+            fm_metrics.core_features = analysis["core_features"]
+            fm_metrics.dead_features = analysis["dead_features"]
+            fm_metrics.atomic_sets = analysis["atomic_sets"]
+            fm_metrics.analyzed_at = datetime.now(timezone.utc)
+            fm_meta_data.fm_metrics = fm_metrics
+            analyzed += 1
+            total_configurations += analysis["configurations"]
+
+        # The dataset total is only meaningful once every model has been analyzed
+        ds_metrics = dataset.ds_meta_data.ds_metrics
+        if ds_metrics is not None:
+            ds_metrics.number_of_configurations = (
+                configurations_column(total_configurations) if jobs and analyzed == len(jobs) else None
+            )
+
+        self.repository.session.commit()
+        logger.info(f"Analyzed {analyzed} of {len(jobs)} feature models of dataset {dataset_id}")
+
+
+class UVLValidationService(BaseService):
+    """
+    Validation verdicts of UVL files, stored per checksum when the files are uploaded. Hubfiles are immutable,
+    so a stored verdict is only recomputed when the parser version changes.
+    """
+
+    def __init__(self):
+        super().__init__(UVLValidationRepository())
+        self.parser_version = uvl_parser_version()
+
+    def validate(self, checksum: str, uvl_path: str, commit: bool = True) -> UVLValidation:
+        errors = validate_uvl(uvl_path)
+        validation = self.repository.save(
+            checksum, parser_version=self.parser_version, valid=not errors, errors=errors
+        )
+        if commit:
+            self.repository.session.commit()
+        return validation
+
+    def record(self, checksum: str, uvl_path: str, commit: bool = True) -> UVLValidation:
+        validation = self.repository.get_by_checksum(checksum)
+        if validation is not None and validation.parser_version == self.parser_version:
+            return validation
+        return self.validate(checksum, uvl_path, commit=commit)
+
+    def check_hubfile(self, hubfile_id: int):
+        row = self.repository.get_with_hubfile(hubfile_id)
+        if row is None:
+            return None
+
+        hubfile, validation = row
+        if validation is None or validation.parser_version != self.parser_version:
+            validation = self.validate(hubfile.checksum, hubfile.get_path())
+        return validation
@@ -1,18 +1,69 @@
+import hashlib
+import io
+import os
+import shutil
+import time
+from unittest.mock import patch
+from zipfile import ZipFile
+
 import pytest
 
+from app import db
+from app.modules.dataset.models import DataSet, DSMetaData, DSMetrics, PublicationType
+from app.modules.dataset.services import stream_zip
+from app.modules.featuremodel.models import FeatureModel, FMMetaData
+from app.modules.flamapy import services as flamapy_services
+from app.modules.flamapy.models import HubfileConversion, UVLValidation
+from app.modules.flamapy.services import (
+    CONVERSIONS_CACHE,
+    ConversionEngine,
+    ConversionTimeout,
+    FeatureModelAnalysisService,
+    FlamapyService,
+    HubfileConversionService,
+)
+from app.modules.hubfile.models import Hubfile
+from core.managers.cache_manager import get_artifact_cache
+
+UVL_EXAMPLE = os.path.join("app", "modules", "dataset", "uvl_examples", "file1.uvl")
+
 
 @pytest.fixture(scope='module')
-def test_client(test_client):
+def test_client(test_client, tmp_path_factory):
     """
     Extends the test_client fixture to add additional specific data for module testing.
     """
+    working_dir = tmp_path_factory.mktemp("working_dir")
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setenv("WORKING_DIR", str(working_dir))
     with test_client.application.app_context():
-        # Add HERE new elements to the database that you want to exist in the test context.
-        # DO NOT FORGET to use db.session.add(<element>) and db.session.commit() to save the data.
-        pass
+        ds_meta_data = DSMetaData(
+            title="Flamapy Dataset",
+            description="Dataset for conversion testing",
+            publication_type=PublicationType.JOURNAL_ARTICLE,
+        )
+        dataset = DataSet(user_id=1, ds_meta_data=ds_meta_data)
+        feature_model = FeatureModel(data_set=dataset)
+        db.session.add_all([ds_meta_data, dataset, feature_model])
+        db.session.commit()
+
+        dataset_folder = working_dir / "uploads" / "user_1" / f"dataset_{dataset.id}"
+        dataset_folder.mkdir(parents=True)
+        shutil.copy(UVL_EXAMPLE, dataset_folder / "file1.uvl")
+        with open(UVL_EXAMPLE, "rb") as file:
+            checksum = hashlib.md5(file.read()).hexdigest()
+
+        db.session.add(Hubfile(
+            name="file1.uvl", checksum=checksum, size=os.path.getsize(UVL_EXAMPLE), feature_model_id=feature_model.id
+        ))
+        db.session.commit()
+
+        get_artifact_cache(CONVERSIONS_CACHE).clear()
 
     yield test_client
 
+    monkeypatch.undo()
+
 
 def test_sample_assertion(test_client):
     """
@@ -22,3 +73,260 @@ def test_sample_assertion(test_client):
     """
     greeting = "Hello, World!"
     assert greeting == "Hello, World!", "The greeting does not coincide with 'Hello, World!'"
+
+
+@pytest.mark.parametrize("route, suffix", [
+    ("to_cnf", "_cnf.txt"),
+    ("to_glencoe", "_glencoe.txt"),
+    ("to_splot", "_splot.txt"),
+])
+def test_conversion_routes(test_client, route, suffix):
+    response = test_client.get(f"/flamapy/{route}/1")
+    assert response.status_code == 200
+    assert f"file1.uvl{suffix}" in response.headers["Content-Disposition"]
+    assert response.data
+
+
+def test_conversion_routes_not_found(test_client):
+    response = test_client.get("/flamapy/to_cnf/999")
+    assert response.status_code == 404
+
+
+def test_conversions_are_cached_by_checksum(test_client):
+    hubfile = Hubfile.query.get(1)
+    service = FlamapyService()
+
+    with patch.object(flamapy_services, "write_conversion", wraps=flamapy_services.write_conversion) as write:
+        first_path = service.convert_hubfile(hubfile, "DIMACS")
+        second_path = service.convert(UVL_EXAMPLE, hubfile.checksum, "DIMACS")
+
+    assert first_path == second_path
+    assert write.call_count == 0  # already converted by test_conversion_routes
+
+    with open(first_path) as converted:
+        assert "p cnf" in converted.read()
+
+    with patch.object(flamapy_services, "write_conversion", wraps=flamapy_services.write_conversion) as write:
+        service.convert(UVL_EXAMPLE, "another-checksum", "DIMACS")
+    assert write.call_count == 1
+
+
+def test_conversion_unsupported_format(test_client):
+    with pytest.raises(ValueError):
+        FlamapyService().convert(UVL_EXAMPLE, "checksum", "XML")
+
+
+def test_convert_many_yields_conversions_and_skips_failures(test_client):
+    hubfile = Hubfile.query.get(1)
+    files = [
+        ("file1.uvl", UVL_EXAMPLE, hubfile.checksum),
+        ("broken.uvl", "does/not/exist.uvl", "broken-checksum"),
+    ]
+
+    results = dict(FlamapyService().convert_many(files, "SPLOT"))
+
+    assert list(results) == ["file1.uvl_splot.txt"]
+    with results["file1.uvl_splot.txt"] as source:
+        assert source.read()
+    assert dict(FlamapyService().convert_many(files, "UVL")) == {
+        "file1.uvl": UVL_EXAMPLE, "broken.uvl": "does/not/exist.uvl"
+    }
+
+
+def test_conversion_cache_eviction_during_download(test_client):
+    """
+    Filling the conversions cache past max_bytes while a ZIP is being streamed evicts the conversion
+    that has just been handed out, and the download still gets its whole content.
+    """
+    hubfile = Hubfile.query.get(1)
+    service = FlamapyService()
+    cache = get_artifact_cache(CONVERSIONS_CACHE)
+    with open(service.convert(UVL_EXAMPLE, hubfile.checksum, "SPLOT"), "rb") as converted:
+        expected = converted.read()
+    key = service.conversion_key(hubfile.checksum, "SPLOT")
+
+    def write_filler(path):
+        with open(path, "wb") as filler:
+            filler.write(b"x" * 16)
+
+    def entries():
+        for entry in service.convert_many([("file1.uvl", UVL_EXAMPLE, hubfile.checksum)], "SPLOT"):
+            # Handed out but not read yet: another request stores enough to evict it
+            cache.get_or_create("filler", write_filler)
+            assert not os.path.exists(cache.path(key))
+            yield entry
+
+    max_bytes = cache.max_bytes
+    cache.max_bytes = 16
+    try:
+        archive = io.BytesIO(b"".join(stream_zip(entries())))
+    finally:
+        cache.max_bytes = max_bytes
+        cache.clear()
+
+    with ZipFile(archive) as zipf:
+        assert zipf.read("file1.uvl_splot.txt") == expected
+
+
+def test_conversion_engine_runs_jobs_in_worker_processes(tmp_path):
+    engine = ConversionEngine(max_workers=2, timeout=60)
+    output_paths = [str(tmp_path / f"model_{i}.txt") for i in range(3)]
+
+    try:
+        futures = [engine.submit(UVL_EXAMPLE, "DIMACS", output_path) for output_path in output_paths]
+        for future in futures:
+            future.result(timeout=60)
+    finally:
+        engine.executor.shutdown()
+
+    for output_path in output_paths:
+        with open(output_path) as converted:
+            assert "p cnf" in converted.read()
+
+
+def test_conversion_engine_times_out_slow_jobs(tmp_path):
+    engine = ConversionEngine(max_workers=1, timeout=1)
+
+    # Los procesos se crean después del patch, así que heredan la conversión lenta
+    with patch.object(flamapy_services, "write_conversion", side_effect=lambda *args: time.sleep(10)):
+        future = engine.submit(UVL_EXAMPLE, "DIMACS", str(tmp_path / "slow.txt"))
+        try:
+            with pytest.raises(ConversionTimeout):
+                future.result(timeout=30)
+        finally:
+            engine.executor.shutdown()
+
+
+def test_convert_dataset_stores_conversions(test_client):
+    hubfile = Hubfile.query.get(1)
+    service = HubfileConversionService()
+
+    service.convert_dataset(hubfile.feature_model.data_set_id)
+
+    conversions = {conversion.format: conversion for conversion in HubfileConversion.query.filter_by(hubfile_id=1)}
+    assert sorted(conversions) == ["DIMACS", "GLENCOE", "SPLOT"]
+    for conversion in conversions.values():
+        with open(conversion.get_path(), "rb") as converted:
+            assert conversion.checksum == hashlib.md5(converted.read()).hexdigest()
+        assert conversion.size == os.path.getsize(conversion.get_path())
+
+    # Las descargas sirven los ficheros guardados sin volver a convertir
+    with patch.object(flamapy_services, "write_conversion") as write:
+        entries = list(service.conversion_entries([(1, "file1.uvl", UVL_EXAMPLE, hubfile.checksum)], "DIMACS"))
+        response = test_client.get("/flamapy/to_splot/1")
+        service.convert_dataset(hubfile.feature_model.data_set_id)
+
+    assert entries == [("file1.uvl_cnf.txt", conversions["DIMACS"].get_path())]
+    assert response.status_code == 200
+    with open(conversions["SPLOT"].get_path(), "rb") as converted:
+        assert response.data == converted.read()
+    assert write.call_count == 0
+
+
+def test_analyze_feature_model():
+    analysis = flamapy_services.analyze_feature_model(UVL_EXAMPLE)
+
+    assert analysis["configurations"] == 24
+    assert sorted(analysis["core_features"]) == ["Chat", "Connection", "Messages"]
+    assert analysis["dead_features"] == []
+    assert ["Chat", "Connection", "Messages"] in map(sorted, analysis["atomic_sets"])
+    assert ["Peer 2 Peer"] in analysis["atomic_sets"]
+
+
+def test_analyze_dataset_stores_metrics(test_client):
+    feature_model = Hubfile.query.get(1).feature_model
+    dataset = feature_model.data_set
+    feature_model.fm_meta_data = FMMetaData(
+        uvl_filename="file1.uvl", title="Chat", description="", publication_type=PublicationType.NONE
+    )
+    dataset.ds_meta_data.ds_metrics = DSMetrics(number_of_models=1, number_of_features=10)
+    db.session.commit()
+
+    FeatureModelAnalysisService().analyze_dataset(dataset.id)
+
+    fm_metrics = feature_model.fm_meta_data.fm_metrics
+    assert fm_metrics.number_of_configurations == 24
+    assert fm_metrics.number_of_core_features == 3
+    assert fm_metrics.number_of_dead_features == 0
+    assert fm_metrics.number_of_atomic_sets == len(fm_metrics.atomic_sets) == 8
+    assert fm_metrics.analyzed_at is not None
+    assert dataset.ds_meta_data.ds_metrics.number_of_configurations == 24
+
+
+def test_parsed_models_are_reused_by_checksum(tmp_path):
+    flamapy_services.configure_parsed_models(64 * 1024 * 1024)
+    with open(UVL_EXAMPLE, "rb") as file:
+        checksum = hashlib.md5(file.read()).hexdigest()
+
+    with patch.object(flamapy_services, "UVLReader", wraps=flamapy_services.UVLReader) as reader, \
+            patch.object(flamapy_services, "FmToPysat", wraps=flamapy_services.FmToPysat) as to_pysat:
+        for _ in range(2):
+            for format in ["DIMACS", "GLENCOE", "SPLOT"]:
+                flamapy_services.write_conversion(UVL_EXAMPLE, format, str(tmp_path / f"cached_{format}"), checksum)
+
+    assert reader.call_count == 1
+    assert to_pysat.call_count == 1
+
+    # El modelo reutilizado produce la misma salida que uno recién leído
+    for format in ["DIMACS", "GLENCOE", "SPLOT"]:
+        flamapy_services.write_conversion(UVL_EXAMPLE, format, str(tmp_path / f"fresh_{format}"))
+        assert (tmp_path / f"cached_{format}").read_text() == (tmp_path / f"fresh_{format}").read_text()
+
+
+def test_check_uvl_stores_and_reuses_verdict(test_client):
+    hubfile = Hubfile.query.get(1)
+
+    response = test_client.get("/flamapy/check_uvl/1")
+    assert response.status_code == 200
+    assert response.json == {"message": "Valid Model"}
+
+    validation = UVLValidation.query.filter_by(checksum=hubfile.checksum).one()
+    assert validation.valid and validation.errors == []
+
+    # El veredicto guardado se reutiliza sin volver a analizar el fichero
+    with patch.object(flamapy_services, "validate_uvl") as validate:
+        response = test_client.get("/flamapy/check_uvl/1")
+    assert response.status_code == 200
+    assert validate.call_count == 0
+
+    # Un cambio de versión del parser obliga a revalidar
+    with patch.object(flamapy_services, "uvl_parser_version", return_value="uvlparser-next/1"), \
+            patch.object(flamapy_services, "validate_uvl", return_value=["Line 1:0 - error"]) as validate:
+        response = test_client.get("/flamapy/check_uvl/1")
+    assert response.status_code == 400
+    assert response.json == {"errors": ["Line 1:0 - error"]}
+    assert validate.call_count == 1
+    assert UVLValidation.query.filter_by(checksum=hubfile.checksum).one().parser_version == "uvlparser-next/1"
+
+
+def test_check_uvl_rejects_malformed_model(test_client):
+    feature_model = FeatureModel.query.get(1)
+    content = b"features\n    Root\n        mandatory\n            A B C {{{\n"
+    dataset_folder = os.path.join(
+        os.getenv("WORKING_DIR"), "uploads", "user_1", f"dataset_{feature_model.data_set_id}"
+    )
+    with open(os.path.join(dataset_folder, "broken.uvl"), "wb") as file:
+        file.write(content)
+    checksum = hashlib.md5(content).hexdigest()
+    hubfile = Hubfile(name="broken.uvl", checksum=checksum, size=len(content), feature_model_id=feature_model.id)
+    db.session.add(hubfile)
+    db.session.commit()
+
+    try:
+        response = test_client.get(f"/flamapy/check_uvl/{hubfile.id}")
+        assert response.status_code == 400
+        assert response.json["errors"]
+        assert all("Line 4" in error for error in response.json["errors"])
+
+        validation = UVLValidation.query.filter_by(checksum=checksum).one()
+        assert not validation.valid
+    finally:
+        UVLValidation.query.filter_by(checksum=checksum).delete()
+        db.session.delete(hubfile)
+        db.session.commit()
+        os.remove(os.path.join(dataset_folder, "broken.uvl"))
+
+
+def test_check_uvl_not_found(test_client):
+    response = test_client.get("/flamapy/check_uvl/999")
+    assert response.status_code == 404
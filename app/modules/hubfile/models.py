@@ -15,7 +15,7 @@ class Hubfile(db.Model):
 
     def get_formatted_size(self):
         from app.modules.dataset.services import SizeService
-        return SizeService().get_human_readable_size(self.size)
+        return SizeService.get_human_readable_size(self.size)
 
     def get_owner_user(self) -> User:
         from app.modules.hubfile.services import HubfileService
@@ -50,6 +50,12 @@ class HubfileViewRecord(db.Model):
     file_id = db.Column(db.Integer, db.ForeignKey('file.id'), nullable=False)
     view_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     view_cookie = db.Column(db.String(36))
+    # user_id with 0 for anonymous users, NULLs would never collide in the unique constraint
+    user_key = db.Column(db.Integer, db.Computed('coalesce(user_id, 0)', persisted=True))
+
+    __table_args__ = (
+        db.UniqueConstraint('user_key', 'file_id', 'view_cookie', name='uq_file_view_record_user_file_cookie'),
+    )
 
     def __repr__(self):
         return '<FileViewRecord {}>'.format(self.id)
@@ -62,6 +68,13 @@ class HubfileDownloadRecord(db.Model):
     file_id = db.Column(db.Integer, db.ForeignKey('file.id'))
     download_date = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     download_cookie = db.Column(db.String(36), nullable=False)
+    user_key = db.Column(db.Integer, db.Computed('coalesce(user_id, 0)', persisted=True))
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            'user_key', 'file_id', 'download_cookie', name='uq_file_download_record_user_file_cookie'
+        ),
+    )
 
     def __repr__(self):
         return (
@@ -1,8 +1,11 @@
-from sqlalchemy import func
+from datetime import datetime, timezone
+
+from flask_login import current_user
 from app.modules.auth.models import User
 from app.modules.dataset.models import DataSet
 from app.modules.featuremodel.models import FeatureModel
 from app.modules.hubfile.models import Hubfile, HubfileDownloadRecord, HubfileViewRecord
+from core.managers.record_buffer_manager import buffer_record
 from core.repositories.BaseRepository import BaseRepository
 from app import db
 
@@ -24,20 +27,50 @@ class HubfileRepository(BaseRepository):
     def get_dataset_by_hubfile(self, hubfile: Hubfile) -> DataSet:
         return db.session.query(DataSet).join(FeatureModel).join(Hubfile).filter(Hubfile.id == hubfile.id).first()
 
+    def get_storage_location(self, hubfile_id: int):
+        # (owner user id, dataset id) of the file
+        return (
+            db.session.query(DataSet.user_id, DataSet.id)
+            .join(FeatureModel, FeatureModel.data_set_id == DataSet.id)
+            .join(Hubfile, Hubfile.feature_model_id == FeatureModel.id)
+            .filter(Hubfile.id == hubfile_id)
+            .first()
+        )
+
+    def get_names_by_dataset(self, dataset_id: int) -> list:
+        # (id, name) of every file of the dataset, without building the Hubfile objects
+        return (
+            db.session.query(Hubfile.id, Hubfile.name)
+            .join(FeatureModel, FeatureModel.id == Hubfile.feature_model_id)
+            .filter(FeatureModel.data_set_id == dataset_id)
+            .order_by(Hubfile.id)
+            .all()
+        )
+
 
 class HubfileViewRecordRepository(BaseRepository):
     def __init__(self):
         super().__init__(HubfileViewRecord)
 
-    def total_hubfile_views(self) -> int:
-        max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
-        return max_id if max_id is not None else 0
+    def buffer_new_record(self, file_id: int, user_cookie: str) -> bool:
+        return buffer_record(
+            self.model, ("user_id", "file_id", "view_cookie"), partition_by="file_id",
+            user_id=current_user.id if current_user.is_authenticated else None,
+            file_id=file_id,
+            view_date=datetime.now(timezone.utc),
+            view_cookie=user_cookie,
+        )
 
 
 class HubfileDownloadRecordRepository(BaseRepository):
     def __init__(self):
         super().__init__(HubfileDownloadRecord)
 
-    def total_hubfile_downloads(self) -> int:
-        max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
-        return max_id if max_id is not None else 0
+    def buffer_new_record(self, file_id: int, user_cookie: str) -> bool:
+        return buffer_record(
+            self.model, ("user_id", "file_id", "download_cookie"), partition_by="file_id",
+            user_id=current_user.id if current_user.is_authenticated else None,
+            file_id=file_id,
+            download_date=datetime.now(timezone.utc),
+            download_cookie=user_cookie,
+        )
@@ -1,20 +1,33 @@
 import os
+
+from sqlalchemy import inspect
+
 from app.modules.auth.models import User
 from app.modules.dataset.models import DataSet
+from app.modules.dataset.repositories import StatsCounterRepository
 from app.modules.hubfile.models import Hubfile
 from app.modules.hubfile.repositories import (
     HubfileDownloadRecordRepository,
     HubfileRepository,
     HubfileViewRecordRepository
 )
+from core.managers.cache_manager import get_local_cache
 from core.services.BaseService import BaseService
 
+# Storage path of every file by id, they never change once the file is stored
+HUBFILE_PATHS_CACHE = "hubfile_paths"
+
+
+def is_loaded(instance, relationship: str) -> bool:
+    return instance is not None and relationship not in inspect(instance).unloaded
+
 
 class HubfileService(BaseService):
     def __init__(self):
         super().__init__(HubfileRepository())
         self.hubfile_view_record_repository = HubfileViewRecordRepository()
         self.hubfile_download_record_repository = HubfileDownloadRecordRepository()
+        self.stats_counter_repository = StatsCounterRepository()
 
     def get_owner_user_by_hubfile(self, hubfile: Hubfile) -> User:
         return self.repository.get_owner_user_by_hubfile(hubfile)
@@ -22,28 +35,50 @@ class HubfileService(BaseService):
     def get_dataset_by_hubfile(self, hubfile: Hubfile) -> DataSet:
         return self.repository.get_dataset_by_hubfile(hubfile)
 
+    def get_storage_location(self, hubfile: Hubfile) -> tuple:
+        # (owner user id, dataset id), from the loaded relationships when the caller already has them
+        if is_loaded(hubfile, "feature_model") and is_loaded(hubfile.feature_model, "data_set"):
+            dataset = hubfile.feature_model.data_set
+            return dataset.user_id, dataset.id
+        return tuple(self.repository.get_storage_location(hubfile.id))
+
     def get_path_by_hubfile(self, hubfile: Hubfile) -> str:
+        # Only the storage location is cached, WORKING_DIR and the name are joined on every call
+        locations = get_local_cache(HUBFILE_PATHS_CACHE)
+        location = locations.get(hubfile.id)
+        if location is None:
+            location = self.get_storage_location(hubfile)
+            locations.set(hubfile.id, location)
 
-        hubfile_user = self.get_owner_user_by_hubfile(hubfile)
-        hubfile_dataset = self.get_dataset_by_hubfile(hubfile)
+        user_id, dataset_id = location
         working_dir = os.getenv('WORKING_DIR')
 
-        path = os.path.join(working_dir,
+        return os.path.join(working_dir,
                             'uploads',
-                            f'user_{hubfile_user.id}',
-                            f'dataset_{hubfile_dataset.id}',
+                            f'user_{user_id}',
+                            f'dataset_{dataset_id}',
                             hubfile.name)
 
-        return path
-
     def total_hubfile_views(self) -> int:
-        return self.hubfile_view_record_repository.total_hubfile_views()
+        return self.stats_counter_repository.get_value("file_views")
 
     def total_hubfile_downloads(self) -> int:
-        hubfile_download_record_repository = HubfileDownloadRecordRepository()
-        return hubfile_download_record_repository.total_hubfile_downloads()
+        return self.stats_counter_repository.get_value("file_downloads")
 
 
 class HubfileDownloadRecordService(BaseService):
     def __init__(self):
         super().__init__(HubfileDownloadRecordRepository())
+
+    def record_download(self, file_id: int, user_cookie: str) -> bool:
+        # Buffered and deduplicated per (user, file, cookie), written in batches
+        return self.repository.buffer_new_record(file_id, user_cookie)
+
+
+class HubfileViewRecordService(BaseService):
+    def __init__(self):
+        super().__init__(HubfileViewRecordRepository())
+
+    def record_view(self, file_id: int, user_cookie: str) -> bool:
+        # Buffered and deduplicated per (user, file, cookie), written in batches
+        return self.repository.buffer_new_record(file_id, user_cookie)
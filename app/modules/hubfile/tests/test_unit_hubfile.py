@@ -1,4 +1,19 @@
+import os
+
 import pytest
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app import db
+from app.modules.dataset.models import DataSet, DSMetaData, PublicationType
+from app.modules.dataset.services import DataSetService, StatsCounterService
+from app.modules.featuremodel.models import FeatureModel
+from app.modules.hubfile.models import Hubfile, HubfileViewRecord
+from app.modules.hubfile.services import HUBFILE_PATHS_CACHE, HubfileService
+from core.managers.cache_manager import get_local_cache
+from core.managers.record_buffer_manager import RecordBufferManager, insert_ignoring_duplicates
+
+VIEW_RECORD_KEY = ("user_id", "file_id", "view_cookie")
 
 
 @pytest.fixture(scope='module')
@@ -7,13 +22,34 @@ def test_client(test_client):
     Extends the test_client fixture to add additional specific data for module testing.
     """
     with test_client.application.app_context():
-        # Add HERE new elements to the database that you want to exist in the test context.
-        # DO NOT FORGET to use db.session.add(<element>) and db.session.commit() to save the data.
-        pass
+        ds_meta_data = DSMetaData(
+            title="Hubfile Dataset", description="Dataset for record testing", publication_type=PublicationType.NONE
+        )
+        dataset = DataSet(user_id=1, ds_meta_data=ds_meta_data)
+        feature_model = FeatureModel(data_set=dataset)
+        db.session.add_all([ds_meta_data, dataset, feature_model])
+        db.session.commit()
+
+        db.session.add(Hubfile(name="file1.uvl", checksum="checksum", size=1, feature_model_id=feature_model.id))
+        db.session.commit()
 
     yield test_client
 
 
+@pytest.fixture
+def record_buffer(test_client):
+    app = test_client.application
+    app.config["RECORD_BUFFER_EAGER"] = False
+    app.config["RECORD_BUFFER_FLUSH_INTERVAL"] = 3600
+    try:
+        yield RecordBufferManager(app)
+    finally:
+        app.config["RECORD_BUFFER_EAGER"] = True
+        with app.app_context():
+            HubfileViewRecord.query.delete()
+            db.session.commit()
+
+
 def test_sample_assertion(test_client):
     """
     Sample test to verify that the test framework and environment are working correctly.
@@ -22,3 +58,124 @@ def test_sample_assertion(test_client):
     """
     greeting = "Hello, World!"
     assert greeting == "Hello, World!", "The greeting does not coincide with 'Hello, World!'"
+
+
+def test_record_buffer_deduplicates_and_writes_in_batches(test_client, record_buffer):
+    assert record_buffer.add(HubfileViewRecord, VIEW_RECORD_KEY, user_id=None, file_id=1, view_cookie="a")
+    assert record_buffer.add(HubfileViewRecord, VIEW_RECORD_KEY, user_id=1, file_id=1, view_cookie="a")
+    assert not record_buffer.add(HubfileViewRecord, VIEW_RECORD_KEY, user_id=None, file_id=1, view_cookie="a")
+
+    with test_client.application.app_context():
+        assert HubfileViewRecord.query.count() == 0  # nada se escribe hasta el flush
+
+    assert record_buffer.flush() == 2
+    assert record_buffer.flush() == 0
+
+    with test_client.application.app_context():
+        assert sorted((record.user_id or 0, record.view_cookie) for record in HubfileViewRecord.query) == [
+            (0, "a"), (1, "a")
+        ]
+
+
+def test_record_buffer_skips_stored_records(test_client, record_buffer):
+    record_buffer.add(HubfileViewRecord, VIEW_RECORD_KEY, user_id=None, file_id=1, view_cookie="b")
+    record_buffer.flush()
+
+    # Otro proceso no comparte la deduplicación en memoria, pero no duplica lo ya guardado
+    other_buffer = RecordBufferManager(test_client.application)
+    other_buffer.add(HubfileViewRecord, VIEW_RECORD_KEY, user_id=None, file_id=1, view_cookie="b")
+    other_buffer.add(HubfileViewRecord, VIEW_RECORD_KEY, user_id=None, file_id=1, view_cookie="c")
+    assert other_buffer.flush() == 1
+
+    with test_client.application.app_context():
+        assert sorted(record.view_cookie for record in HubfileViewRecord.query) == ["b", "c"]
+
+
+def test_record_buffer_maintains_stats_counters(test_client, record_buffer):
+    with test_client.application.app_context():
+        before = StatsCounterService().global_counters()
+
+    for cookie in ["d", "e", "e"]:
+        record_buffer.add(HubfileViewRecord, VIEW_RECORD_KEY, user_id=None, file_id=1, view_cookie=cookie)
+    record_buffer.flush()
+
+    with test_client.application.app_context():
+        service = StatsCounterService()
+        assert service.global_counters()["file_views"] == before["file_views"] + 2
+        assert service.repository.get_value("file_views", "file", 1) >= 2
+        assert service.global_counters()["file_downloads"] == before["file_downloads"]
+
+
+def test_insert_ignoring_duplicates_per_dialect():
+    rows = [{"file_id": 1, "view_cookie": "cookie"}]
+    expected = {
+        "mysql": (mysql.dialect(), "INSERT IGNORE"),
+        "mariadb": (mysql.dialect(), "INSERT IGNORE"),
+        "postgresql": (postgresql.dialect(), "ON CONFLICT DO NOTHING"),
+        "sqlite": (sqlite.dialect(), "ON CONFLICT DO NOTHING"),
+    }
+    for name, (dialect, clause) in expected.items():
+        assert clause in str(insert_ignoring_duplicates(HubfileViewRecord, rows, name).compile(dialect=dialect))
+
+    with pytest.raises(ValueError):
+        insert_ignoring_duplicates(HubfileViewRecord, rows, "oracle")
+
+
+def test_feature_models_counter(test_client):
+    with test_client.application.app_context():
+        service = StatsCounterService()
+        before = service.get_global("feature_models")
+
+        dataset = DataSet.query.first()
+        feature_model = FeatureModel(data_set=dataset)
+        db.session.add(feature_model)
+        db.session.commit()
+        assert service.get_global("feature_models") == before + 1
+
+        db.session.delete(feature_model)
+        db.session.commit()
+        assert service.get_global("feature_models") == before
+
+        # Ya volcado antes del commit: el commit no vuelve a volcar pero cuenta igual
+        feature_model = FeatureModel(data_set=dataset)
+        db.session.add(feature_model)
+        db.session.flush()
+        db.session.commit()
+        assert DataSetService().count_feature_models() == before + 1
+
+        db.session.delete(feature_model)
+        db.session.commit()
+        assert DataSetService().count_feature_models() == before
+
+
+def test_hubfile_path_resolved_once(test_client, monkeypatch):
+    monkeypatch.setenv("WORKING_DIR", "/app")
+    with test_client.application.app_context():
+        statements = []
+
+        def count_statement(*args):
+            statements.append(args[2])
+
+        hubfile = db.session.get(Hubfile, 1)
+        expected = os.path.join("/app", "uploads", "user_1", "dataset_1", "file1.uvl")
+
+        event.listen(db.engine, "before_cursor_execute", count_statement)
+        try:
+            assert HubfileService().get_path_by_hubfile(hubfile) == expected
+            assert len(statements) == 1
+
+            # Ya en caché: no consulta la base de datos
+            assert HubfileService().get_path_by_hubfile(hubfile) == expected
+            assert len(statements) == 1
+
+            # WORKING_DIR se lee en cada llamada, solo la ubicación está en caché
+            monkeypatch.setenv("WORKING_DIR", "/other")
+            assert HubfileService().get_path_by_hubfile(hubfile).startswith(os.path.join("/other", "uploads"))
+            assert len(statements) == 1
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_statement)
+
+        # Con las relaciones ya cargadas tampoco hace falta consultar
+        get_local_cache(HUBFILE_PATHS_CACHE).clear()
+        assert hubfile.feature_model.data_set.user_id == 1
+        assert HubfileService().get_storage_location(hubfile) == (1, 1)
@@ -1,5 +1,6 @@
 from app.modules.auth.services import AuthenticationService
 from app.modules.dataset.models import DataSet
+from app.modules.dataset.repositories import DataSetRepository
 from flask import render_template, redirect, url_for, request
 from flask_login import login_required, current_user
 
@@ -35,6 +36,7 @@ def my_profile():
     per_page = 5
 
     user_datasets_pagination = db.session.query(DataSet) \
+        .options(*DataSetRepository.serialization_options()) \
         .filter(DataSet.user_id == current_user.id) \
         .order_by(DataSet.created_at.desc()) \
         .paginate(page=page, per_page=per_page, error_out=False)
@@ -1,3 +1,4 @@
+from app.modules.dataset.repositories import DataSetRepository
 from app.modules.profile.repositories import UserProfileRepository
 from core.services.BaseService import BaseService
 from app.modules.auth.repositories import UserRepository
@@ -6,10 +7,13 @@ from app.modules.auth.repositories import UserRepository
 class UserProfileService(BaseService):
     def __init__(self):
         super().__init__(UserProfileRepository())
+        self.dataset_repository = DataSetRepository()
 
     def update_profile(self, user_profile_id, form):
         if form.validate():
             updated_instance = self.update(user_profile_id, **form.data)
+            # The uploader name is part of the cached dataset fragments
+            self.dataset_repository.bump_fragment_versions(updated_instance.user_id)
             return updated_instance, None
 
         return None, form.errors
@@ -1,9 +1,13 @@
+import time
+
 import pytest
 from app.modules.conftest import login, logout
 from app import db
 from app.modules.dataset.models import DataSet, DSMetrics, DSMetaData, PublicationType
+from app.modules.dataset.services import StatsSnapshotService
 from app.modules.featuremodel.models import FeatureModel
 from app.modules.hubfile.models import Hubfile
+from core.managers.task_manager import submit_task
 
 
 @pytest.fixture(scope="module")
@@ -30,7 +34,9 @@ def test_client(test_client):
 
         dataset_test = DataSet(
             user_id=1,
-            ds_meta_data_id=1
+            ds_meta_data_id=1,
+            files_count=3,
+            total_size_bytes=1024 + 2048 + 4096
         )
         db.session.add(dataset_test)
 
@@ -193,3 +199,64 @@ def test_download_all_dataset_multiple_empty(test_client_multiple):
             db.session.delete(meta_data)
             db.session.delete(metrics)
         db.session.commit()
+
+
+def test_index_statistics_snapshot(test_client):
+    """
+    El índice se renderiza desde la instantánea de estadísticas, que se sirve
+    desde memoria mientras no caduque.
+    """
+    response = test_client.get("/")
+    assert response.status_code == 200
+    assert b"Test Dataset Title" in response.data
+    assert b"http://localhost/doi/10.1234/dataset.doi" in response.data
+
+    with test_client.application.app_context():
+        snapshot = StatsSnapshotService().get_snapshot()
+        assert snapshot["counters"]["synchronized_datasets"] == 1
+        assert snapshot["datasets"][0]["title"] == "Test Dataset Title"
+        assert snapshot["datasets"][0]["tags"] == ["test", "dataset", "example"]
+        assert snapshot["datasets"][0]["total_size"] == "7.0 KB"
+
+        test_client.application.config["STATS_SNAPSHOT_TTL"] = 3600
+        try:
+            db.session.get(DSMetaData, 1).title = "Renamed Dataset Title"
+            db.session.commit()
+            assert StatsSnapshotService().get_snapshot()["datasets"][0]["title"] == "Test Dataset Title"
+        finally:
+            test_client.application.config["STATS_SNAPSHOT_TTL"] = 0
+            db.session.get(DSMetaData, 1).title = "Test Dataset Title"
+            db.session.commit()
+
+        assert StatsSnapshotService().get_snapshot()["datasets"][0]["title"] == "Test Dataset Title"
+
+
+def test_index_statistics_snapshot_refreshed_in_background(test_client):
+    """
+    Con tareas en segundo plano, una instantánea caducada se sigue sirviendo
+    mientras otra tarea calcula la siguiente.
+    """
+    app = test_client.application
+    with app.app_context():
+        StatsSnapshotService().refresh()
+        app.config["TASKS_EAGER"] = False
+        try:
+            db.session.get(DSMetaData, 1).title = "Refreshed Dataset Title"
+            db.session.commit()
+
+            # La caducada o, si la tarea ya ha terminado, la nueva
+            title = StatsSnapshotService().get_snapshot()["datasets"][0]["title"]
+            assert title in ("Test Dataset Title", "Refreshed Dataset Title")
+
+            deadline = time.monotonic() + 10
+            while StatsSnapshotService._snapshot[1]["datasets"][0]["title"] != "Refreshed Dataset Title":
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+
+            # El gestor de tareas sigue atendiendo peticiones
+            assert submit_task(lambda: 1, key="stats_snapshot").result(timeout=10) == 1
+        finally:
+            app.config["TASKS_EAGER"] = True
+            db.session.get(DSMetaData, 1).title = "Test Dataset Title"
+            db.session.commit()
+            StatsSnapshotService().refresh()
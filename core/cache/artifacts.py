@@ -0,0 +1,180 @@
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Fraction of max_bytes an eviction brings the total size down to, so the directory is walked once every many stores
+PRUNE_TARGET = 0.8
+
+
+class ArtifactCache:
+    """
+    Content-addressed store of generated files, shared by every process that points to the same directory.
+    The total size of the stored files is bounded by max_bytes, evicting the least recently used ones first.
+    The running total is kept in a size file updated under a file lock, so storing an artifact does not walk the
+    directory; that only happens when the total goes over max_bytes. Readers that must not lose an artifact to a
+    concurrent eviction (e.g. a ZIP being streamed) use open, which hands out an already open file.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size_path = os.path.join(directory, ".size")
+        self._lock_path = os.path.join(directory, ".lock")
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key: str):
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def open(self, key: str):
+        # An open file keeps its content readable even if the artifact is evicted right after
+        path = self.path(key)
+        try:
+            source = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return source
+
+    def get_or_create(self, key: str, produce) -> str:
+        """
+        Returns the path of the artifact stored under key, calling produce(path) to write it on a miss.
+        The artifact is written to a temporary file and renamed, so readers never see a partial file.
+        Producers running elsewhere (e.g. in another process) can use temp_path, store and discard directly.
+        """
+        path = self.get(key)
+        if path is not None:
+            return path
+
+        temp_path = self.temp_path(key)
+        try:
+            produce(temp_path)
+            return self.store(key, temp_path)
+        finally:
+            self.discard(temp_path)
+
+    def open_or_create(self, key: str, produce):
+        # Like get_or_create, but returns the artifact already open
+        source = self.open(key)
+        if source is not None:
+            return source
+
+        temp_path = self.temp_path(key)
+        try:
+            produce(temp_path)
+            return self.store_open(key, temp_path)
+        finally:
+            self.discard(temp_path)
+
+    def temp_path(self, key: str) -> str:
+        # Temporary files are created next to the artifact, so storing them is an atomic rename
+        directory = os.path.dirname(self.path(key))
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=".")
+        os.close(file_descriptor)
+        return temp_path
+
+    def store(self, key: str, temp_path: str) -> str:
+        path = self.path(key)
+        size = os.path.getsize(temp_path)
+        with self._locked():
+            total_size = self._read_size()
+            try:
+                total_size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(temp_path, path)
+
+            total_size += size
+            if total_size > self.max_bytes:
+                total_size = self._prune(keep=path)
+            self._write_size(total_size)
+        return path
+
+    def store_open(self, key: str, temp_path: str):
+        # Opened before it is stored, so an eviction right after storing cannot take it from the caller
+        source = open(temp_path, "rb")
+        try:
+            self.store(key, temp_path)
+        except BaseException:
+            source.close()
+            raise
+        return source
+
+    @staticmethod
+    def discard(temp_path: str):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    @contextmanager
+    def _locked(self):
+        # The thread lock orders the threads of this process, flock the processes sharing the directory
+        with self._lock, open(self._lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _read_size(self) -> int:
+        try:
+            with open(self._size_path) as size_file:
+                return int(size_file.read())
+        except (FileNotFoundError, ValueError):
+            # First store in this directory, or a size file from an interrupted write
+            return sum(size for _, size, _ in self._artifacts())
+
+    def _write_size(self, total_size: int):
+        with open(self._size_path, "w") as size_file:
+            size_file.write(str(total_size))
+
+    def _artifacts(self) -> list:
+        artifacts = []
+        for subdir, _, files in os.walk(self.directory):
+            for file in files:
+                if file.startswith("."):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(subdir, file))
+                except FileNotFoundError:
+                    continue
+                artifacts.append((stat.st_mtime, stat.st_size, os.path.join(subdir, file)))
+        return artifacts
+
+    def _prune(self, keep: str = None) -> int:
+        # Called with the lock held, returns the total size left. The walk also corrects any drift of the size file
+        artifacts = self._artifacts()
+        total_size = sum(size for _, size, _ in artifacts)
+        target_size = self.max_bytes * PRUNE_TARGET
+        for _, size, path in sorted(artifacts):
+            if total_size <= target_size:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+        return total_size
+
+    def clear(self):
+        with self._locked():
+            for _, _, path in self._artifacts():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._write_size(0)
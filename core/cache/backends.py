@@ -0,0 +1,185 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Share of max_entries written between two prunes of a FileSystemCache
+PRUNE_INTERVAL_RATIO = 0.1
+
+
+class BaseCache:
+    """
+    Key/value cache with per-entry expiration. A value of None is never stored: get returns None on a miss.
+    A ttl of 0 means the entry never expires.
+    """
+
+    def __init__(self, default_ttl: int = 300, max_entries: int = 1024):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+
+    def _expires_at(self, ttl=None) -> float:
+        ttl = self.default_ttl if ttl is None else ttl
+        return time.time() + ttl if ttl else 0
+
+    @staticmethod
+    def _expired(expires_at: float) -> bool:
+        return bool(expires_at) and expires_at <= time.time()
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value, ttl: int = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class NullCache(BaseCache):
+    """Disables caching."""
+
+    def get(self, key: str):
+        return None
+
+    def set(self, key: str, value, ttl: int = None):
+        pass
+
+    def delete(self, key: str):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryCache(BaseCache):
+    """LRU cache local to the current process."""
+
+    def __init__(self, default_ttl: int = 300, max_entries: int = 1024):
+        super().__init__(default_ttl, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if self._expired(expires_at):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: int = None):
+        with self._lock:
+            self._entries[key] = (self._expires_at(ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileSystemCache(BaseCache):
+    """
+    Cache stored as one file per entry in a directory, shared by every process (e.g. gunicorn workers)
+    that points to it. Reads touch the file so the least recently used entries are evicted first.
+    Listing the directory costs as much as its entries, so each process prunes it once every
+    PRUNE_INTERVAL_RATIO * max_entries writes; in between it may hold that many extra entries per process.
+    """
+
+    def __init__(self, directory: str, default_ttl: int = 300, max_entries: int = 1024):
+        super().__init__(default_ttl, max_entries)
+        self.directory = directory
+        self._prune_interval = max(1, int(max_entries * PRUNE_INTERVAL_RATIO))
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def _entry_paths(self) -> list:
+        return [
+            entry.path for entry in os.scandir(self.directory)
+            if entry.is_file() and not entry.name.startswith(".")
+        ]
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                expires_at, value = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        if self._expired(expires_at):
+            self.delete(key)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key: str, value, ttl: int = None):
+        # Write to a temporary file and rename it so readers never see a partial entry
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".")
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                pickle.dump((self._expires_at(ttl), value), file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes >= self._prune_interval
+            if due:
+                self._writes = 0
+        if due:
+            self._prune()
+
+    def _prune(self):
+        paths = self._entry_paths()
+        if len(paths) <= self.max_entries:
+            return
+
+        def last_used(path):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0
+
+        for path in sorted(paths, key=last_used)[:len(paths) - self.max_entries]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def delete(self, key: str):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for path in self._entry_paths():
+            self._remove(path)
@@ -0,0 +1,40 @@
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from core.cache.objects import ObjectCache
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Adds {% cache "name", key, ... %}...{% endcache %} to templates. The rendered body is kept in the
+    environment's fragment_cache, an in-process LRU bounded by the size of the stored HTML, under a key made of
+    every given part. The parts must include a version stamp of whatever the body shows, since entries are never
+    invalidated; when any part is None the body is rendered without caching.
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=ObjectCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            parts.append(parser.parse_expression())
+
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_render", [nodes.List(parts)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, parts: list, caller):
+        if any(part is None for part in parts):
+            return caller()
+
+        key = ":".join(str(part) for part in parts)
+        html = self.environment.fragment_cache.get(key)
+        if html is None:
+            html = caller()
+            self.environment.fragment_cache.set(key, html, size=len(html))
+        return html
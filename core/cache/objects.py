@@ -0,0 +1,47 @@
+import threading
+from collections import OrderedDict
+
+
+class ObjectCache:
+    """
+    LRU cache of live Python objects local to the current process, for values that are too expensive to pickle
+    (e.g. parsed models). It is bounded by max_bytes, using the size estimated by the caller for each value.
+    """
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, size: int):
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[0]
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (size, value)
+            self.size += size
+            while self.size > self.max_bytes:
+                self.size -= self._entries.popitem(last=False)[1][0]
+
+    def get_or_create(self, key: str, create, size: int):
+        value = self.get(key)
+        if value is None:
+            value = create()
+            self.set(key, value, size)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -0,0 +1,48 @@
+import uuid
+
+
+class VersionedCache:
+    """
+    Namespace over a cache backend whose entries are all invalidated at once by replacing a generation stamp
+    stored in the same backend, so every process sharing the backend sees the invalidation. Entries written
+    for an older generation are never read again and are evicted by the backend's LRU/TTL policy.
+    """
+
+    def __init__(self, backend, namespace: str):
+        self.backend = backend
+        self.namespace = namespace
+
+    @property
+    def _generation_key(self) -> str:
+        return f"{self.namespace}:generation"
+
+    def _generation(self) -> str:
+        generation = self.backend.get(self._generation_key)
+        if generation is None:
+            generation = self.invalidate()
+        return generation
+
+    def get(self, key: str):
+        return self.backend.get(f"{self.namespace}:{self._generation()}:{key}")
+
+    def set(self, key: str, value, ttl: int = None):
+        self.backend.set(f"{self.namespace}:{self._generation()}:{key}", value, ttl)
+
+    def delete(self, key: str):
+        self.backend.delete(f"{self.namespace}:{self._generation()}:{key}")
+
+    def get_or_compute(self, key: str, compute, ttl: int = None):
+        # The generation is read once, so a value computed while an invalidation happens
+        # is stored under the old generation and never served
+        versioned_key = f"{self.namespace}:{self._generation()}:{key}"
+        value = self.backend.get(versioned_key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.backend.set(versioned_key, value, ttl)
+        return value
+
+    def invalidate(self) -> str:
+        generation = uuid.uuid4().hex
+        self.backend.set(self._generation_key, generation, ttl=0)
+        return generation
@@ -0,0 +1,95 @@
+import os
+import threading
+
+from flask import current_app
+
+from core.cache.artifacts import ArtifactCache
+from core.cache.backends import BaseCache, FileSystemCache, MemoryCache, NullCache
+from core.cache.fragments import FragmentCacheExtension
+from core.cache.objects import ObjectCache
+from core.cache.versioned_cache import VersionedCache
+
+
+class CacheManager:
+    """
+    Builds one cache per namespace from the app config. CACHE_BACKEND selects the backend ('memory' for a cache
+    local to each process, 'filesystem' for a cache shared by every worker through CACHE_DIR, 'null' to disable
+    caching); <NAMESPACE>_CACHE_DEFAULT_TTL and <NAMESPACE>_CACHE_MAX_ENTRIES override the defaults per
+    namespace. Artifact caches always live on disk under CACHE_DIR, bounded by <NAMESPACE>_CACHE_MAX_BYTES.
+    Rendered template fragments ({% cache %}) are kept in each process, bounded by FRAGMENT_CACHE_MAX_BYTES.
+    Local caches are in memory whatever the backend, for values that never change and are cheap to recompute.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.caches = {}
+        self.artifact_caches = {}
+        self.local_caches = {}
+        self._lock = threading.Lock()
+
+    def register_cache_manager(self):
+        self.app.extensions['cache_manager'] = self
+        self.app.jinja_env.add_extension(FragmentCacheExtension)
+        self.app.jinja_env.fragment_cache = ObjectCache(
+            max_bytes=self.app.config.get('FRAGMENT_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        )
+
+    def _config(self, namespace: str, option: str):
+        return self.app.config.get(f'{namespace.upper()}_CACHE_{option}', self.app.config.get(f'CACHE_{option}'))
+
+    def _create_backend(self, namespace: str):
+        backend = self.app.config.get('CACHE_BACKEND', 'memory')
+        options = {
+            'default_ttl': self._config(namespace, 'DEFAULT_TTL'),
+            'max_entries': self._config(namespace, 'MAX_ENTRIES'),
+        }
+
+        if backend == 'null':
+            return NullCache(**options)
+        if backend == 'memory':
+            return MemoryCache(**options)
+        if backend == 'filesystem':
+            return FileSystemCache(os.path.join(self.app.config['CACHE_DIR'], namespace), **options)
+        raise ValueError(f"Unknown cache backend: {backend}")
+
+    def get_cache(self, namespace: str) -> VersionedCache:
+        with self._lock:
+            if namespace not in self.caches:
+                self.caches[namespace] = VersionedCache(self._create_backend(namespace), namespace)
+            return self.caches[namespace]
+
+    def get_artifact_cache(self, namespace: str) -> ArtifactCache:
+        with self._lock:
+            if namespace not in self.artifact_caches:
+                self.artifact_caches[namespace] = ArtifactCache(
+                    os.path.join(self.app.config['CACHE_DIR'], namespace),
+                    max_bytes=self._config(namespace, 'MAX_BYTES'),
+                )
+            return self.artifact_caches[namespace]
+
+    def get_local_cache(self, namespace: str) -> BaseCache:
+        with self._lock:
+            if namespace not in self.local_caches:
+                backend = NullCache if self.app.config.get('CACHE_BACKEND', 'memory') == 'null' else MemoryCache
+                self.local_caches[namespace] = backend(
+                    default_ttl=self._config(namespace, 'DEFAULT_TTL'),
+                    max_entries=self._config(namespace, 'MAX_ENTRIES'),
+                )
+            return self.local_caches[namespace]
+
+    def clear_local_caches(self):
+        with self._lock:
+            for cache in self.local_caches.values():
+                cache.clear()
+
+
+def get_cache(namespace: str) -> VersionedCache:
+    return current_app.extensions['cache_manager'].get_cache(namespace)
+
+
+def get_artifact_cache(namespace: str) -> ArtifactCache:
+    return current_app.extensions['cache_manager'].get_artifact_cache(namespace)
+
+
+def get_local_cache(namespace: str) -> BaseCache:
+    return current_app.extensions['cache_manager'].get_local_cache(namespace)
@@ -33,6 +33,28 @@ class Config:
     TIMEZONE = 'Europe/Madrid'
     TEMPLATES_AUTO_RELOAD = True
     UPLOAD_FOLDER = 'uploads'
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(os.getenv('WORKING_DIR', ''), 'cache'))
+    CACHE_DEFAULT_TTL = 300
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_MAX_BYTES = 512 * 1024 * 1024
+    EXPLORE_CACHE_DEFAULT_TTL = 60
+    EXPLORE_CACHE_MAX_ENTRIES = 512
+    DOI_CACHE_DEFAULT_TTL = 0
+    DOI_CACHE_MAX_ENTRIES = 10000
+    DOI_NEGATIVE_CACHE_TTL = 30
+    HUBFILE_PATHS_CACHE_DEFAULT_TTL = 0
+    HUBFILE_PATHS_CACHE_MAX_ENTRIES = 100000
+    FRAGMENT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    TASKS_MAX_WORKERS = 2
+    CONVERSION_MAX_WORKERS = int(os.getenv('CONVERSION_MAX_WORKERS', min(4, os.cpu_count() or 1)))
+    CONVERSION_TIMEOUT = int(os.getenv('CONVERSION_TIMEOUT', 60))
+    ANALYSIS_TIMEOUT = int(os.getenv('ANALYSIS_TIMEOUT', 300))
+    FEATURE_MODEL_CACHE_MAX_BYTES = 128 * 1024 * 1024
+    RECORD_BUFFER_FLUSH_INTERVAL = 5
+    RECORD_BUFFER_FLUSH_SIZE = 500
+    RECORD_BUFFER_SEEN_MAX_ENTRIES = 100000
+    STATS_SNAPSHOT_TTL = 30
 
 
 class DevelopmentConfig(Config):
@@ -49,7 +71,13 @@ class TestingConfig(Config):
         f"{os.getenv('MARIADB_TEST_DATABASE', 'default_db')}"
     )
     WTF_CSRF_ENABLED = False
+    TASKS_EAGER = True
+    CONVERSION_MAX_WORKERS = 0
+    RECORD_BUFFER_EAGER = True
+    STATS_SNAPSHOT_TTL = 0
 
 
 class ProductionConfig(Config):
     DEBUG = False
+    # Shared by every gunicorn worker so invalidations reach all of them
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'filesystem')
@@ -0,0 +1,143 @@
+import atexit
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+logger = logging.getLogger(__name__)
+
+# Functions called with (model, rows, inserted) in the transaction that writes rows of one of their models, where
+# rows share the same partition_by value and inserted is how many of them were new
+record_listeners = defaultdict(list)
+
+
+def listens_for_records(*models):
+    def decorator(func):
+        for model in models:
+            record_listeners[model].append(func)
+        return func
+    return decorator
+
+
+def insert_ignoring_duplicates(model, rows: list, dialect: str):
+    # Rows that hit a unique constraint are skipped, so rowcount is the number of new rows
+    if dialect in ('mysql', 'mariadb'):
+        # ON DUPLICATE KEY UPDATE reports duplicates as found rows under CLIENT_FOUND_ROWS, IGNORE does not
+        return insert(model).values(rows).prefix_with('IGNORE')
+    if dialect == 'postgresql':
+        return postgresql.insert(model).values(rows).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite.insert(model).values(rows).on_conflict_do_nothing()
+    raise ValueError(f"Unsupported database dialect for record buffering: {dialect}")
+
+
+class RecordBufferManager:
+    """
+    Write-behind buffer for tracking records (views and downloads). Records are deduplicated in memory by their
+    key columns and written in batches, one multi-row INSERT per partition_by value, once RECORD_BUFFER_FLUSH_SIZE
+    records are pending or every RECORD_BUFFER_FLUSH_INTERVAL seconds, so the request that produced them never
+    waits on the database. Records already stored by another process are skipped by the unique constraint on their
+    key columns. With RECORD_BUFFER_EAGER (used by the test suite) every record is written right away.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.pending = defaultdict(dict)
+        self.pending_count = 0
+        self.seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def register_record_buffer_manager(self):
+        self.app.extensions['record_buffer'] = self
+        atexit.register(self.flush)
+
+    def add(self, model, key_columns: tuple, partition_by: str = None, **values) -> bool:
+        key = tuple(values.get(column) for column in key_columns)
+
+        with self._lock:
+            if (model, key) in self.seen:
+                self.seen.move_to_end((model, key))
+                return False
+
+            self.seen[(model, key)] = None
+            if len(self.seen) > self.app.config.get('RECORD_BUFFER_SEEN_MAX_ENTRIES', 100000):
+                self.seen.popitem(last=False)
+
+            self.pending[(model, partition_by)][key] = values
+            self.pending_count += 1
+            batch_full = self.pending_count >= self.app.config.get('RECORD_BUFFER_FLUSH_SIZE', 500)
+
+        if self.app.config.get('RECORD_BUFFER_EAGER'):
+            self.flush()
+            return True
+
+        self._start_worker()
+        if batch_full:
+            self._wakeup.set()
+        return True
+
+    def _start_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='uvlhub-record-buffer', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        interval = self.app.config.get('RECORD_BUFFER_FLUSH_INTERVAL', 5)
+        while True:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing the record buffer failed")
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                pending, self.pending = self.pending, defaultdict(dict)
+                self.pending_count = 0
+
+            if not pending:
+                return 0
+
+            written = 0
+            with self.app.app_context():
+                db = self.app.extensions['sqlalchemy']
+                for (model, partition_by), records in pending.items():
+                    try:
+                        written += self._write(db.session, model, partition_by, list(records.values()))
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+                        logger.exception(f"Dropping {len(records)} buffered {model.__name__} records")
+                        # Let them be recorded again by a later request
+                        with self._lock:
+                            for key in records:
+                                self.seen.pop((model, key), None)
+            return written
+
+    @staticmethod
+    def _write(session, model, partition_by: str, records: list) -> int:
+        partitions = defaultdict(list)
+        for values in records:
+            partitions[values.get(partition_by) if partition_by else None].append(values)
+
+        written = 0
+        dialect = session.get_bind().dialect.name
+        for rows in partitions.values():
+            inserted = session.execute(insert_ignoring_duplicates(model, rows, dialect)).rowcount
+            for listener in record_listeners[model]:
+                listener(model, rows, inserted)
+            written += inserted
+        return written
+
+
+def buffer_record(model, key_columns: tuple, partition_by: str = None, **values) -> bool:
+    return current_app.extensions['record_buffer'].add(model, key_columns, partition_by=partition_by, **values)
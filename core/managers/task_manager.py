@@ -0,0 +1,68 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class TaskManager:
+    """
+    Runs functions in a background thread pool, each one inside its own app context. Tasks submitted with a key
+    are not queued again while a task with the same key is pending. With TASKS_EAGER (used by the test suite)
+    tasks run synchronously in the calling thread.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.executor = None
+        self.pending = {}
+        self._lock = threading.Lock()
+
+    def register_task_manager(self):
+        self.app.extensions['task_manager'] = self
+
+    def _run(self, func, args, kwargs):
+        with self.app.app_context():
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                logger.exception(f"Background task {func.__name__} failed")
+                raise
+
+    def submit(self, func, *args, key: str = None, **kwargs) -> Future:
+        if self.app.config.get('TASKS_EAGER'):
+            future = Future()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as exc:
+                logger.exception(f"Task {func.__name__} failed")
+                future.set_exception(exc)
+            return future
+
+        with self._lock:
+            if key is not None and key in self.pending:
+                return self.pending[key]
+
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.app.config.get('TASKS_MAX_WORKERS', 2), thread_name_prefix='uvlhub-task'
+                )
+            future = self.executor.submit(self._run, func, args, kwargs)
+            if key is not None:
+                self.pending[key] = future
+
+        # Outside the lock: the callback runs right away in this thread when the task has already finished
+        if key is not None:
+            future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def _forget(self, key: str, future: Future):
+        with self._lock:
+            if self.pending.get(key) is future:
+                del self.pending[key]
+
+
+def submit_task(func, *args, key: str = None, **kwargs) -> Future:
+    return current_app.extensions['task_manager'].submit(func, *args, key=key, **kwargs)
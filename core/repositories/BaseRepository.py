@@ -30,12 +30,15 @@ class BaseRepository(Generic[T]):
     def get_or_404(self, id: int) -> Union[T, NoReturn]:
         return self.model.query.get_or_404(id)
 
-    def update(self, id: int, **kwargs) -> Optional[T]:
+    def update(self, id: int, commit: bool = True, **kwargs) -> Optional[T]:
         instance: Optional[T] = self.get_by_id(id)
         if instance:
             for key, value in kwargs.items():
                 setattr(instance, key, value)
-            self.session.commit()
+            if commit:
+                self.session.commit()
+            else:
+                self.session.flush()
             return instance
         return None
 
@@ -12,19 +12,20 @@ def convert_value(value):
 
 
 class GenericResource(Resource):
-    def __init__(self, model, serializer):
+    def __init__(self, model, serializer, query_options=None):
         self.model = model
         self.model_name = model.__name__
         self.serializer = serializer
+        self.query_options = query_options or ()
 
     def get(self, id=None):
         if id:
-            item = self.model.query.get(id)
+            item = self.model.query.options(*self.query_options).get(id)
             if not item:
                 return {'message': f'{self.model_name} not found'}, 404
             return self.serializer.serialize(item), 200
         else:
-            items = self.model.query.all()
+            items = self.model.query.options(*self.query_options).all()
             return {'items': [self.serializer.serialize(i) for i in items]}, 200
 
     def post(self):
@@ -62,8 +63,9 @@ class GenericResource(Resource):
         return {'message': f'{self.model_name} deleted successfully'}, 204
 
 
-def create_resource(model, serialization_fields=None):
+def create_resource(model, serialization_fields=None, query_options=None):
+    # query_options is a callable so loader options are built once mappers are configured
     class Resource(GenericResource):
         def __init__(self):
-            super().__init__(model, serialization_fields)
+            super().__init__(model, serialization_fields, query_options() if query_options else None)
     return Resource
@@ -0,0 +1,116 @@
+"""create_search_term_index
+
+Revision ID: 4b1d7c2e9a3f
+Revises: e7fe84368699
+Create Date: 2026-10-18 21:20:00.000000
+
+"""
+import re
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+import unidecode
+
+
+# revision identifiers, used by Alembic.
+revision = '4b1d7c2e9a3f'
+down_revision = 'e7fe84368699'
+branch_labels = None
+depends_on = None
+
+
+# Snapshot of app.modules.explore.services at the time of this revision
+SEARCH_FIELD_WEIGHTS = {
+    'title': 10,
+    'tags': 6,
+    'authors': 5,
+    'orcids': 5,
+    'dois': 4,
+    'uvl_filenames': 4,
+    'feature_model_titles': 4,
+    'feature_model_tags': 3,
+    'affiliations': 2,
+    'description': 2,
+    'feature_model_descriptions': 1,
+}
+
+
+def tokenize(text):
+    normalized_text = unidecode.unidecode(text or '').lower()
+    return [token[:64] for token in re.findall(r'[a-z0-9]+', normalized_text)]
+
+
+def backfill_search_terms():
+    connection = op.get_bind()
+
+    documents = defaultdict(lambda: defaultdict(list))
+    for row in connection.execute(sa.text(
+        'SELECT data_set.id, ds_meta_data.title, ds_meta_data.description, ds_meta_data.tags, '
+        'ds_meta_data.dataset_doi, ds_meta_data.publication_doi '
+        'FROM data_set JOIN ds_meta_data ON ds_meta_data.id = data_set.ds_meta_data_id'
+    )):
+        document = documents[row[0]]
+        document['title'].append(row[1])
+        document['description'].append(row[2])
+        document['tags'].append(row[3])
+        document['dois'] += [row[4], row[5]]
+
+    for row in connection.execute(sa.text(
+        'SELECT data_set.id, author.name, author.affiliation, author.orcid '
+        'FROM data_set JOIN author ON author.ds_meta_data_id = data_set.ds_meta_data_id'
+    )):
+        document = documents[row[0]]
+        document['authors'].append(row[1])
+        document['affiliations'].append(row[2])
+        document['orcids'].append(row[3])
+
+    for row in connection.execute(sa.text(
+        'SELECT feature_model.data_set_id, fm_meta_data.uvl_filename, fm_meta_data.title, '
+        'fm_meta_data.description, fm_meta_data.tags, fm_meta_data.publication_doi '
+        'FROM feature_model JOIN fm_meta_data ON fm_meta_data.id = feature_model.fm_meta_data_id'
+    )):
+        document = documents[row[0]]
+        document['uvl_filenames'].append(row[1])
+        document['feature_model_titles'].append(row[2])
+        document['feature_model_descriptions'].append(row[3])
+        document['feature_model_tags'].append(row[4])
+        document['dois'].append(row[5])
+
+    search_term = sa.table(
+        'search_term',
+        sa.column('term', sa.String),
+        sa.column('dataset_id', sa.Integer),
+        sa.column('weight', sa.Integer),
+    )
+
+    rows = []
+    for dataset_id, document in documents.items():
+        weights = defaultdict(int)
+        for field, texts in document.items():
+            for term in tokenize(' '.join(text for text in texts if text)):
+                weights[term] += SEARCH_FIELD_WEIGHTS[field]
+        rows += [{'term': term, 'dataset_id': dataset_id, 'weight': weight} for term, weight in weights.items()]
+
+    if rows:
+        op.bulk_insert(search_term, rows)
+
+
+def upgrade():
+    op.create_table('search_term',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('term', sa.String(length=64), nullable=False),
+    sa.Column('dataset_id', sa.Integer(), nullable=False),
+    sa.Column('weight', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['dataset_id'], ['data_set.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('term', 'dataset_id', name='uq_search_term_term_dataset')
+    )
+    op.create_index('ix_search_term_dataset_id', 'search_term', ['dataset_id'], unique=False)
+
+    backfill_search_terms()
+
+
+def downgrade():
+    op.drop_index('ix_search_term_dataset_id', table_name='search_term')
+    op.drop_table('search_term')
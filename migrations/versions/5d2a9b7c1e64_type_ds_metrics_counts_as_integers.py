@@ -0,0 +1,75 @@
+"""type_ds_metrics_counts_as_integers
+
+Revision ID: 5d2a9b7c1e64
+Revises: 8c3e5f1a2d47
+Create Date: 2026-10-18 23:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2a9b7c1e64'
+down_revision = '8c3e5f1a2d47'
+branch_labels = None
+depends_on = None
+
+
+def normalize_count(value):
+    value = (value or '').strip()
+    return int(value) if value.isdigit() else None
+
+
+def normalize_ds_metrics():
+    # Empty or non-numeric counts become NULL so that the column type change
+    # does not fail (or silently turn them into 0) under strict SQL modes
+    connection = op.get_bind()
+    ds_metrics = sa.table(
+        'ds_metrics',
+        sa.column('id', sa.Integer),
+        sa.column('number_of_models', sa.String),
+        sa.column('number_of_features', sa.String),
+    )
+
+    for row in connection.execute(sa.select(ds_metrics)).fetchall():
+        number_of_models = normalize_count(row.number_of_models)
+        number_of_features = normalize_count(row.number_of_features)
+        connection.execute(
+            ds_metrics.update()
+            .where(ds_metrics.c.id == row.id)
+            .values(
+                number_of_models=None if number_of_models is None else str(number_of_models),
+                number_of_features=None if number_of_features is None else str(number_of_features),
+            )
+        )
+
+
+def upgrade():
+    normalize_ds_metrics()
+
+    with op.batch_alter_table('ds_metrics', schema=None) as batch_op:
+        batch_op.alter_column('number_of_models',
+               existing_type=sa.String(length=120),
+               type_=sa.Integer(),
+               existing_nullable=True)
+        batch_op.alter_column('number_of_features',
+               existing_type=sa.String(length=120),
+               type_=sa.Integer(),
+               existing_nullable=True)
+        batch_op.create_index(batch_op.f('ix_ds_metrics_number_of_models'), ['number_of_models'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ds_metrics_number_of_features'), ['number_of_features'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ds_metrics', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ds_metrics_number_of_features'))
+        batch_op.drop_index(batch_op.f('ix_ds_metrics_number_of_models'))
+        batch_op.alter_column('number_of_features',
+               existing_type=sa.Integer(),
+               type_=sa.String(length=120),
+               existing_nullable=True)
+        batch_op.alter_column('number_of_models',
+               existing_type=sa.Integer(),
+               type_=sa.String(length=120),
+               existing_nullable=True)
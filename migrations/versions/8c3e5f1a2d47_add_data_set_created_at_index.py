@@ -0,0 +1,23 @@
+"""add_data_set_created_at_index
+
+Revision ID: 8c3e5f1a2d47
+Revises: 4b1d7c2e9a3f
+Create Date: 2026-10-18 22:05:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8c3e5f1a2d47'
+down_revision = '4b1d7c2e9a3f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_data_set_created_at_id', 'data_set', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_data_set_created_at_id', table_name='data_set')
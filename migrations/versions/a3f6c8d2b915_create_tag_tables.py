@@ -0,0 +1,71 @@
+"""create_tag_tables
+
+Revision ID: a3f6c8d2b915
+Revises: 5d2a9b7c1e64
+Create Date: 2026-10-19 00:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f6c8d2b915'
+down_revision = '5d2a9b7c1e64'
+branch_labels = None
+depends_on = None
+
+
+# Snapshot of app.modules.dataset.models.Tag.parse at the time of this revision
+def parse_tags(tags):
+    names = (' '.join(tag.split()).lower()[:120] for tag in (tags or '').split(','))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def backfill_tags():
+    connection = op.get_bind()
+
+    dataset_tags = {
+        row[0]: parse_tags(row[1]) for row in connection.execute(sa.text(
+            'SELECT data_set.id, ds_meta_data.tags '
+            'FROM data_set JOIN ds_meta_data ON ds_meta_data.id = data_set.ds_meta_data_id'
+        ))
+    }
+    names = list(dict.fromkeys(name for tags in dataset_tags.values() for name in tags))
+    if not names:
+        return
+
+    tag = sa.table('tag', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    op.bulk_insert(tag, [{'name': name} for name in names])
+    tag_ids = {name: tag_id for tag_id, name in connection.execute(sa.select(tag.c.id, tag.c.name))}
+
+    data_set_tag = sa.table('data_set_tag', sa.column('data_set_id', sa.Integer), sa.column('tag_id', sa.Integer))
+    op.bulk_insert(data_set_tag, [
+        {'data_set_id': dataset_id, 'tag_id': tag_ids[name]}
+        for dataset_id, tags in dataset_tags.items() for name in tags
+    ])
+
+
+def upgrade():
+    op.create_table('tag',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('data_set_tag',
+    sa.Column('data_set_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['data_set_id'], ['data_set.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('data_set_id', 'tag_id')
+    )
+    op.create_index('ix_data_set_tag_tag_id', 'data_set_tag', ['tag_id'], unique=False)
+
+    backfill_tags()
+
+
+def downgrade():
+    op.drop_index('ix_data_set_tag_tag_id', table_name='data_set_tag')
+    op.drop_table('data_set_tag')
+    op.drop_table('tag')
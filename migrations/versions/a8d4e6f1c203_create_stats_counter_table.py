@@ -0,0 +1,62 @@
+"""create_stats_counter_table
+
+Revision ID: a8d4e6f1c203
+Revises: f3a9c5e2d417
+Create Date: 2026-10-19 08:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4e6f1c203'
+down_revision = 'f3a9c5e2d417'
+branch_labels = None
+depends_on = None
+
+
+# (counter name, record table, column with the id of the viewed object, scope of the per-object rows)
+RECORD_COUNTERS = (
+    ('dataset_views', 'ds_view_record', 'dataset_id', 'dataset'),
+    ('dataset_downloads', 'ds_download_record', 'dataset_id', 'dataset'),
+    ('file_views', 'file_view_record', 'file_id', 'file'),
+    ('file_downloads', 'file_download_record', 'file_id', 'file'),
+)
+
+
+def backfill_stats_counters():
+    # Counted from the existing rows, unlike the max(id) statistics they replace
+    for name, table, column, scope in RECORD_COUNTERS:
+        op.execute(
+            f"INSERT INTO stats_counter (name, scope, object_id, value) "
+            f"SELECT '{name}', 'global', 0, COUNT(*) FROM {table}"
+        )
+        op.execute(
+            f"INSERT INTO stats_counter (name, scope, object_id, value) "
+            f"SELECT '{name}', '{scope}', {column}, COUNT(*) FROM {table} "
+            f"WHERE {column} IS NOT NULL GROUP BY {column}"
+        )
+
+    op.execute(
+        "INSERT INTO stats_counter (name, scope, object_id, value) "
+        "SELECT 'feature_models', 'global', 0, COUNT(*) FROM feature_model"
+    )
+
+
+def upgrade():
+    op.create_table('stats_counter',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('scope', sa.String(length=16), nullable=False),
+    sa.Column('object_id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name', 'scope', 'object_id', name='uq_stats_counter_name_scope_object')
+    )
+
+    backfill_stats_counters()
+
+
+def downgrade():
+    op.drop_table('stats_counter')
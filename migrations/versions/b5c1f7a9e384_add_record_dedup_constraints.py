@@ -0,0 +1,71 @@
+"""add_record_dedup_constraints
+
+Revision ID: b5c1f7a9e384
+Revises: a8d4e6f1c203
+Create Date: 2026-10-19 09:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5c1f7a9e384'
+down_revision = 'a8d4e6f1c203'
+branch_labels = None
+depends_on = None
+
+
+# (record table, column with the id of the viewed object, cookie column, unique constraint, counter name, scope)
+RECORD_TABLES = (
+    ('ds_view_record', 'dataset_id', 'view_cookie', 'uq_ds_view_record_user_dataset_cookie',
+     'dataset_views', 'dataset'),
+    ('ds_download_record', 'dataset_id', 'download_cookie', 'uq_ds_download_record_user_dataset_cookie',
+     'dataset_downloads', 'dataset'),
+    ('file_view_record', 'file_id', 'view_cookie', 'uq_file_view_record_user_file_cookie',
+     'file_views', 'file'),
+    ('file_download_record', 'file_id', 'download_cookie', 'uq_file_download_record_user_file_cookie',
+     'file_downloads', 'file'),
+)
+
+
+def delete_duplicate_records(table, column, cookie):
+    # Keep the first record of every (user, object, cookie), the derived table lets MySQL read the same table
+    op.execute(
+        f"DELETE FROM {table} WHERE id NOT IN (SELECT id FROM ("
+        f"SELECT MIN(id) AS id FROM {table} GROUP BY COALESCE(user_id, 0), {column}, {cookie}"
+        f") AS first_records)"
+    )
+
+
+def recount_stats_counters(table, column, name, scope):
+    op.execute(f"DELETE FROM stats_counter WHERE name = '{name}'")
+    op.execute(
+        f"INSERT INTO stats_counter (name, scope, object_id, value) "
+        f"SELECT '{name}', 'global', 0, COUNT(*) FROM {table}"
+    )
+    op.execute(
+        f"INSERT INTO stats_counter (name, scope, object_id, value) "
+        f"SELECT '{name}', '{scope}', {column}, COUNT(*) FROM {table} "
+        f"WHERE {column} IS NOT NULL GROUP BY {column}"
+    )
+
+
+def upgrade():
+    for table, column, cookie, constraint, name, scope in RECORD_TABLES:
+        delete_duplicate_records(table, column, cookie)
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column('user_key', sa.Integer(), sa.Computed('coalesce(user_id, 0)', persisted=True))
+            )
+            batch_op.create_unique_constraint(constraint, ['user_key', column, cookie])
+
+        recount_stats_counters(table, column, name, scope)
+
+
+def downgrade():
+    for table, column, cookie, constraint, name, scope in reversed(RECORD_TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(constraint, type_='unique')
+            batch_op.drop_column('user_key')
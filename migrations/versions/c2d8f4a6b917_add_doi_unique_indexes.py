@@ -0,0 +1,38 @@
+"""add_doi_unique_indexes
+
+Revision ID: c2d8f4a6b917
+Revises: b5c1f7a9e384
+Create Date: 2026-10-19 11:15:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2d8f4a6b917'
+down_revision = 'b5c1f7a9e384'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the first mapping of every old DOI, which is the one get_new_doi was following, so redirects do not change
+    op.execute(
+        "DELETE FROM doi_mapping WHERE dataset_doi_old IS NOT NULL AND id NOT IN (SELECT id FROM ("
+        "SELECT MIN(id) AS id FROM doi_mapping WHERE dataset_doi_old IS NOT NULL GROUP BY dataset_doi_old"
+        ") AS first_mappings)"
+    )
+
+    with op.batch_alter_table('doi_mapping', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_doi_mapping_dataset_doi_old'), ['dataset_doi_old'], unique=True)
+
+    with op.batch_alter_table('ds_meta_data', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ds_meta_data_dataset_doi'), ['dataset_doi'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('ds_meta_data', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ds_meta_data_dataset_doi'))
+
+    with op.batch_alter_table('doi_mapping', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_doi_mapping_dataset_doi_old'))
@@ -0,0 +1,36 @@
+"""create_hubfile_conversion_table
+
+Revision ID: c7e2a4f9b310
+Revises: a3f6c8d2b915
+Create Date: 2026-10-19 02:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2a4f9b310'
+down_revision = 'a3f6c8d2b915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('hubfile_conversion',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('hubfile_id', sa.Integer(), nullable=False),
+    sa.Column('format', sa.String(length=16), nullable=False),
+    sa.Column('name', sa.String(length=140), nullable=False),
+    sa.Column('checksum', sa.String(length=120), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('flamapy_version', sa.String(length=120), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['hubfile_id'], ['file.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('hubfile_id', 'format', name='uq_hubfile_conversion_hubfile_format')
+    )
+
+
+def downgrade():
+    op.drop_table('hubfile_conversion')
@@ -0,0 +1,39 @@
+"""add_data_set_file_aggregates
+
+Revision ID: d4f9a1c7e258
+Revises: c2d8f4a6b917
+Create Date: 2026-10-19 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f9a1c7e258'
+down_revision = 'c2d8f4a6b917'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('data_set', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('files_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('total_size_bytes', sa.BigInteger(), server_default='0', nullable=False))
+        batch_op.create_index('ix_data_set_total_size_bytes_id', ['total_size_bytes', 'id'], unique=False)
+
+    op.execute(
+        "UPDATE data_set SET "
+        "files_count = (SELECT COUNT(*) FROM file JOIN feature_model ON feature_model.id = file.feature_model_id "
+        "WHERE feature_model.data_set_id = data_set.id), "
+        "total_size_bytes = (SELECT COALESCE(SUM(file.size), 0) FROM file "
+        "JOIN feature_model ON feature_model.id = file.feature_model_id "
+        "WHERE feature_model.data_set_id = data_set.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('data_set', schema=None) as batch_op:
+        batch_op.drop_index('ix_data_set_total_size_bytes_id')
+        batch_op.drop_column('total_size_bytes')
+        batch_op.drop_column('files_count')
@@ -0,0 +1,33 @@
+"""create_uvl_validation_table
+
+Revision ID: e1b7d04c92a6
+Revises: c7e2a4f9b310
+Create Date: 2026-10-19 04:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b7d04c92a6'
+down_revision = 'c7e2a4f9b310'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('uvl_validation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('checksum', sa.String(length=120), nullable=False),
+    sa.Column('parser_version', sa.String(length=120), nullable=False),
+    sa.Column('valid', sa.Boolean(), nullable=False),
+    sa.Column('errors', sa.JSON(), nullable=False),
+    sa.Column('validated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('checksum')
+    )
+
+
+def downgrade():
+    op.drop_table('uvl_validation')
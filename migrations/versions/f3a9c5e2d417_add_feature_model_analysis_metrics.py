@@ -0,0 +1,54 @@
+"""add_feature_model_analysis_metrics
+
+Revision ID: f3a9c5e2d417
+Revises: e1b7d04c92a6
+Create Date: 2026-10-19 06:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c5e2d417'
+down_revision = 'e1b7d04c92a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('fm_metrics', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('number_of_configurations', sa.Double(), nullable=True))
+        batch_op.add_column(sa.Column('number_of_core_features', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('number_of_dead_features', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('number_of_atomic_sets', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('core_features', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('dead_features', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('atomic_sets', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('analyzed_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(
+            batch_op.f('ix_fm_metrics_number_of_configurations'), ['number_of_configurations'], unique=False
+        )
+
+    with op.batch_alter_table('ds_metrics', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('number_of_configurations', sa.Double(), nullable=True))
+        batch_op.create_index(
+            batch_op.f('ix_ds_metrics_number_of_configurations'), ['number_of_configurations'], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('ds_metrics', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ds_metrics_number_of_configurations'))
+        batch_op.drop_column('number_of_configurations')
+
+    with op.batch_alter_table('fm_metrics', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_fm_metrics_number_of_configurations'))
+        batch_op.drop_column('analyzed_at')
+        batch_op.drop_column('atomic_sets')
+        batch_op.drop_column('dead_features')
+        batch_op.drop_column('core_features')
+        batch_op.drop_column('number_of_atomic_sets')
+        batch_op.drop_column('number_of_dead_features')
+        batch_op.drop_column('number_of_core_features')
+        batch_op.drop_column('number_of_configurations')